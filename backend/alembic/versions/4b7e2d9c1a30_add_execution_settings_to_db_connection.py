@@ -0,0 +1,28 @@
+"""add_execution_settings_to_db_connection
+
+Revision ID: 4b7e2d9c1a30
+Revises: ba19e5a9fd71
+Create Date: 2026-10-18 09:12:41.218530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2d9c1a30'
+down_revision: Union[str, Sequence[str], None] = 'ba19e5a9fd71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add per-connection execution settings (concurrency caps, queue size)."""
+    op.add_column('db_connection', sa.Column('execution_settings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Remove per-connection execution settings."""
+    op.drop_column('db_connection', 'execution_settings')
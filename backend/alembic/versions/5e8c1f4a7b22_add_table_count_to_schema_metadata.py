@@ -0,0 +1,28 @@
+"""add_table_count_to_schema_metadata
+
+Revision ID: 5e8c1f4a7b22
+Revises: 9d3f6a2b8e14
+Create Date: 2026-10-18 14:21:09.318245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8c1f4a7b22'
+down_revision: Union[str, Sequence[str], None] = '9d3f6a2b8e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Store the number of ingested tables so retrieval can size itself without loading the schema."""
+    op.add_column('schema_metadata', sa.Column('table_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Remove the stored table count."""
+    op.drop_column('schema_metadata', 'table_count')
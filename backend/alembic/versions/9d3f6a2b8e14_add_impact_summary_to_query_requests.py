@@ -0,0 +1,28 @@
+"""add_impact_summary_to_query_requests
+
+Revision ID: 9d3f6a2b8e14
+Revises: 4b7e2d9c1a30
+Create Date: 2026-10-18 10:04:17.553902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6a2b8e14'
+down_revision: Union[str, Sequence[str], None] = '4b7e2d9c1a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Store the impact analysis estimate alongside each query request."""
+    op.add_column('query_requests', sa.Column('impact_summary', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Remove the stored impact analysis estimate."""
+    op.drop_column('query_requests', 'impact_summary')
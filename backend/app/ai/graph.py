@@ -15,6 +15,8 @@ from app.models.role import Role
 class State(TypedDict):
     question: str
     connection_id: int
+    llm_settings: Optional[Dict[str, Any]] # The connection's LLM tier overrides, see connection_llm_settings
+    db_type: Optional[str] # Target database type, selects the generator
     user: Any # User object
     intent: str # READ, UPDATE_SINGLE, etc.
     schema_context: str
@@ -26,14 +28,17 @@ class State(TypedDict):
     access_message: str
     retry_count: int
     last_error: Optional[str]
+    stream_tokens: bool # Forward generator / explainer tokens as custom stream events
     
     # Phase 4: Schema Safeguards
     candidate_tables: List[str] # From vector search
+    column_candidates: Optional[Dict[str, List[str]]] # Column-level vector hits for wide tables
     selected_tables: List[str] # From LLM scoring
     confidence_score: float
     is_ambiguous: bool
     disambiguation_options: Optional[List[Dict[str, Any]]] # Options for user
     grounded_schema: str # JSON string of locked schema (tables + columns)
+    join_paths: Optional[List[Dict[str, Any]]] # Foreign key joins connecting the selected tables
 
 def rbac_node(state: State):
     user = state.get("user")
@@ -58,8 +63,13 @@ def rbac_node(state: State):
 from app.ai.nodes.table_candidate_retriever import table_candidate_retriever
 from app.ai.nodes.table_relevance_scorer import table_relevance_scorer
 from app.ai.nodes.ambiguity_detector import ambiguity_detector
+from app.ai.nodes.join_planner import join_planner
 from app.ai.nodes.column_grounder import column_grounder
 from app.ai.nodes.sql_repair_agent import sql_repair_agent
+from app.ai.nodes.mongo_query_generator import mongo_query_generator
+from app.ai.nodes.speculative_generator import speculative_generator
+from app.core.config import settings
+from app.sql_guardrails.mongo_validator import is_mongo_query, validate_mongo_query
 
 # ... existing RBAC node ...
 
@@ -68,7 +78,10 @@ def validate_node(state: State):
     if not sql:
         return {"validation_error": "No SQL generated"}
         
-    is_safe, message = validate_sql(sql)
+    if is_mongo_query(sql):
+        is_safe, message = validate_mongo_query(sql)
+    else:
+        is_safe, message = validate_sql(sql)
     if not is_safe:
         return {"validation_error": f"Guardrail Alert: {message}"}
     return {}
@@ -81,8 +94,11 @@ workflow.add_node("rbac", rbac_node)
 workflow.add_node("candidate_retriever", table_candidate_retriever)
 workflow.add_node("relevance_scorer", table_relevance_scorer)
 workflow.add_node("ambiguity_check", ambiguity_detector)
+workflow.add_node("join_planner", join_planner)
 workflow.add_node("column_grounder", column_grounder)
 workflow.add_node("generator", sql_repair_agent) # New Agent
+workflow.add_node("mongo_generator", mongo_query_generator)
+workflow.add_node("speculative_generator", speculative_generator)
 workflow.add_node("validator", validate_node)
 workflow.add_node("impact", impact_analyzer)
 workflow.add_node("explainer", sql_explainer)
@@ -96,12 +112,32 @@ def rbac_router(state: State):
     if state["access_status"] == "REJECTED": return END
     return "candidate_retriever"
 
+def retrieval_router(state: State):
+    # Tiny schemas come back from retrieval with the selection already made
+    if state.get("selected_tables"): return "ambiguity_check"
+    return "relevance_scorer"
+
 def ambiguity_router(state: State):
     if state.get("is_ambiguous"):
         # In a real app we would output the options to user.
         # For now, we set a flag that the API layer can detect and return to frontend.
         # We end the graph here, API sees "is_ambiguous" and handles it.
         return END
+    return "join_planner"
+
+def generator_router(state: State):
+    # Reads on MongoDB get a native pipeline; writes stay SQL so impact
+    # analysis and approvals work on a single representation.
+    if state.get("db_type") == "mongodb" and state.get("intent") == "READ":
+        return "mongo_generator"
+    return "generator"
+
+def grounding_router(state: State):
+    # Confident SQL selections may generate in parallel with grounding
+    if (settings.SPECULATIVE_GENERATION_ENABLED
+            and generator_router(state) == "generator"
+            and state.get("confidence_score", 0.0) >= settings.SPECULATIVE_MIN_CONFIDENCE):
+        return "speculative_generator"
     return "column_grounder"
 
 def generation_router(state: State):
@@ -111,8 +147,25 @@ def generation_router(state: State):
     if intent == "READ": return "explainer"
     else: return "impact"
 
+# Carried from a failed run into the retry, which restarts the graph at generation
+RETRY_STATE_KEYS = (
+    "intent", "access_status", "access_message", "candidate_tables", "column_candidates",
+    "selected_tables", "confidence_score", "grounded_schema", "join_paths", "sql_query",
+)
+
+def entry_router(state: State):
+    # Retries after an execution error reuse intent, RBAC, table selection
+    # and grounding from the previous run and only regenerate the query
+    if state.get("retry_count") and state.get("grounded_schema"):
+        return generator_router(state)
+    return "intent"
+
 # Edges
-workflow.set_entry_point("intent")
+workflow.set_conditional_entry_point(entry_router, {
+    "intent": "intent",
+    "generator": "generator",
+    "mongo_generator": "mongo_generator"
+})
 
 workflow.add_conditional_edges("intent", intent_router)
 workflow.add_conditional_edges("rbac", rbac_router, {
@@ -120,16 +173,28 @@ workflow.add_conditional_edges("rbac", rbac_router, {
     END: END
 })
 
-workflow.add_edge("candidate_retriever", "relevance_scorer")
+workflow.add_conditional_edges("candidate_retriever", retrieval_router, {
+    "relevance_scorer": "relevance_scorer",
+    "ambiguity_check": "ambiguity_check"
+})
 workflow.add_edge("relevance_scorer", "ambiguity_check")
 
 workflow.add_conditional_edges("ambiguity_check", ambiguity_router, {
-    "column_grounder": "column_grounder",
+    "join_planner": "join_planner",
     END: END
 })
+workflow.add_conditional_edges("join_planner", grounding_router, {
+    "column_grounder": "column_grounder",
+    "speculative_generator": "speculative_generator"
+})
 
-workflow.add_edge("column_grounder", "generator")
+workflow.add_conditional_edges("column_grounder", generator_router, {
+    "generator": "generator",
+    "mongo_generator": "mongo_generator"
+})
 workflow.add_edge("generator", "validator")
+workflow.add_edge("mongo_generator", "validator")
+workflow.add_edge("speculative_generator", "validator")
 
 workflow.add_conditional_edges("validator", generation_router, {
     "explainer": "explainer",
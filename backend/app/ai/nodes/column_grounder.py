@@ -1,10 +1,48 @@
 from typing import Dict, Any, List
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, Field
 from langchain_community.vectorstores import Chroma
-from app.ai.utils.llm_factory import get_llm, get_embeddings
+from app.ai.utils.llm_factory import get_llm, get_embeddings, cached_system_message
+from app.ai.utils.structured_output import invoke_structured
 from app.core.config import settings
+from app.schema_ingestion.catalog import load_schema
+from app.ai.utils.prompt_builder import build_schema_context, model_name, ordered_columns
+from app.services.metrics import metrics
 import json
 
+
+class GroundedColumns(BaseModel):
+    tables: Dict[str, List[str]] = Field(description="Table name -> column names needed to answer the question")
+
+
+def _narrowed_columns(question: str, table: str, details: Dict[str, Any], hits: List[str], connection_id: int) -> List[Dict[str, Any]]:
+    """
+    Columns of a wide table limited to the ones vector search found relevant,
+    plus its key columns so joins stay possible. Most relevant first.
+    """
+    if not hits:
+        # Selected without column hits (e.g. by name): search this table's columns only
+        column_store = Chroma(
+            collection_name=f"schema_cols_conn_{connection_id}",
+            embedding_function=get_embeddings(),
+            persist_directory=settings.CHROMA_PERSIST_DIRECTORY
+        )
+        docs = column_store.similarity_search(
+            question, k=settings.GROUNDING_MAX_COLUMNS_PER_TABLE, filter={"table_name": table}
+        )
+        hits = [doc.metadata.get("column_name") for doc in docs]
+
+    hits = hits[:settings.GROUNDING_MAX_COLUMNS_PER_TABLE]
+    key_columns = {col["name"] for col in details["columns"] if col.get("primary_key")}
+    for fk in details.get("foreign_keys", []):
+        key_columns.update(fk["constrained_columns"])
+
+    columns = [col for col in ordered_columns(details, hits) if col["name"] in key_columns or col["name"] in hits]
+    if not columns:
+        raise ValueError(f"no indexed columns found for {table}")
+    return columns
+
+
 def column_grounder(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Stage 4: Column Grounding.
@@ -23,91 +61,72 @@ def column_grounder(state: Dict[str, Any]) -> Dict[str, Any]:
     
     print(f"DEBUG: Stage 4 - Grounding columns for tables: {selected_tables}")
     
-    # We need to fetch the FULL schema for these specific tables to let LLM pick columns.
-    # We can use the textifier or just fetch from vector store metadata if available.
-    # For now, let's fetch from vector store logic again or use a helper.
-    # A robust way: Retrieve the documents for these tables from Chroma.
+    # Compact notation from the ingested schema, most relevant columns first,
+    # truncated to the grounding token budget
+    llm = get_llm(user=user, node="column_grounder", connection_settings=state.get("llm_settings"))
+    column_candidates = state.get("column_candidates") or {}
+    schema_info = load_schema(connection_id)
     
-    embeddings = get_embeddings()
-    vector_store = Chroma(
-        collection_name=f"schema_conn_{connection_id}",
-        embedding_function=embeddings,
-        persist_directory=settings.CHROMA_PERSIST_DIRECTORY
-    )
-    
-    # We can't easily query by metadata in standard LC retrieval without iterating or using specific filter.
-    # Let's filter by table_name metadata.
-    
-    full_schemas = []
-    
-    # This might be slow if we do N queries. 
-    # Optimization: One query with "OR" filter if supported, or just loop for now (N is small, < 5).
     try:
+        tables = []
         for table in selected_tables:
-            # We want to get the doc that has this table name. 
-            # Chroma get() allows filtering.
-            results = vector_store.get(where={"table_name": table})
-            if results and results['documents']:
-                # Assume one doc per table as per our textifier strategy
-                full_schemas.append(results['documents'][0])
-            else:
+            details = schema_info.get(table)
+            if not details:
                 print(f"WARN: Could not find schema for table {table}")
+                continue
+            hits = column_candidates.get(table, [])
+            columns = None
+            if len(details.get("columns", [])) >= settings.COLUMN_INDEX_MIN_COLUMNS:
+                # Wide table: only send the columns vector search narrowed it down to
+                try:
+                    columns = _narrowed_columns(question, table, details, hits, connection_id)
+                except Exception as e:
+                    print(f"WARN: Column narrowing failed for {table}, using all columns: {e}")
+            tables.append((table, details, columns or ordered_columns(details, hits)))
                 
-        schema_context = "\n\n".join(full_schemas)
+        schema_context = build_schema_context(tables, settings.GROUNDING_SCHEMA_TOKEN_BUDGET, model_name(llm))
+        metrics.observe("grounding.schema_chars", len(schema_context))
         
     except Exception as e:
         print(f"ERROR: Failed to fetch schema for grounding: {e}")
         return {"grounded_schema": "[]"}
     
-    llm = get_llm(user=user)
-    
     system_prompt = """You are a strict data engineer.
     Your task is to identify specific columns from the provided schema that are required to answer the user's question.
     
     Input:
     1. User Question
-    2. Full Schema of Selected Tables
+    2. Schema of Selected Tables, one per line: table(column type [PK] [FK->table.column], ...)
     
     Instructions:
     - Select ONLY columns strictly needed (SELECT clause, WHERE clause, JOIN keys).
     - Do NOT include columns that are not mentioned or implied.
-    - Return a JSON object mapping table names to list of column names.
-    - Format: {{"table_name": ["col1", "col2"]}}
+    - Return a JSON object whose "tables" key maps table names to lists of column names.
+    - Format: {"tables": {"table_name": ["col1", "col2"]}}
     """
     
-    human_prompt = f"""Question: {question}
+    schema_block = f"""Schema:
+    {schema_context}"""
     
-    Schema:
-    {schema_context}
+    human_prompt = f"""Question: {question}
     
     Return JSON:"""
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", human_prompt),
-    ])
-    
-    chain = prompt | llm
-    
     try:
-        response = chain.invoke({})
-        content = response.content
-        print(f"DEBUG: Column Grounder Raw Response: {content}")
+        result = invoke_structured(
+            llm,
+            [cached_system_message(llm, system_prompt, schema_block), HumanMessage(content=human_prompt)],
+            GroundedColumns,
+            node="column_grounder",
+        )
+        grounded = result.tables
+        print(f"DEBUG: Column Grounder Result: {grounded}")
         
-        # Robust cleanup
-        clean_content = content.replace("```json", "").replace("```", "").strip()
-        # Sometimes key is single quoted
-        if clean_content.startswith("'") and clean_content.endswith("'"):
-             clean_content = clean_content[1:-1]
-             
-        # Extract JSON substring if needed
-        import re
-        json_match = re.search(r'\{.*\}', clean_content, re.DOTALL)
-        if json_match:
-            clean_content = json_match.group(0)
-            
-        # Verify JSON
-        grounded = json.loads(clean_content)
+        # Join keys from the planned join paths must survive grounding
+        for join in state.get("join_paths") or []:
+            for table, columns in ((join["left_table"], join["left_columns"]), (join["right_table"], join["right_columns"])):
+                table_columns = grounded.setdefault(table, [])
+                table_columns.extend(c for c in columns if c not in table_columns)
         
         # Security: Allow all selected tables, but trust LLM's column choices for now.
         # Strict implementation checks if columns actually exist in source schema.
@@ -118,10 +137,11 @@ def column_grounder(state: Dict[str, Any]) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"ERROR: Column grounding failed: {e}")
-        # On error print content to help debug
-        try: print(f"Failed Content: {response.content}") 
-        except: pass
-        # Fallback: Return empty or full schema? 
-        # For safety, let's return full schema context we fetched, formatted as JSON logic if possible, 
-        # or simplified.
+        # Fallback: every known column of the selected tables
+        fallback = {
+            table: [col["name"] for col in schema_info[table].get("columns", [])]
+            for table in selected_tables if table in schema_info
+        }
+        if fallback:
+            return {"grounded_schema": json.dumps(fallback)}
         return {"grounded_schema": "ERROR"}
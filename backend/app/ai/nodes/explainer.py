@@ -1,6 +1,8 @@
 from typing import Dict, Any
-from langchain_core.messages import SystemMessage, HumanMessage
-from app.ai.utils.llm_factory import get_llm
+from langchain_core.messages import HumanMessage
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.token_stream import invoke_streaming
+from app.ai.utils.prompt_builder import record_usage, model_name
 
 def sql_explainer(state: Dict[str, Any]):
     """
@@ -13,7 +15,7 @@ def sql_explainer(state: Dict[str, Any]):
         return {"explanation": "No query generated."}
         
     user = state.get("user")
-    llm = get_llm(user)
+    llm = get_llm(user, node="explainer", connection_settings=state.get("llm_settings"))
     
     prompt = """
     You are a database expert. Explain the following SQL query to a non-technical user.
@@ -21,16 +23,18 @@ def sql_explainer(state: Dict[str, Any]):
     - Mention which table is being modified and what the criteria is.
     - If it is a read query, explain what data is being fetched.
     - Do NOT mention ID columns or technical jargon if possible.
-    
-    User Question: {question}
-    SQL Query: {sql_query}
     """
     
+    human_prompt = f"""User Question: {question}
+    SQL Query: {sql_query}"""
+    
     messages = [
-        SystemMessage(content=prompt.format(question=question, sql_query=sql_query))
+        cached_system_message(llm, prompt),
+        HumanMessage(content=human_prompt)
     ]
     
-    response = llm.invoke(messages)
+    response = invoke_streaming(llm, messages, "explainer", enabled=state.get("stream_tokens", False))
+    record_usage("explainer", response, prompt + human_prompt, model_name(llm))
     explanation = response.content.strip()
     
     return {"explanation": explanation}
@@ -6,7 +6,7 @@ def sql_generator(state: Dict[str, Any]):
     question = state["question"]
     schema_context = state["schema_context"]
     user = state.get("user")
-    llm = get_llm(user)
+    llm = get_llm(user, node="generator", connection_settings=state.get("llm_settings"))
     last_error = state.get("last_error")
     
     instruction = "Generate a SQL query to answer the user's question."
@@ -1,55 +1,296 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import logging
-from app.ai.utils.llm_factory import get_llm
-# from app.api.query import execute_query_internal # Removed to fix circular import
-# We can import the executor directly if needed, but for now we are mocking or using sqlglot logic only.
-from app.query_executor.executor import execute_sql_query # Use direct executor if needed
-# Note: internal execution needs to be careful not to actually run the UPDATE if we are just estimating.
-# For now, Impact Analysis is purely "Estimation" via SELECT COUNT.
+import sqlglot
+from sqlglot import exp
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.db_connection import DBConnection
+from app.schema_ingestion.catalog import load_schema
+from app.services.credential_encryptor import encryptor
+from app.services.db_connector import db_connector
+from app.sql_guardrails.cost_check import explain_query
+# Note: Impact Analysis never runs the write itself - the UPDATE/DELETE is
+# converted into a SELECT COUNT(*) over the target rows it would change.
 
 logger = logging.getLogger(__name__)
 
+
+def _target_table(parsed: exp.Expression) -> exp.Table:
+    """The table whose rows change; MySQL "DELETE t2 FROM t1 JOIN t2 ..." names it separately."""
+    targets = parsed.args.get("tables") if isinstance(parsed, exp.Delete) else None
+    if targets:
+        name = targets[0].name.lower()
+        sources = [parsed.this] + [join.this for join in parsed.this.args.get("joins") or []]
+        for table in sources:
+            if isinstance(table, exp.Table) and table.alias_or_name.lower() == name:
+                return table
+    return parsed.this
+
+
+def _is_inner(join: exp.Join) -> bool:
+    return not join.side and (join.kind or "INNER").upper() in ("INNER", "CROSS") and not join.args.get("using")
+
+
+def build_count_query(sql_query: str, dialect: str, primary_keys: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Converts an UPDATE/DELETE statement into a SELECT COUNT(*) over the same rows.
+
+    With joins (MySQL "UPDATE a JOIN b", PostgreSQL FROM / USING) a plain
+    COUNT(*) counts joined rows, so the target rows are counted instead: by
+    distinct primary key when it is known, else with WHERE EXISTS over the
+    other tables. Outer joins without a known key keep COUNT(*), flagged as
+    an upper bound.
+
+    Returns:
+        dict: {"count_sql": str, "table": str, "cols_modified": list, "has_where": bool,
+               "limit": int|None, "joined": bool, "upper_bound": bool}
+        or None if the statement is not an UPDATE/DELETE.
+    """
+    parsed = sqlglot.parse_one(sql_query, read=dialect)
+    if not isinstance(parsed, (exp.Update, exp.Delete)):
+        return None
+
+    # Postgres "UPDATE ... FROM x" / "DELETE ... USING x" become cross joins,
+    # the WHERE clause carries the actual join condition.
+    extra_tables: List[exp.Expression] = []
+    from_clause = parsed.args.get("from_") or parsed.args.get("from")
+    if from_clause is not None:
+        extra_tables.append(from_clause.this)
+        extra_tables.extend(join.this for join in from_clause.args.get("joins") or [])
+    extra_tables.extend(parsed.args.get("using") or [])
+
+    where = parsed.args.get("where")
+    joins = parsed.this.args.get("joins") or []
+    target = _target_table(parsed)
+    upper_bound = False
+
+    if not joins and not extra_tables:
+        count_query = exp.select(exp.Count(this=exp.Star())).from_(parsed.this.copy())
+        if where is not None:
+            count_query.set("where", where.copy())
+    elif primary_keys:
+        # Same joined rows as the statement, each target row counted once
+        joined = exp.select(*[exp.column(key, table=target.alias_or_name) for key in primary_keys]).from_(parsed.this.copy())
+        for table in extra_tables:
+            joined = joined.join(table.copy(), join_type="CROSS")
+        if where is not None:
+            joined.set("where", where.copy())
+        if len(primary_keys) == 1:
+            count_query = joined.select(
+                exp.Count(this=exp.Distinct(expressions=joined.expressions)), append=False
+            )
+        else:
+            count_query = exp.select(exp.Count(this=exp.Star())).from_(joined.distinct().subquery("affected_rows"))
+    elif target is parsed.this and all(_is_inner(join) for join in joins):
+        # Target rows for which some combination of the other tables matches
+        others = [join.this for join in joins] + extra_tables
+        conditions = [join.args["on"] for join in joins if join.args.get("on")]
+        if where is not None:
+            conditions.append(where.this)
+        matches = exp.select(exp.Literal.number(1)).from_(others[0].copy())
+        for table in others[1:]:
+            matches = matches.join(table.copy(), join_type="CROSS")
+        if conditions:
+            matches = matches.where(exp.and_(*[condition.copy() for condition in conditions]))
+        outer = parsed.this.copy()
+        outer.set("joins", None)
+        count_query = exp.select(exp.Count(this=exp.Star())).from_(outer).where(exp.Exists(this=matches))
+    else:
+        # Counts joined rows, which can exceed the target rows that change
+        upper_bound = True
+        count_query = exp.select(exp.Count(this=exp.Star())).from_(parsed.this.copy())
+        for table in extra_tables:
+            count_query = count_query.join(table.copy(), join_type="CROSS")
+        if where is not None:
+            count_query.set("where", where.copy())
+
+    cols_modified = []
+    if isinstance(parsed, exp.Update):
+        for assignment in parsed.expressions:
+            if isinstance(assignment.this, exp.Column):
+                cols_modified.append(assignment.this.name)
+
+    limit = None
+    limit_node = parsed.args.get("limit")
+    if limit_node is not None:
+        try:
+            limit = int(limit_node.expression.name)
+        except Exception:
+            limit = None
+
+    return {
+        "count_sql": count_query.sql(dialect=dialect),
+        "table": f"{target.db}.{target.name}" if target.db else target.name,
+        "cols_modified": cols_modified,
+        "has_where": where is not None,
+        "limit": limit,
+        "joined": bool(joins or extra_tables),
+        "upper_bound": upper_bound
+    }
+
+
+def _primary_keys(connection_id: int, table: str) -> List[str]:
+    """Primary key columns of an ingested table ("orders" also finds "public.orders")."""
+    schema = load_schema(connection_id)
+    details = schema.get(table)
+    if details is None:
+        short = table.split(".")[-1].lower()
+        details = next((d for key, d in schema.items() if key.split(".")[-1].lower() == short), None)
+    return [col["name"] for col in (details or {}).get("columns", []) if col.get("primary_key")]
+
+
+def _run_count_with_timeout(conn: DBConnection, count_sql: str, dialect: str, timeout_ms: int) -> int:
+    """Executes the COUNT(*) on the pooled engine, cancelled by the database after timeout_ms."""
+    decrypted_password = encryptor.decrypt(conn.password_encrypted)
+    engine = db_connector.get_pooled_engine(conn, decrypted_password)
+
+    with engine.connect() as db_conn:
+        trans = db_conn.begin()
+        try:
+            if dialect == "postgres":
+                # SET LOCAL only lasts for this transaction, the pooled connection is unaffected
+                db_conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+                count = db_conn.execute(text(count_sql)).scalar()
+            else:
+                hinted_sql = count_sql.replace("SELECT", f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", 1)
+                count = db_conn.execute(text(hinted_sql)).scalar()
+        finally:
+            trans.rollback()
+    return int(count or 0)
+
+
+def _count_mongo(conn: DBConnection, sql_query: str, timeout_ms: int) -> Optional[Dict[str, Any]]:
+    """Counts documents matched by an UPDATE/DELETE translated to a MongoDB filter."""
+    from app.query_executor.sql_to_mongo import sql_to_mongo_query
+    from app.services.mongo_client import mongo_client
+
+    mongo_query = sql_to_mongo_query(sql_query)
+    if mongo_query.get("operation") not in ("delete", "update"):
+        return None
+
+    client = mongo_client.get_client(
+        {
+            "username": conn.username,
+            "host": conn.host,
+            "port": conn.port,
+            "database_name": conn.database_name
+        },
+        encryptor.decrypt(conn.password_encrypted)
+    )
+    try:
+        collection = client[conn.database_name][mongo_query["collection"]]
+        count = collection.count_documents(mongo_query.get("filter", {}), maxTimeMS=timeout_ms)
+    finally:
+        client.close()
+
+    return {
+        "table": mongo_query["collection"],
+        "affected_rows_estimate": count,
+        "method": "count",
+        "cols_modified": [],
+        "has_where": bool(mongo_query.get("filter"))
+    }
+
+
+def _risk_score(affected_rows: int, has_where: bool) -> str:
+    if not has_where or affected_rows < 0 or affected_rows > 100:
+        return "high"
+    if affected_rows > 1:
+        return "medium"
+    return "low"
+
+
 def impact_analyzer(state: Dict[str, Any]):
     """
     Analyzes a WRITE query (UPDATE/DELETE) to estimate impact.
     strategy:
     1. Parse the generated SQL.
     2. Convert UPDATE/DELETE to a SELECT COUNT(*) query with the same WHERE clause.
-    3. Execute the SELECT COUNT(*).
+    3. Use the EXPLAIN estimate when an exact count would be too expensive,
+       otherwise execute the SELECT COUNT(*) with a short timeout.
     4. Return the count and table name.
     """
     sql_query = state.get("sql_query", "")
     connection_id = state.get("connection_id")
-    
-    # Simple heuristic parsing (in production use sqlglot)
-    # This is a placeholder for the actual logic.
-    # We will assume sql_query is something like "UPDATE users SET ... WHERE ..."
-    
+
     impact_summary = {
         "table": "unknown",
-        "rows_affected": -1,
+        "affected_rows_estimate": -1,
+        "method": "unavailable",
+        "cols_modified": [],
         "risk_score": "high" # default
     }
-    
+
     # If no query generated yet (shouldn't happen if node prevents it), skip
     if not sql_query:
         return {"impact": impact_summary}
 
+    db = SessionLocal()
+    try:
+        conn = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    finally:
+        db.close()
+    if not conn:
+        impact_summary["error"] = "Connection not found"
+        return {"impact": impact_summary}
+
+    timeout_ms = conn.get_setting("impact_count_timeout_ms", settings.IMPACT_COUNT_TIMEOUT_MS)
+
     try:
-        # Mock implementation for Phase 2 MVP
-        # Real implementation would use sqlglot to transmute the query
-        # import sqlglot
-        # parsed = sqlglot.parse_one(sql_query)
-        # where = parsed.find(sqlglot.exp.Where)
-        # table = parsed.find(sqlglot.exp.Table).name
-        # count_query = f"SELECT COUNT(*) FROM {table} {where}"
-        
-        # For now, we assume simple impact for prompt demo
-        impact_summary = {
-            "table": "extracted_table_name",
-            "affected_rows_estimate": 10, # Mocked
-            "cols_modified": ["column_a"]
-        }
+        if conn.db_type == "mongodb":
+            mongo_impact = _count_mongo(conn, sql_query, timeout_ms)
+            if mongo_impact:
+                mongo_impact["risk_score"] = _risk_score(mongo_impact["affected_rows_estimate"], mongo_impact["has_where"])
+                impact_summary = mongo_impact
+            return {"impact": impact_summary}
+
+        dialect = db_connector.sqlglot_dialect(conn.db_type)
+        count_info = build_count_query(sql_query, dialect)
+        if count_info is None:
+            return {"impact": impact_summary}
+        if count_info["joined"]:
+            # Count each target row once by its key when it is known
+            primary_keys = _primary_keys(connection_id, count_info["table"])
+            if primary_keys:
+                count_info = build_count_query(sql_query, dialect, primary_keys)
+
+        impact_summary.update({
+            "table": count_info["table"],
+            "cols_modified": count_info["cols_modified"],
+            "has_where": count_info["has_where"],
+            "upper_bound": count_info["upper_bound"]
+        })
+        count_sql = count_info["count_sql"]
+
+        # Ask the planner first: no point counting a billion rows to say "a lot"
+        estimate = None
+        try:
+            estimate = explain_query(conn, count_sql)
+        except Exception as e:
+            logger.warning(f"Impact EXPLAIN failed: {e}")
+
+        # Rows left after the WHERE clause, not rows scanned (that is the cost gate's number)
+        matched_rows = estimate.get("matched_rows", estimate["estimated_rows"]) if estimate else None
+        exact_count_limit = conn.get_setting("impact_exact_count_max_rows", settings.IMPACT_EXACT_COUNT_MAX_ROWS)
+        if matched_rows is not None and matched_rows > exact_count_limit:
+            impact_summary["affected_rows_estimate"] = matched_rows
+            impact_summary["method"] = "explain"
+        else:
+            try:
+                impact_summary["affected_rows_estimate"] = _run_count_with_timeout(conn, count_sql, dialect, timeout_ms)
+                impact_summary["method"] = "count"
+            except Exception as e:
+                # Usually the statement timeout - fall back to the planner estimate
+                logger.warning(f"Impact COUNT(*) failed, using estimate: {e}")
+                if matched_rows is not None:
+                    impact_summary["affected_rows_estimate"] = matched_rows
+                    impact_summary["method"] = "explain"
+
+        if count_info["limit"] is not None and impact_summary["affected_rows_estimate"] >= 0:
+            impact_summary["affected_rows_estimate"] = min(impact_summary["affected_rows_estimate"], count_info["limit"])
+
+        impact_summary["risk_score"] = _risk_score(impact_summary["affected_rows_estimate"], count_info["has_where"])
     except Exception as e:
         logger.error(f"Impact Analysis Failed: {e}")
         impact_summary["error"] = str(e)
@@ -1,9 +1,18 @@
 from typing import Dict, Any, List, Optional
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from app.ai.utils.llm_factory import get_llm
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.structured_output import invoke_structured
 import json
 
+
+class QueryInsights(BaseModel):
+    impact: str = "Informational"
+    data_scope: str = ""
+    business_meaning: str = ""
+    performance_note: str = ""
+    risk_assessment: str = ""
+
 def query_insights_generator(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Analyzes the executed query and results to provide business insights.
@@ -24,7 +33,7 @@ def query_insights_generator(state: Dict[str, Any]) -> Dict[str, Any]:
     if not sql:
         return {"insights": None}
 
-    llm = get_llm(user=user)
+    llm = get_llm(user=user, node="insights", connection_settings=state.get("llm_settings"))
     
     system_prompt = """You are a Senior Data Intelligence Strategist analyzing ACTUAL query results to provide actionable business insights.
 
@@ -59,37 +68,21 @@ Based on the ACTUAL DATA SAMPLE above, generate insights that analyze what the d
 If the sample shows project titles, comment on the types of projects. If it shows user data, identify patterns. Be specific and data-driven.
 """
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", human_prompt)
-    ])
-    
-    chain = prompt | llm
-    
-    import re
-    
     try:
         # Format sample data nicely for the LLM
         sample_str = json.dumps(sample_data, indent=2, default=str) if sample_data else "No data returned"
         
-        response = chain.invoke({
-            "question": question,
-            "sql": sql,
-            "metadata_json": json.dumps(metadata),
-            "sample_data_json": sample_str
-        })
-        content = response.content
-        print(f"DEBUG: Insights Raw LLM Content: {content}")
-        
-        # Robust JSON extraction
-        json_match = re.search(r'(\{.*\})', content, re.DOTALL)
-        if json_match:
-            clean_content = json_match.group(1)
-            parsed = json.loads(clean_content)
-            return {"insights": parsed}
-        else:
-            print("ERROR: No JSON object found in response")
-            raise ValueError("No JSON block found")
+        messages = [
+            cached_system_message(llm, system_prompt),
+            HumanMessage(content=human_prompt.format(
+                question=question,
+                sql=sql,
+                metadata_json=json.dumps(metadata, default=str),
+                sample_data_json=sample_str
+            ))
+        ]
+        insights = invoke_structured(llm, messages, QueryInsights, node="insights")
+        return {"insights": insights.model_dump()}
 
     except Exception as e:
         print(f"ERROR: Insights generation failed: {e}")
@@ -1,11 +1,40 @@
 from typing import Dict, Any
-from langchain_core.messages import SystemMessage, HumanMessage
-from app.ai.utils.llm_factory import get_llm
+from langchain_core.messages import HumanMessage
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.prompt_builder import record_usage, model_name
+from app.ai.utils.intent_tiers import classify_rules, intent_centroids, VALID_INTENTS
+from app.core.config import settings
+from app.services.metrics import metrics
+
+
+def _local_intent(question: str):
+    """Rules first, then the optional history centroids; None escalates to the LLM."""
+    if settings.INTENT_RULES_ENABLED:
+        intent, confidence = classify_rules(question)
+        if intent and confidence >= settings.INTENT_RULES_MIN_CONFIDENCE:
+            return intent, "rules"
+    if settings.INTENT_CENTROIDS_ENABLED:
+        try:
+            from app.ai.utils.llm_factory import get_embeddings
+            intent, _ = intent_centroids.classify(question, get_embeddings())
+            if intent:
+                return intent, "centroid"
+        except Exception as e:
+            print(f"WARN: Intent centroid tier failed: {e}")
+    return None, None
+
 
 def intent_classifier(state: Dict[str, Any]):
     question = state["question"]
     user = state.get("user")
-    llm = get_llm(user)
+    
+    intent, tier = _local_intent(question)
+    if intent:
+        metrics.increment("intent.classified", tier=tier, intent=intent)
+        print(f"DEBUG: Intent {intent} ({tier})")
+        return {"intent": intent}
+    
+    llm = get_llm(user, node="intent", connection_settings=state.get("llm_settings"))
     
     prompt = """
     You are a database AI assistant. Analyze the user's question to determine the SQL operation type.
@@ -23,22 +52,21 @@ def intent_classifier(state: Dict[str, Any]):
     """
     
     messages = [
-        SystemMessage(content=prompt),
+        cached_system_message(llm, prompt),
         HumanMessage(content=question)
     ]
     
     response = llm.invoke(messages)
+    record_usage("intent", response, prompt + question, model_name(llm))
     classification = response.content.strip().upper()
     
-    # Fallback / Normalization
-    valid_intents = ["READ", "UPDATE_SINGLE", "UPDATE_MULTI", "DELETE", "OTHER"]
-    
     # Simple keyword check fallback if LLM is verbose
-    if classification not in valid_intents:
+    if classification not in VALID_INTENTS:
         if "DELETE" in classification or "DROP" in classification: classification = "DELETE"
         elif "UPDATE" in classification and "ALL" in classification.upper(): classification = "UPDATE_MULTI"
         elif "UPDATE" in classification: classification = "UPDATE_SINGLE"
         elif "SELECT" in classification or "SHOW" in classification: classification = "READ"
         else: classification = "READ" # Default safe fallback
     
+    metrics.increment("intent.classified", tier="llm", intent=classification)
     return {"intent": classification}
@@ -0,0 +1,33 @@
+from typing import Dict, Any
+from app.core.config import settings
+from app.schema_ingestion.join_graph import join_graphs
+
+
+def join_planner(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stage 3.5: Join Path Planning.
+    Goal: Connect the selected tables along foreign keys so the generator gets
+    explicit join conditions. Bridge tables on the shortest paths are added to
+    the selection.
+    """
+    selected_tables = state.get("selected_tables", [])
+    connection_id = state["connection_id"]
+
+    if len(selected_tables) < 2:
+        return {"join_paths": []}
+
+    try:
+        graph = join_graphs.get(connection_id)
+        if graph is None:
+            return {"join_paths": []}
+        edges, bridges = graph.join_plan(selected_tables, settings.JOIN_PATH_MAX_HOPS)
+    except Exception as e:
+        print(f"ERROR: Join planning failed: {e}")
+        return {"join_paths": []}
+
+    print(f"DEBUG: Stage 3.5 - Join paths: {[str(edge) for edge in edges]} (bridges: {bridges})")
+
+    result = {"join_paths": [edge.to_dict() for edge in edges]}
+    if bridges:
+        result["selected_tables"] = selected_tables + bridges
+    return result
@@ -0,0 +1,120 @@
+from typing import Dict, Any, List, Optional
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.structured_output import invoke_structured, StructuredOutputError
+from app.core.config import settings
+from app.schema_ingestion.catalog import load_schema
+from app.sql_guardrails.mongo_validator import parse_mongo_query, dump_mongo_query
+import json
+
+
+class GeneratedPipeline(BaseModel):
+    collection: str = ""
+    pipeline: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+
+def _format_collections(grounded: Dict[str, List[str]], schema: Dict[str, Any]) -> str:
+    """Lists the grounded fields of each collection with the types sampled at ingestion."""
+    lines = []
+    for collection, fields in grounded.items():
+        columns = (schema.get(collection) or {}).get("columns", [])
+        types = {col["name"]: col.get("type", "unknown") for col in columns}
+        # Grounding may fail or drop fields - fall back to everything we know
+        wanted = [f for f in fields if f in types] or list(types)
+        if "_id" in types and "_id" not in wanted:
+            wanted.insert(0, "_id")
+        field_desc = ", ".join(f"{name} ({types.get(name, 'unknown')})" for name in wanted)
+        lines.append(f"- {collection}: {field_desc}")
+        indexes = [
+            "(" + ", ".join(field for field, _ in index["keys"]) + ")"
+            for index in (schema.get(collection) or {}).get("indexes", [])
+        ]
+        if indexes:
+            lines.append(f"  indexed: {', '.join(indexes)}")
+    return "\n".join(lines)
+
+
+def mongo_query_generator(state: Dict[str, Any]):
+    """
+    Generates a MongoDB aggregation pipeline directly (instead of SQL that is
+    translated afterwards) for READ questions on MongoDB connections.
+    Output is stored in 'sql_query' as Extended JSON:
+    {"collection": "...", "operation": "aggregate", "pipeline": [...]}
+    """
+    question = state["question"]
+    user = state.get("user")
+    last_error = state.get("last_error")
+
+    try:
+        grounded = json.loads(state.get("grounded_schema") or "{}")
+    except (TypeError, ValueError):
+        grounded = {}
+    if not isinstance(grounded, dict) or not grounded:
+        grounded = {table: [] for table in state.get("selected_tables", [])}
+    if not grounded:
+        return {"sql_query": None, "validation_error": "ERROR: Insufficient schema context"}
+
+    schema = load_schema(state["connection_id"])
+    collections_text = _format_collections(grounded, schema)
+
+    instruction = "Generate a MongoDB aggregation pipeline to answer the user's question."
+    if last_error:
+        instruction = f"""
+        PREVIOUS ATTEMPT FAILED.
+        Error Message: {last_error}
+
+        CORRECT THE PIPELINE based on the error. Use only the collections and fields listed.
+        """
+
+    # Static instructions, then the collections block, then the per-question part,
+    # so the provider can reuse the cached prefix
+    static_prompt = f"""
+    You are an expert MongoDB query generator.
+
+    STRICT CONSTRAINT: You must ONLY use the collections and fields listed (field types are sampled from real documents).
+
+    Rules:
+    1. Return ONLY a JSON object: {{"collection": "<collection>", "pipeline": [<stages>]}}. No markdown, no explanation.
+    2. Put the $match stage FIRST so MongoDB can use indexes; prefer filtering on the indexed fields.
+    3. Add a $project stage as early as possible that keeps only the fields needed for the answer.
+    4. Always end row-returning pipelines with a $limit (at most {settings.MONGO_PIPELINE_MAX_LIMIT}).
+    5. Use $group for counts/sums/averages and $lookup for other collections.
+    6. Use Extended JSON for typed values: {{"$oid": "..."}} for ObjectId fields, {{"$date": "2024-01-01T00:00:00Z"}} for dates.
+    7. Never use $out, $merge, $where or $function.
+    8. If the question cannot be answered with these collections, return {{"error": "Insufficient schema context"}}.
+    """
+
+    collections_block = f"""
+    Collections:
+    {collections_text}
+    """
+
+    human_prompt = f"""{instruction}
+    Question: "{question}"
+    """
+
+    llm = get_llm(user, node="mongo_generator", connection_settings=state.get("llm_settings"))
+    try:
+        generated = invoke_structured(
+            llm,
+            [cached_system_message(llm, static_prompt, collections_block), HumanMessage(content=human_prompt)],
+            GeneratedPipeline,
+            node="mongo_generator",
+        )
+    except StructuredOutputError as e:
+        print(f"ERROR: MongoDB pipeline generation returned no usable JSON: {e}")
+        return {"sql_query": None, "validation_error": f"Invalid MongoDB pipeline: {e}"}
+
+    if generated.error or not generated.collection:
+        return {"sql_query": None, "validation_error": f"ERROR: {generated.error or 'Insufficient schema context'}"}
+
+    try:
+        # Extended JSON values ({"$oid": ...}, {"$date": ...}) are decoded by the validator
+        query = parse_mongo_query(json.dumps({"collection": generated.collection, "pipeline": generated.pipeline}))
+    except ValueError as e:
+        print(f"ERROR: Generated MongoDB pipeline rejected: {e}")
+        return {"sql_query": None, "validation_error": f"Invalid MongoDB pipeline: {e}"}
+
+    return {"sql_query": dump_mongo_query(query)}
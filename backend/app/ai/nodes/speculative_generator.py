@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, Any
+import json
+from app.ai.nodes.column_grounder import column_grounder
+from app.ai.nodes.sql_repair_agent import sql_repair_agent
+from app.ai.utils.prompt_builder import ordered_columns
+from app.ai.utils.token_stream import restart_stream
+from app.core.config import settings
+from app.schema_ingestion.catalog import load_schema
+from app.services.db_connector import db_connector
+from app.services.metrics import metrics
+from app.sql_guardrails.schema_check import check_sql_against_schema
+
+# Shared by all requests; each speculative run uses two slots
+_pool = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_GENERATION_WORKERS, thread_name_prefix="speculative")
+
+
+def _grounded_schema_info(schema_info: Dict[str, Any], grounded_schema: str) -> Dict[str, Any]:
+    """The ingested schema restricted to the grounded tables and columns; all of it if grounding found none."""
+    try:
+        grounded = json.loads(grounded_schema or "{}")
+    except ValueError:
+        grounded = {}
+    if not isinstance(grounded, dict) or not grounded:
+        return schema_info
+    restricted = {}
+    for table, columns in grounded.items():
+        details = schema_info.get(table)
+        if details:
+            allowed = {name.lower() for name in columns}
+            restricted[table] = {**details, "columns": [col for col in details.get("columns", []) if col["name"].lower() in allowed]}
+    return restricted
+
+
+def speculative_generator(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stage 4+5 (speculative): starts SQL generation on the full schemas of the
+    selected tables while column grounding runs. When both are done, a
+    speculative query that only uses the grounded tables and columns is kept
+    (saving the generation time that would have followed grounding);
+    otherwise generation is redone on the grounded schema as usual.
+
+    Both run in a copy of the node's context, so with stream_tokens the
+    speculative SQL streams like the generator's; a rejected speculation is
+    followed by a {"node": "generator", "restart": True} event before the
+    regenerated tokens.
+    """
+    connection_id = state["connection_id"]
+    selected_tables = state.get("selected_tables", [])
+    schema_info = load_schema(connection_id)
+
+    column_candidates = state.get("column_candidates") or {}
+    full_schema = {
+        table: [col["name"] for col in ordered_columns(schema_info[table], column_candidates.get(table, []))]
+        for table in selected_tables if table in schema_info
+    }
+
+    print(f"DEBUG: Stage 4 - Speculative generation on {list(full_schema)} while grounding")
+    # One context copy per task: a context cannot be entered by two threads at once
+    grounding = _pool.submit(copy_context().run, column_grounder, state)
+    speculative = _pool.submit(
+        copy_context().run, sql_repair_agent, {**state, "grounded_schema": json.dumps(full_schema)}
+    )
+
+    try:
+        result = speculative.result()
+    except Exception as e:
+        print(f"WARN: Speculative generation failed: {e}")
+        result = {}
+    grounded = grounding.result()
+
+    sql = result.get("sql_query")
+    if sql:
+        grounded_info = _grounded_schema_info(schema_info, grounded.get("grounded_schema"))
+        is_valid, message = check_sql_against_schema(sql, grounded_info, db_connector.sqlglot_dialect(state.get("db_type")))
+        if is_valid:
+            metrics.increment("speculative_generation", outcome="accepted")
+            print("DEBUG: Speculative SQL accepted")
+            return {**grounded, "sql_query": sql}
+        print(f"DEBUG: Speculative SQL rejected: {message}")
+        metrics.increment("speculative_generation", outcome="rejected")
+        if state.get("stream_tokens"):
+            restart_stream("generator")
+    else:
+        metrics.increment("speculative_generation", outcome="failed")
+
+    return {**grounded, **sql_repair_agent({**state, **grounded})}
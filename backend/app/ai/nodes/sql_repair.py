@@ -1,14 +1,41 @@
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from app.ai.utils.llm_factory import get_llm
+from app.core.config import settings
+from app.schema_ingestion.catalog import load_schema
+from app.services.db_connector import db_connector
+from app.services.metrics import metrics
+from app.sql_guardrails.local_repair import repair_locally
+
+def _local_repair(state: dict) -> Optional[str]:
+    """Schema-aware deterministic fix, or None when the LLM is needed."""
+    connection_id = state.get("connection_id")
+    if not settings.SQL_LOCAL_REPAIR_ENABLED or connection_id is None:
+        return None
+    try:
+        repaired, fixes = repair_locally(
+            state.get("sql_query"),
+            state.get("error") or "",
+            load_schema(connection_id),
+            db_connector.sqlglot_dialect(state.get("db_type")),
+        )
+    except Exception as e:
+        print(f"WARN: Local SQL repair failed: {e}")
+        return None
+    if repaired:
+        print(f"DEBUG: SQL repaired locally ({'; '.join(fixes)}): {repaired}")
+    return repaired
 
 def repair_sql_query(state: dict) -> dict:
     """
-    Repairs a failed SQL query using an LLM.
+    Repairs a failed SQL query: common schema and dialect mistakes are fixed
+    locally, everything else goes to the LLM.
     
     Expected state keys:
     - sql_query: The failed SQL
     - error: The error message
-    - connection_id: (Optional) to get dialect context if needed
+    - connection_id: (Optional) enables the local repair tier
+    - db_type: (Optional) target database type, selects the SQL dialect
     
     Returns:
     - cleaned_sql: The fixed SQL
@@ -17,7 +44,13 @@ def repair_sql_query(state: dict) -> dict:
     error_msg = state.get("error")
     user = state.get("user")
     
-    llm = get_llm(user=user)
+    repaired = _local_repair(state)
+    if repaired:
+        metrics.increment("sql_repair", tier="local")
+        return {"sql_query": repaired}
+    metrics.increment("sql_repair", tier="llm")
+    
+    llm = get_llm(user=user, node="sql_repair", connection_settings=state.get("llm_settings"))
     
     system_prompt = """You are an expert SQL Database Administrator.
     Your task is to fix a SQL query that failed to execute on a MySQL 8.x database.
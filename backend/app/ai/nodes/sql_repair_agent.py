@@ -1,8 +1,26 @@
 from typing import Dict, Any
-from langchain_core.messages import SystemMessage, HumanMessage
-from app.ai.utils.llm_factory import get_llm
+from langchain_core.messages import HumanMessage
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.token_stream import invoke_streaming
+from app.ai.utils.prompt_builder import build_schema_context, model_name, record_usage
+from app.core.config import settings
+from app.schema_ingestion.catalog import load_schema
 import json
 
+
+def _compact_grounded_schema(grounded: Dict[str, Any], connection_id: int, model) -> str:
+    """One line per grounded table with column types and key markers from the ingested schema."""
+    schema_info = load_schema(connection_id)
+    tables = []
+    for table, column_names in grounded.items():
+        details = schema_info.get(table) or {"columns": [], "foreign_keys": []}
+        by_name = {col["name"]: col for col in details.get("columns", [])}
+        columns = [by_name.get(name, {"name": name}) for name in column_names]
+        # Only the grounded columns are allowed, so nothing is reported as hidden
+        tables.append((table, {**details, "columns": columns}, columns))
+    return build_schema_context(tables, settings.GENERATION_SCHEMA_TOKEN_BUDGET, model)
+
+
 def sql_repair_agent(state: Dict[str, Any]):
     """
     Enhanced SQL Generator with Repair capabilities.
@@ -11,22 +29,37 @@ def sql_repair_agent(state: Dict[str, Any]):
     question = state["question"]
     grounded_schema = state.get("grounded_schema", "{}")
     user = state.get("user")
-    llm = get_llm(user)
+    llm = get_llm(user, node="generator", connection_settings=state.get("llm_settings"))
     last_error = state.get("last_error")
     
     # Check if grounded schema is valid
     try:
         schema_dict = json.loads(grounded_schema)
-        # Convert back to readable string for prompt
-        formatted_schema = json.dumps(schema_dict, indent=2)
-    except:
+        formatted_schema = _compact_grounded_schema(schema_dict, state["connection_id"], model_name(llm))
+    except Exception:
         formatted_schema = grounded_schema
 
+    join_paths = state.get("join_paths") or []
+    join_section = ""
+    if join_paths:
+        conditions = "\n    ".join(
+            "- " + " AND ".join(
+                f"{join['left_table']}.{left} = {join['right_table']}.{right}"
+                for left, right in zip(join["left_columns"], join["right_columns"])
+            )
+            for join in join_paths
+        )
+        join_section = f"""Join Paths (foreign keys; use these conditions to join the tables, do not invent others):
+    {conditions}
+    """
+
     instruction = "Generate a SQL query to answer the user's question."
     
     if last_error:
+        failed_sql = f"Failed SQL: {state['sql_query']}" if state.get("sql_query") else ""
         instruction = f"""
         PREVIOUS ATTEMPT FAILED.
+        {failed_sql}
         Error Message: {last_error}
         
         CORRECT THE SQL QUERY based on the error.
@@ -34,18 +67,14 @@ def sql_repair_agent(state: Dict[str, Any]):
         - If the error says "Column doesn't exist", use the correct column name.
         """
 
-    prompt = f"""
+    # Static instructions, then the schema block, then the per-question part,
+    # so the provider can reuse the cached prefix
+    static_prompt = """
     You are an expert SQL generator for PostgreSQL.
     
-    STRICT CONSTRAINT: You must ONLY use the tables and columns defined in the Allowed Schema below.
+    STRICT CONSTRAINT: You must ONLY use the tables and columns defined in the Allowed Schema.
     Do NOT assume other columns exist.
     
-    Allowed Schema:
-    {formatted_schema}
-    
-    {instruction}
-    Question: "{question}"
-    
     Rules:
     1. Generate ONLY the SQL query. No markdown, no explanation.
     2. Use only SELECT statements (unless intent is Update/Delete, but start with Select).
@@ -53,12 +82,23 @@ def sql_repair_agent(state: Dict[str, Any]):
     4. If the question cannot be answered with the Allowed Schema, return "ERROR: Insufficient schema context".
     """
     
+    schema_block = f"""
+    Allowed Schema (one table per line: table(column type [PK] [FK->table.column], ...)):
+    {formatted_schema}
+    
+    {join_section}"""
+    
+    human_prompt = f"""{instruction}
+    Question: "{question}"
+    """
+    
     messages = [
-        SystemMessage(content=prompt),
-        HumanMessage(content=question)
+        cached_system_message(llm, static_prompt, schema_block),
+        HumanMessage(content=human_prompt)
     ]
     
-    response = llm.invoke(messages)
+    response = invoke_streaming(llm, messages, "generator", enabled=state.get("stream_tokens", False))
+    record_usage("generator", response, static_prompt + schema_block + human_prompt, model_name(llm))
     sql_query = response.content.strip()
     
     # Simple markdown cleanup
@@ -2,51 +2,199 @@ from typing import Dict, Any, List
 from langchain_community.vectorstores import Chroma
 from app.core.config import settings
 from app.ai.utils.llm_factory import get_embeddings
-import json
+from app.rag.lexical_index import lexical_indexes, reciprocal_rank_fusion
+from app.schema_ingestion.join_graph import join_graphs
+from app.schema_ingestion.catalog import table_count
+from app.services.metrics import metrics
+
+
+def _vector_candidates(question: str, connection_id: int, k: int) -> List[str]:
+    embeddings = get_embeddings()
+    vector_store = Chroma(
+        collection_name=f"schema_conn_{connection_id}",
+        embedding_function=embeddings,
+        persist_directory=settings.CHROMA_PERSIST_DIRECTORY
+    )
+    docs = vector_store.similarity_search(question, k=k)
+
+    # Extract table names
+    ranked = []
+    for doc in docs:
+        # Metadata should have 'table_name'
+        table_name = doc.metadata.get("table_name")
+        if table_name and table_name not in ranked:
+            ranked.append(table_name)
+    return ranked
+
+
+def _column_candidates(question: str, connection_id: int, k: int) -> Dict[str, List[str]]:
+    """Column-level hits grouped by table, best first (only wide tables are indexed per column)."""
+    embeddings = get_embeddings()
+    vector_store = Chroma(
+        collection_name=f"schema_cols_conn_{connection_id}",
+        embedding_function=embeddings,
+        persist_directory=settings.CHROMA_PERSIST_DIRECTORY
+    )
+    if not vector_store.get(limit=1, include=[])["ids"]:
+        return {}
+    docs = vector_store.similarity_search(question, k=k)
+
+    by_table: Dict[str, List[str]] = {}
+    for doc in docs:
+        table_name = doc.metadata.get("table_name")
+        column_name = doc.metadata.get("column_name")
+        if table_name and column_name:
+            columns = by_table.setdefault(table_name, [])
+            if column_name not in columns:
+                columns.append(column_name)
+    return by_table
+
+
+def _expand_along_foreign_keys(fused: Dict[str, float], exact: List[str], connection_id: int) -> None:
+    """
+    Adds tables within a few foreign keys of the top candidates (bridge/junction
+    tables rarely resemble the question text), weighted by the seeds' scores.
+    """
+    graph = join_graphs.get(connection_id)
+    if graph is None or (not fused and not exact):
+        return
+    top_score = max(fused.values(), default=1.0)
+    ranked = sorted(fused, key=fused.get, reverse=True)[:settings.RETRIEVAL_MAX_CANDIDATES]
+    seeds = {table: fused[table] for table in ranked}
+    for table in exact:
+        seeds[table] = max(seeds.get(table, 0.0), top_score)
+    expanded = graph.expand(seeds, settings.RETRIEVAL_FK_EXPANSION_HOPS, settings.RETRIEVAL_FK_EXPANSION_DECAY)
+    for table, weight in expanded.items():
+        fused[table] = fused.get(table, 0.0) + weight
+
+
+def _adaptive_cut(fused: Dict[str, float], pinned: List[str], total_tables: int) -> List[str]:
+    """
+    Keeps candidates scoring close to the best one: a clear winner yields a short
+    list for the LLM scorer, a flat distribution keeps up to RETRIEVAL_MAX_CANDIDATES.
+    """
+    ranked = sorted(fused, key=fused.get, reverse=True)
+    if total_tables <= settings.RETRIEVAL_MAX_CANDIDATES:
+        return ranked
+
+    top_score = fused[ranked[0]] if ranked else 0.0
+    candidates = list(pinned)
+    for table in ranked:
+        if table in candidates:
+            continue
+        if len(candidates) >= settings.RETRIEVAL_MAX_CANDIDATES:
+            break
+        if len(candidates) >= settings.RETRIEVAL_MIN_CANDIDATES and fused[table] < settings.RETRIEVAL_RELATIVE_CUTOFF * top_score:
+            break
+        candidates.append(table)
+    return candidates
+
+
+def _small_schema_candidates(question: str, connection_id: int) -> Dict[str, Any]:
+    """
+    Fast path for schemas no larger than the candidate list: every table is a
+    candidate, so the embedding call and vector search are skipped. Tables are
+    ordered by the lexical index only; very small schemas also skip LLM scoring.
+    """
+    index = lexical_indexes.get(connection_id)
+    if index is None:
+        return {"candidate_tables": []}
+
+    exact = index.exact_matches(question)
+    fused = reciprocal_rank_fusion(
+        [[table for table, _ in index.bm25(question, len(index))],
+         [table for table, _ in index.trigram(question, len(index))]],
+        settings.RETRIEVAL_RRF_K
+    )
+    for table in exact:
+        fused[table] = fused.get(table, 0.0) + 1.0
+    # Stable sort keeps catalog order for tables without lexical hits
+    tables = sorted(index.tables, key=lambda table: -fused.get(table, 0.0))
+
+    result: Dict[str, Any] = {"candidate_tables": tables}
+    if len(tables) <= settings.SMALL_SCHEMA_SKIP_SCORING_MAX_TABLES:
+        result["selected_tables"] = tables
+        result["confidence_score"] = 1.0
+    return result
+
 
 def table_candidate_retriever(state: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Stage 1: Fast initial retrieval using vector search.
+    Stage 1: Fast initial retrieval using hybrid lexical + vector search.
     Goal: Narrow 100+ tables -> Top-K (e.g. 10) candidates.
+    Vector hits (table and column level), BM25 hits over table/column names and
+    trigram (fuzzy name) hits are merged with reciprocal rank fusion, then expanded
+    along foreign keys; tables named verbatim in the question are always kept.
+    Column hits are passed on to grounding.
     """
     question = state["question"]
     connection_id = state["connection_id"]
-    
+
     print(f"DEBUG: Stage 1 - Retrieving candidates for connection {connection_id}")
-    
+
+    try:
+        total = table_count(connection_id)
+        if total is not None and total <= settings.RETRIEVAL_MAX_CANDIDATES:
+            result = _small_schema_candidates(question, connection_id)
+            if result["candidate_tables"]:
+                metrics.increment("retrieval.small_schema_fast_path")
+                print(f"DEBUG: Small schema ({total} tables), skipping vector search: {result['candidate_tables']}")
+                return result
+    except Exception as e:
+        print(f"WARN: Small schema fast path failed, using full retrieval: {e}")
+
+    rankings: List[List[str]] = []
+    errors = []
+
+    try:
+        rankings.append(_vector_candidates(question, connection_id, settings.RETRIEVAL_VECTOR_K))
+    except Exception as e:
+        print(f"ERROR: Vector candidate retrieval failed: {e}")
+        errors.append(str(e))
+
+    column_candidates: Dict[str, List[str]] = {}
     try:
-        # Initialize Vector Store
-        embeddings = get_embeddings()
-        vector_store = Chroma(
-            collection_name=f"schema_conn_{connection_id}",
-            embedding_function=embeddings,
-            persist_directory=settings.CHROMA_PERSIST_DIRECTORY
-        )
-        
-        # Retrieve more candidates than usual (high recall)
-        # We want to catch everything relevant, even if score is lower
-        k = 12 
-        docs = vector_store.similarity_search(question, k=k)
-        
-        # Extract table names
-        candidate_tables = []
-        seen = set()
-        
-        for doc in docs:
-            # Metadata should have 'table_name'
-            table_name = doc.metadata.get("table_name")
-            if table_name and table_name not in seen:
-                candidate_tables.append(table_name)
-                seen.add(table_name)
-        
-        print(f"DEBUG: Found {len(candidate_tables)} candidates: {candidate_tables}")
-        
-        return {
-            "candidate_tables": candidate_tables
-        }
-        
+        column_candidates = _column_candidates(question, connection_id, settings.RETRIEVAL_COLUMN_K)
+        if column_candidates:
+            # Dict order follows the best column hit per table
+            rankings.append(list(column_candidates))
     except Exception as e:
-        print(f"ERROR: Candidate retrieval failed: {e}")
-        # Fallback: If DB has few tables, maybe return all? 
-        # For now return empty, downstream might fail or fallback
-        return {"candidate_tables": [], "error": str(e)}
+        print(f"WARN: Column-level retrieval failed: {e}")
+
+    exact: List[str] = []
+    total_tables = 0
+    try:
+        index = lexical_indexes.get(connection_id)
+        if index is not None:
+            total_tables = len(index)
+            exact = index.exact_matches(question)
+            rankings.append([table for table, _ in index.bm25(question, settings.RETRIEVAL_LEXICAL_K)])
+            rankings.append([table for table, _ in index.trigram(question, settings.RETRIEVAL_LEXICAL_K)])
+    except Exception as e:
+        print(f"ERROR: Lexical candidate retrieval failed: {e}")
+        errors.append(str(e))
+
+    fused = reciprocal_rank_fusion(rankings, settings.RETRIEVAL_RRF_K)
+    try:
+        _expand_along_foreign_keys(fused, exact, connection_id)
+    except Exception as e:
+        print(f"WARN: Foreign key expansion failed: {e}")
+
+    # Exact-name boost: a literal mention outranks any fused score
+    for table in exact:
+        fused[table] = fused.get(table, 0.0) + 1.0
+
+    if not fused:
+        # Nothing usable from either retriever
+        if errors:
+            return {"candidate_tables": [], "error": "; ".join(errors)}
+        return {"candidate_tables": []}
+
+    candidate_tables = _adaptive_cut(fused, exact, total_tables or len(fused))
+    metrics.observe("retrieval.candidates", len(candidate_tables))
+    print(f"DEBUG: Found {len(candidate_tables)} candidates (exact: {exact}): {candidate_tables}")
+
+    return {
+        "candidate_tables": candidate_tables,
+        "column_candidates": {t: cols for t, cols in column_candidates.items() if t in candidate_tables}
+    }
@@ -1,8 +1,16 @@
 from typing import Dict, Any, List
-from langchain_core.prompts import ChatPromptTemplate
-from app.ai.utils.llm_factory import get_llm
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, Field
+from app.ai.utils.llm_factory import get_llm, cached_system_message
+from app.ai.utils.structured_output import invoke_structured
 import json
 
+
+class TableSelection(BaseModel):
+    selected_tables: List[str] = Field(description="Tables required to answer the question")
+    reasoning: str = Field(default="", description="Brief explanation")
+    confidence_score: float = Field(default=0.5, description="0.0 - 1.0")
+
 def table_relevance_scorer(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Stage 2: LLM-based ranking of candidates.
@@ -18,7 +26,7 @@ def table_relevance_scorer(state: Dict[str, Any]) -> Dict[str, Any]:
 
     print(f"DEBUG: Stage 2 - Scoring {len(candidates)} candidates")
     
-    llm = get_llm(user=user)
+    llm = get_llm(user=user, node="relevance_scorer", connection_settings=state.get("llm_settings"))
     
     # We ideally need table signatures/descriptions here.
     # For now we'll assume the names are descriptive enough, 
@@ -42,42 +50,23 @@ def table_relevance_scorer(state: Dict[str, Any]) -> Dict[str, Any]:
       - "confidence_score": Float between 0.0 and 1.0 depending on how well the tables match the question.
     """
     
-    human_prompt = f"""Question: {question}
+    human_prompt = f"""Candidate Tables:
+    {json.dumps(candidates)}
     
-    Candidate Tables:
-    {json.dumps(candidates, indent=2)}
+    Question: {question}
     
     Return JSON:"""
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("user", human_prompt),
-    ])
-    
-    chain = prompt | llm
-    
     try:
-        response = chain.invoke({})
-        content = response.content
-        print(f"DEBUG: Scorer Raw LLM Output: {content}")
-        
-        # Robust JSON extraction
-        try:
-            # Try to find JSON block
-            import re
-            json_match = re.search(r"\{.*\}", content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                result = json.loads(json_str)
-            else:
-                # If no JSON found, try standard cleaning
-                cleaned = content.replace("```json", "").replace("```", "").strip()
-                result = json.loads(cleaned)
-        except json.JSONDecodeError:
-            print(f"ERROR: Could not parse JSON from: {content}")
-            raise
+        result = invoke_structured(
+            llm,
+            [cached_system_message(llm, system_prompt), HumanMessage(content=human_prompt)],
+            TableSelection,
+            node="relevance_scorer",
+        )
+        print(f"DEBUG: Scorer Result: {result}")
         
-        selected = result.get("selected_tables", [])
+        selected = result.selected_tables
         # Filter to ensure we only return tables that were in candidates (hallucination check)
         valid_selected = [t for t in selected if t in candidates]
         
@@ -85,7 +74,7 @@ def table_relevance_scorer(state: Dict[str, Any]) -> Dict[str, Any]:
         
         return {
             "selected_tables": valid_selected,
-            "confidence_score": result.get("confidence_score", 0.5)
+            "confidence_score": min(max(result.confidence_score, 0.0), 1.0)
         }
         
     except Exception as e:
@@ -0,0 +1,157 @@
+"""
+Local intent classification tiers tried before the LLM.
+
+1. Rules: keyword/regex patterns for questions whose intent is obvious
+   ("how many orders ...", "delete user 42"). Microseconds, no I/O.
+2. Nearest centroid (opt-in): embeds the question and compares it with the
+   mean embedding of each intent over labeled QueryHistory rows.
+
+Intent decides RBAC (whether a query needs approval), so the local tiers
+never answer READ or OTHER for a question containing a write-like word;
+those always go to the next tier.
+"""
+import math
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+VALID_INTENTS = ["READ", "UPDATE_SINGLE", "UPDATE_MULTI", "DELETE", "OTHER"]
+
+_PREFIX = r"^(?:(?:please|kindly|can you|could you|would you|i want to|i need to|i'd like to|let'?s|go ahead and)\s+)*"
+_DELETE_START = re.compile(_PREFIX + r"(?:delete|remove|drop|truncate|purge|erase|wipe)\b")
+_UPDATE_START = re.compile(
+    _PREFIX + r"(?:update|change|set|modify|rename|increase|decrease|raise|mark|assign|edit|correct|reset|deactivate|activate)\b"
+)
+_WRITE_HINT = re.compile(
+    r"\b(?:delete|remove|drop|truncate|purge|erase|wipe|update|change|set|modify|rename|increase|decrease|raise|"
+    r"lower|mark|assign|edit|correct|insert|add|create|alter|replace|reset|deactivate|activate|archive|move|grant|revoke)\b"
+)
+# "drop-off rate", "change in revenue", "increase of signups": the verb is a noun here
+_NOUN_USE = re.compile(r"^(?:-|\s+(?:in|of|off|rate|rates|per|over|by)\b)")
+_READ_VERB = re.compile(r"\b(?:show|list|display|fetch|count|return|select|tell me|how many|what|which)\b")
+_MULTI_SCOPE = re.compile(r"\b(?:all|every|each|everyone|everybody|any|whole)\b")
+_SINGLE_TARGET = re.compile(
+    r"\b(?:id|#|number|no\.?)\s*[:=]?\s*\d+\b|#\d+\b|\b[\w.+-]+@[\w-]+\.[\w.]+\b|'[^']+'|\"[^\"]+\""
+)
+_READ_START = re.compile(
+    r"^(?:show|list|display|get|give|find|fetch|count|how|what|which|who|whom|when|where|is there|are there|"
+    r"do we|does|did|top|sum|total|average|avg|compare|tell me|select|return|search|lookup|look up)\b"
+)
+_GREETING = r"(?:hi|hello|hey|thanks|thank you|thanks a lot|good (?:morning|afternoon|evening))(?:\s+there)?"
+_SMALL_TALK = r"(?:how are you(?: doing)?(?: today)?|who are you|what can you do)"
+# The whole message is small talk, trailing punctuation allowed
+_CHIT_CHAT = re.compile(r"^(?:" + _GREETING + r"[\s,!.]*)*(?:" + _SMALL_TALK + r")?[\s,!.?]*$")
+# "Hello, show me all customers": the greeting is dropped and the rest classified
+_GREETING_PREFIX = re.compile(r"^(?:" + _GREETING + r"[\s,!.]*)+(?:(?:ok|okay|now|so|then)\b[\s,]*)*")
+
+CONFIDENT = 0.95
+
+
+def _is_command(text: str, verb: re.Match) -> bool:
+    """The leading write verb is an instruction: not used as a noun and no read verb follows."""
+    rest = text[verb.end():]
+    return not _NOUN_USE.match(rest) and not _READ_VERB.search(rest)
+
+
+def classify_rules(question: str) -> Tuple[Optional[str], float]:
+    """Returns (intent, confidence); (None, 0.0) when no rule applies."""
+    text = " ".join(question.lower().split())
+    if not text:
+        return None, 0.0
+    if _CHIT_CHAT.match(text):
+        return "OTHER", CONFIDENT
+    text = _GREETING_PREFIX.sub("", text)
+    has_write_word = bool(_WRITE_HINT.search(text))
+
+    delete = _DELETE_START.match(text)
+    if delete:
+        return "DELETE", CONFIDENT if _is_command(text, delete) else 0.5
+    update = _UPDATE_START.match(text)
+    if update:
+        if not _is_command(text, update):
+            return "UPDATE_MULTI", 0.5
+        if _MULTI_SCOPE.search(text):
+            return "UPDATE_MULTI", CONFIDENT
+        if _SINGLE_TARGET.search(text):
+            return "UPDATE_SINGLE", 0.9
+        # Scope unclear ("update the price of the blue shirts")
+        return "UPDATE_MULTI", 0.6
+
+    if has_write_word:
+        # Write verb somewhere else in the sentence: let a stronger tier decide
+        return None, 0.0
+    if _READ_START.match(text):
+        return "READ", CONFIDENT
+    return "READ", 0.5
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class IntentCentroids:
+    """Mean question embedding per intent, built from QueryHistory and refreshed periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._centroids: Dict[str, List[float]] = {}
+        self._built_at: Optional[float] = None
+
+    def _examples(self) -> List[Tuple[str, str]]:
+        from app.db.session import SessionLocal
+        from app.models.query_history import QueryHistory
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(QueryHistory.question, QueryHistory.intent)
+                .filter(QueryHistory.intent.in_(VALID_INTENTS))
+                .order_by(QueryHistory.id.desc())
+                .limit(settings.INTENT_CENTROID_MAX_EXAMPLES)
+                .all()
+            )
+            return [(question, intent) for question, intent in rows]
+        finally:
+            db.close()
+
+    def _build(self, embeddings) -> Dict[str, List[float]]:
+        by_intent: Dict[str, List[str]] = {}
+        for question, intent in self._examples():
+            by_intent.setdefault(intent, []).append(question)
+        centroids = {}
+        for intent, questions in by_intent.items():
+            if len(questions) < settings.INTENT_CENTROID_MIN_EXAMPLES:
+                continue
+            vectors = embeddings.embed_documents(questions)
+            centroids[intent] = [sum(column) / len(vectors) for column in zip(*vectors)]
+        return centroids
+
+    def _current(self, embeddings) -> Dict[str, List[float]]:
+        with self._lock:
+            fresh = self._built_at is not None and time.monotonic() - self._built_at < settings.INTENT_CENTROID_REFRESH_SECONDS
+            if not fresh:
+                self._centroids = self._build(embeddings)
+                self._built_at = time.monotonic()
+            return self._centroids
+
+    def classify(self, question: str, embeddings) -> Tuple[Optional[str], float]:
+        centroids = self._current(embeddings)
+        # Need at least two intents to compare against
+        if len(centroids) < 2:
+            return None, 0.0
+        vector = embeddings.embed_query(question)
+        scored = sorted(((_cosine(vector, c), intent) for intent, c in centroids.items()), reverse=True)
+        (best, intent), (second, _) = scored[0], scored[1]
+        if best < settings.INTENT_CENTROID_MIN_SIMILARITY or best - second < settings.INTENT_CENTROID_MIN_MARGIN:
+            return None, best
+        if intent in ("READ", "OTHER") and _WRITE_HINT.search(question.lower()):
+            return None, best
+        return intent, best
+
+
+intent_centroids = IntentCentroids()
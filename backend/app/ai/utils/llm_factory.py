@@ -4,30 +4,19 @@ from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
-from typing import Optional
+from langchain_core.messages import SystemMessage
+from app.ai.utils.llm_router import LLMRouter, RouteCandidate
+from app.ai.utils.prompt_builder import model_name
+from typing import Any, Dict, Optional
 
-def get_llm(user=None):
-    # Default to system settings
-    provider = settings.LLM_PROVIDER.lower()
-    model = None
-    api_key = None
-    
-    # Overwrite if user has valid config
-    if user and user.llm_provider:
-        provider = user.llm_provider.lower()
-        model = user.llm_model
-        if user.llm_api_key_encrypted:
-            try:
-                api_key = encryptor.decrypt(user.llm_api_key_encrypted)
-            except:
-                pass # Fallback or error? For now fallback or fail naturally.
-
-    print(f"DEBUG: Initializing LLM Provider={provider}, Model={model}, HasKey={bool(api_key)}")
+DEFAULT_TIER = "strong"
 
+def _build_llm(provider: str, model: Optional[str] = None, api_key: Optional[str] = None):
     if provider == "ollama":
         return ChatOllama(
             base_url=settings.OLLAMA_BASE_URL,
-            model=model or settings.OLLAMA_MODEL
+            model=model or settings.OLLAMA_MODEL,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE
         )
     elif provider == "openai":
         return ChatOpenAI(
@@ -47,6 +36,138 @@ def get_llm(user=None):
     else:
         raise ValueError(f"Unsupported LLM provider: {provider}")
 
+def _has_system_credentials(provider: str) -> bool:
+    return {
+        "ollama": True,
+        "openai": bool(settings.OPENAI_API_KEY),
+        "anthropic": bool(settings.ANTHROPIC_API_KEY),
+        "gemini": bool(settings.GOOGLE_API_KEY),
+    }.get(provider, False)
+
+def _route_key(provider: str, llm) -> str:
+    return f"{provider}:{model_name(llm)}"
+
+def connection_llm_settings(conn) -> Dict[str, Any]:
+    """
+    llm_node_tiers / llm_tier_models overrides from a connection's execution_settings.
+    Resolved once per request and carried in the graph state as "llm_settings".
+    """
+    if conn is None:
+        return {}
+    return {
+        "llm_node_tiers": conn.get_setting("llm_node_tiers", {}),
+        "llm_tier_models": conn.get_setting("llm_tier_models", {}),
+    }
+
+def node_tier(node: Optional[str], user=None, connection_settings: Optional[Dict[str, Any]] = None) -> str:
+    """Model tier of a graph node: the user's mapping, then the connection's, then the global one."""
+    if not node:
+        return DEFAULT_TIER
+    for mapping in (
+        getattr(user, "llm_node_tiers", None),
+        (connection_settings or {}).get("llm_node_tiers"),
+        settings.LLM_NODE_TIERS,
+    ):
+        if mapping and mapping.get(node):
+            return mapping[node]
+    return DEFAULT_TIER
+
+def _tier_model(tier: str, provider: str, user=None, connection_settings: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Model for a tier on a provider; None means the provider's default model."""
+    user_provider = (getattr(user, "llm_provider", None) or "").lower()
+    if user_provider == provider and (getattr(user, "llm_tier_models", None) or {}).get(tier):
+        return user.llm_tier_models[tier]
+    for mapping in ((connection_settings or {}).get("llm_tier_models"), settings.LLM_TIER_MODELS):
+        model = ((mapping or {}).get(tier) or {}).get(provider)
+        if model:
+            return model
+    if user_provider == provider:
+        return user.llm_model
+    return None
+
+def get_llm(user=None, node: Optional[str] = None, connection_settings: Optional[Dict[str, Any]] = None):
+    """
+    Chat model for a graph node. The node's tier (fast / strong) picks the
+    model on each provider. With fallback providers configured (globally or
+    for this node) the result is an LLMRouter that fails over, and optionally
+    hedges, across them; otherwise the plain provider model.
+    """
+    tier = node_tier(node, user, connection_settings)
+
+    # Default to system settings
+    providers = [p.lower() for p in settings.LLM_NODE_PROVIDERS.get(node or "", [])] or [settings.LLM_PROVIDER.lower()]
+    api_key = None
+    
+    # Overwrite if user has valid config
+    if user and user.llm_provider:
+        providers = [user.llm_provider.lower()]
+        if user.llm_api_key_encrypted:
+            try:
+                api_key = encryptor.decrypt(user.llm_api_key_encrypted)
+            except:
+                pass # Fallback or error? For now fallback or fail naturally.
+
+    primary = providers[0]
+    model = _tier_model(tier, primary, user, connection_settings)
+    print(f"DEBUG: Initializing LLM Provider={primary}, Model={model}, HasKey={bool(api_key)}, Node={node}, Tier={tier}")
+    llm = _build_llm(primary, model, api_key)
+
+    # Fallbacks always use the system credentials
+    fallbacks = []
+    for provider in providers[1:] + [p.lower() for p in settings.LLM_FALLBACK_PROVIDERS]:
+        if provider == primary or provider in fallbacks:
+            continue
+        if not _has_system_credentials(provider):
+            print(f"WARN: Skipping fallback provider {provider}: no credentials configured")
+            continue
+        fallbacks.append(provider)
+    if not fallbacks:
+        return llm
+
+    candidates = [RouteCandidate(_route_key(primary, llm), llm, llm)]
+    for provider in fallbacks:
+        fallback = _build_llm(provider, _tier_model(tier, provider, user, connection_settings))
+        candidates.append(RouteCandidate(_route_key(provider, fallback), fallback, fallback))
+    return LLMRouter(candidates, node=node, hedging=settings.LLM_HEDGING_ENABLED)
+
+def _is_anthropic(llm) -> bool:
+    if isinstance(llm, LLMRouter):
+        return any(isinstance(c.llm, ChatAnthropic) for c in llm.candidates)
+    return isinstance(llm, ChatAnthropic)
+
+def adapt_messages(llm, messages):
+    """
+    Flattens cache-annotated system blocks to plain text for providers other
+    than Anthropic, so one routed prompt can be sent to any candidate.
+    """
+    if isinstance(llm, ChatAnthropic) or not isinstance(messages, list):
+        return messages
+    adapted = []
+    for message in messages:
+        if isinstance(message, SystemMessage) and isinstance(message.content, list):
+            message = SystemMessage(content="\n\n".join(
+                block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content
+            ))
+        adapted.append(message)
+    return adapted
+
+def cached_system_message(llm, *blocks: str) -> SystemMessage:
+    """
+    System message built from stable blocks (static instructions first, then
+    e.g. the schema of the selected tables), so providers can reuse the prompt
+    prefix across calls. Anthropic needs explicit cache breakpoints; OpenAI
+    caches matching prefixes automatically and Ollama reuses the loaded
+    context while the model stays alive. Per-question text belongs in the
+    human message after it.
+    """
+    blocks = [block for block in blocks if block]
+    if _is_anthropic(llm):
+        return SystemMessage(content=[
+            {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}}
+            for block in blocks
+        ])
+    return SystemMessage(content="\n\n".join(blocks))
+
 from langchain_openai import OpenAIEmbeddings
 from langchain_ollama import OllamaEmbeddings
 
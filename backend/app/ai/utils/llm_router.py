@@ -0,0 +1,314 @@
+"""
+Routes one LLM call across an ordered list of provider models.
+
+- Fallbacks: a failing provider is followed by the next one in the list.
+- Hedging (opt-in): when the current provider has not answered within its
+  observed p95 latency, the next provider is started as well and the first
+  successful answer wins.
+- Circuit breakers: after LLM_CIRCUIT_FAILURE_THRESHOLD consecutive failures a
+  provider is skipped for LLM_CIRCUIT_RESET_SECONDS, then half-open: a single
+  probe call closes the breaker on success or reopens it on failure.
+- Rate limits: a 429 puts the provider in exponential backoff (or the
+  Retry-After the provider sent) without counting as a breaker failure.
+
+Without hedging the candidates are called inline, one after the other. Hedged
+calls run on a shared thread pool, in a copy of the caller's context so the
+run config and callbacks follow them, so a hedge can start while the first
+call is still in flight; answers arriving after the winner are discarded.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+
+# Minimum latency samples before p95 is trusted for hedging
+_MIN_LATENCY_SAMPLES = 10
+
+
+class ProviderHealth:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: deque = deque(maxlen=100)
+        self.consecutive_failures = 0
+        self.tripped = False  # Breaker open, or half-open once open_until has passed
+        self.open_until = 0.0
+        self.probing = False  # A half-open probe call is in flight
+        self.rate_limited = 0
+        self.backoff_until = 0.0
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        if now < self.backoff_until:
+            return False
+        return not self.tripped or (now >= self.open_until and not self.probing)
+
+    def acquire(self) -> bool:
+        """Claims a call: always while closed, only the single probe while half-open."""
+        with self._lock:
+            if not self.available():
+                return False
+            if self.tripped:
+                self.probing = True
+            return True
+
+    def release(self) -> None:
+        """Gives back an acquired call that ended without an outcome."""
+        with self._lock:
+            self.probing = False
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < _MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            self.consecutive_failures = 0
+            self.tripped = False
+            self.probing = False
+            self.rate_limited = 0
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure opened the breaker."""
+        with self._lock:
+            self.probing = False
+            if self.tripped:
+                # The half-open probe failed: one failure reopens the breaker
+                self.open_until = time.monotonic() + settings.LLM_CIRCUIT_RESET_SECONDS
+                return True
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.LLM_CIRCUIT_FAILURE_THRESHOLD:
+                self.tripped = True
+                self.open_until = time.monotonic() + settings.LLM_CIRCUIT_RESET_SECONDS
+                self.consecutive_failures = 0
+                return True
+            return False
+
+    def record_rate_limit(self, retry_after: Optional[float]) -> float:
+        with self._lock:
+            self.probing = False
+            self.rate_limited += 1
+            delay = retry_after or min(
+                settings.LLM_RATE_LIMIT_BACKOFF_SECONDS * 2 ** (self.rate_limited - 1),
+                settings.LLM_RATE_LIMIT_BACKOFF_MAX_SECONDS,
+            )
+            self.backoff_until = time.monotonic() + delay
+            return delay
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def provider_health(key: str) -> ProviderHealth:
+    with _health_lock:
+        if key not in _health:
+            _health[key] = ProviderHealth()
+        return _health[key]
+
+
+# Rate-limit exception classes of the provider SDKs (openai, anthropic, google-api-core)
+_RATE_LIMIT_ERRORS = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+
+
+def _rate_limit_delay(error: Exception) -> Optional[float]:
+    """None if the error is not a rate limit, else the Retry-After in seconds (0 when absent)."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None) or getattr(error, "code", None)
+    is_rate_limit = status == 429 or any(cls.__name__ in _RATE_LIMIT_ERRORS for cls in type(error).__mro__)
+    if not is_rate_limit:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RouteCandidate:
+    def __init__(self, key: str, runnable: Any, llm: Any):
+        self.key = key  # "provider:model", shared health across requests
+        self.runnable = runnable  # What gets invoked (the model or e.g. its structured-output wrapper)
+        self.llm = llm  # The underlying chat model
+
+
+class LLMRouter(Runnable):
+    """Invokes the first healthy candidate, falling back (and optionally hedging) to the others."""
+
+    def __init__(self, candidates: List[RouteCandidate], node: Optional[str] = None, hedging: bool = False):
+        self.candidates = candidates
+        self.node = node or "default"
+        self.hedging = hedging
+
+    @property
+    def primary(self):
+        return self.candidates[0].llm
+
+    def __getattr__(self, name):
+        # model_name, model, ... of the primary model
+        if name == "candidates":
+            raise AttributeError(name)
+        return getattr(self.candidates[0].llm, name)
+
+    def map(self, fn: Callable[[Any], Any]) -> "LLMRouter":
+        """Router over fn(llm) for every candidate, e.g. structured-output wrappers."""
+        return LLMRouter(
+            [RouteCandidate(c.key, fn(c.llm), c.llm) for c in self.candidates], node=self.node, hedging=self.hedging
+        )
+
+    def with_structured_output(self, schema, **kwargs) -> "LLMRouter":
+        return self.map(lambda llm: llm.with_structured_output(schema, **kwargs))
+
+    def _call(self, candidate: RouteCandidate, input: Any, kwargs: Dict[str, Any]):
+        from app.ai.utils.llm_factory import adapt_messages
+
+        started = time.perf_counter()
+        try:
+            result = candidate.runnable.invoke(adapt_messages(candidate.llm, input), **kwargs)
+        except Exception as e:
+            self._record_error(candidate, e)
+            raise
+        seconds = time.perf_counter() - started
+        # Recorded here so a hedge that loses the race still counts (and ends its probe)
+        provider_health(candidate.key).record_success(seconds)
+        return result, seconds
+
+    def _claimed(self) -> Iterator[RouteCandidate]:
+        """
+        Candidates in order, each claimed just before it is handed out: open
+        breakers, backed-off providers and taken half-open probes are skipped.
+        If none could be claimed, the primary anyway.
+        """
+        claimed_any = False
+        for candidate in self.candidates:
+            if provider_health(candidate.key).acquire():
+                claimed_any = True
+                yield candidate
+        if not claimed_any:
+            yield self.candidates[0]
+
+    def _won(self, candidate: RouteCandidate, seconds: float) -> None:
+        metrics.observe("llm.router.latency_seconds", seconds, provider=candidate.key, node=self.node)
+        if candidate is not self.candidates[0]:
+            metrics.increment("llm.router.fallback_used", provider=candidate.key, node=self.node)
+
+    def stream(self, input: Any, config: Any = None, **kwargs):
+        """Streams from the first healthy candidate; falls back only if nothing was yielded yet."""
+        from app.ai.utils.llm_factory import adapt_messages
+
+        last_error: Optional[Exception] = None
+        for candidate in self._claimed():
+            started = time.perf_counter()
+            yielded = False
+            finished = False
+            try:
+                for chunk in candidate.runnable.stream(adapt_messages(candidate.llm, input), config, **kwargs):
+                    yielded = True
+                    yield chunk
+                finished = True
+            except Exception as e:
+                finished = True
+                self._record_error(candidate, e)
+                if yielded:
+                    raise
+                last_error = e
+                continue
+            finally:
+                if not finished:
+                    # The consumer stopped reading mid-stream
+                    provider_health(candidate.key).release()
+            seconds = time.perf_counter() - started
+            provider_health(candidate.key).record_success(seconds)
+            self._won(candidate, seconds)
+            return
+        raise last_error
+
+    def _record_error(self, candidate: RouteCandidate, error: Exception) -> None:
+        health = provider_health(candidate.key)
+        retry_after = _rate_limit_delay(error)
+        if retry_after is not None:
+            delay = health.record_rate_limit(retry_after or None)
+            metrics.increment("llm.router.rate_limited", provider=candidate.key)
+            print(f"WARN: {candidate.key} rate limited, backing off {delay:.1f}s")
+        elif health.record_failure():
+            metrics.increment("llm.router.circuit_opened", provider=candidate.key)
+            print(f"WARN: Circuit opened for {candidate.key}")
+        metrics.increment("llm.router.failures", provider=candidate.key, node=self.node)
+        print(f"WARN: LLM call to {candidate.key} failed: {error}")
+
+    def _hedge_delay(self, candidate: RouteCandidate) -> float:
+        p95 = provider_health(candidate.key).p95()
+        if p95 is None:
+            return settings.LLM_HEDGE_MAX_DELAY_SECONDS
+        return min(max(p95, settings.LLM_HEDGE_MIN_DELAY_SECONDS), settings.LLM_HEDGE_MAX_DELAY_SECONDS)
+
+    def invoke(self, input: Any, config: Any = None, **kwargs):
+        if config is not None:
+            kwargs["config"] = config
+        if self.hedging and len(self.candidates) > 1:
+            return self._invoke_hedged(input, kwargs)
+
+        # No hedge possible: call inline, in the caller's thread and context
+        last_error: Optional[Exception] = None
+        for candidate in self._claimed():
+            try:
+                result, seconds = self._call(candidate, input, kwargs)
+            except Exception as e:
+                last_error = e
+                continue
+            self._won(candidate, seconds)
+            return result
+        raise last_error
+
+    def _invoke_hedged(self, input: Any, kwargs: Dict[str, Any]):
+        candidates = self._claimed()
+        pending = {}
+        last_error: Optional[Exception] = None
+
+        def start_next() -> Optional[RouteCandidate]:
+            candidate = next(candidates, None)
+            if candidate is not None:
+                # A context copy per call: one context cannot be entered by two threads at once
+                future = _pool.submit(copy_context().run, self._call, candidate, input, kwargs)
+                pending[future] = candidate
+            return candidate
+
+        current = start_next()
+        exhausted = False
+        while pending:
+            timeout = None if exhausted else self._hedge_delay(current)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge = start_next()
+                if hedge is None:
+                    exhausted = True
+                    continue
+                metrics.increment("llm.router.hedged", provider=current.key, node=self.node)
+                print(f"DEBUG: {current.key} slower than {timeout:.1f}s, hedging with {hedge.key}")
+                current = hedge
+                continue
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                self._won(candidate, seconds)
+                return result
+            if not pending and not exhausted:
+                current = start_next()
+                exhausted = current is None
+        raise last_error
@@ -0,0 +1,143 @@
+"""
+Schema context for prompts: compact notation, token counting and budgets.
+A table renders as
+    orders(id int PK, customer_id int FK->customers.id, total numeric, ... +12 more)
+Columns are listed in relevance order, so truncating to the budget drops the
+least relevant ones first. Token usage per node is reported to the metrics
+registry.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.metrics import metrics
+
+# Rough characters per token when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        # Not exact for Anthropic, Gemini or Llama tokenizers, but within ~15% for schema text
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use; offline deployments estimate from length
+        print(f"WARN: tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def model_name(llm) -> Optional[str]:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _references(details: Dict[str, Any]) -> Dict[str, str]:
+    references = {}
+    for fk in details.get("foreign_keys", []):
+        for local, remote in zip(fk["constrained_columns"], fk["referred_columns"]):
+            references[local] = f"{fk['referred_table']}.{remote}"
+    return references
+
+
+def _short_type(col_type: Any) -> str:
+    # VARCHAR(255) COLLATE "utf8mb4_unicode_ci" -> varchar(255)
+    return str(col_type or "").split(" ")[0].lower()
+
+
+def ordered_columns(details: Dict[str, Any], relevant: Sequence[str] = ()) -> List[Dict[str, Any]]:
+    """Relevant columns first (in the given order), then key columns, then the rest in catalog order."""
+    columns = details.get("columns", [])
+    by_name = {col["name"]: col for col in columns}
+    references = _references(details)
+    ordered = [by_name[name] for name in dict.fromkeys(relevant) if name in by_name]
+    seen = {col["name"] for col in ordered}
+    keys = [col for col in columns if col["name"] not in seen and (col.get("primary_key") or col["name"] in references)]
+    seen.update(col["name"] for col in keys)
+    return ordered + keys + [col for col in columns if col["name"] not in seen]
+
+
+def compact_table(table: str, details: Dict[str, Any], columns: List[Dict[str, Any]], total: Optional[int] = None) -> str:
+    references = _references(details)
+    parts = []
+    for col in columns:
+        part = f"{col['name']} {_short_type(col.get('type'))}".rstrip()
+        if col.get("primary_key"):
+            part += " PK"
+        if col["name"] in references:
+            part += f" FK->{references[col['name']]}"
+        parts.append(part)
+    hidden = (total if total is not None else len(details.get("columns", []))) - len(columns)
+    if hidden > 0:
+        parts.append(f"... +{hidden} more")
+    return f"{table}({', '.join(parts)})"
+
+
+def build_schema_context(
+    tables: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]],
+    budget: int,
+    model: Optional[str] = None,
+    min_columns: int = 3,
+) -> str:
+    """
+    Renders (table, details, ordered columns) tuples, most relevant table first,
+    within `budget` tokens. Columns are dropped from the end of the widest tables
+    until the text fits; every table keeps at least `min_columns`.
+    """
+    shown = [list(columns) for _, _, columns in tables]
+
+    def render() -> str:
+        return "\n".join(
+            compact_table(table, details, shown[i])
+            for i, (table, details, _) in enumerate(tables)
+        )
+
+    text = render()
+    tokens = count_tokens(text, model)
+    while tokens > budget:
+        widest = max(range(len(shown)), key=lambda i: len(shown[i]), default=None)
+        if widest is None or len(shown[widest]) <= min_columns:
+            break
+        # Drop proportionally to the overshoot so very wide schemas converge quickly
+        excess = max(1, int(len(shown[widest]) * (tokens - budget) / max(tokens, 1)))
+        shown[widest] = shown[widest][:max(min_columns, len(shown[widest]) - excess)]
+        text = render()
+        tokens = count_tokens(text, model)
+    return text
+
+
+def record_usage(node: str, response: Any, prompt_text: str = "", model: Optional[str] = None) -> None:
+    """Tokens in/out for one LLM call: provider-reported usage, else counted locally."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    tokens_in = usage.get("input_tokens")
+    tokens_out = usage.get("output_tokens")
+    if tokens_in is None and prompt_text:
+        tokens_in = count_tokens(prompt_text, model)
+    if tokens_out is None:
+        content = getattr(response, "content", None)
+        if isinstance(content, str) and content:
+            tokens_out = count_tokens(content, model)
+    # Prompt prefix caching (Anthropic, OpenAI report cached input tokens)
+    cache_details = usage.get("input_token_details") or {}
+    cache_read = cache_details.get("cache_read")
+    if cache_read is not None:
+        metrics.increment("llm.prompt_cache", node=node, result="hit" if cache_read else "miss")
+        metrics.observe("llm.cached_tokens_in", cache_read, node=node)
+    if tokens_in is not None:
+        metrics.observe("llm.tokens_in", tokens_in, node=node)
+    if tokens_out is not None:
+        metrics.observe("llm.tokens_out", tokens_out, node=node)
@@ -0,0 +1,123 @@
+"""
+Structured (JSON) LLM calls validated against a Pydantic schema.
+Uses the provider's native mode - OpenAI response_format, Anthropic tool use,
+Ollama format=json, Gemini function calling - instead of scraping JSON out of
+free text. A reply that still fails validation gets one local extraction and
+one bounded re-ask before giving up.
+"""
+import json
+import re
+from typing import Any, List, Type, TypeVar
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pydantic import BaseModel, ValidationError
+
+from app.ai.utils.prompt_builder import model_name, record_usage
+from app.services.metrics import metrics
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(_raw_text(m) for m in messages)
+
+
+class StructuredOutputError(ValueError):
+    """The model did not produce output matching the schema, even after the re-ask."""
+
+
+def _structured_method(llm) -> Any:
+    from langchain_openai import ChatOpenAI
+    from langchain_ollama import ChatOllama
+
+    if isinstance(llm, (ChatOpenAI, ChatOllama)):
+        return "json_mode"
+    # Anthropic and Gemini default to tool / function calling
+    return None
+
+
+def _bind(llm, schema: Type[BaseModel]):
+    from app.ai.utils.llm_router import LLMRouter
+
+    if isinstance(llm, LLMRouter):
+        # Each routed provider gets its own native mode
+        return llm.map(lambda candidate: _bind(candidate, schema))
+    method = _structured_method(llm)
+    kwargs = {"include_raw": True}
+    if method:
+        kwargs["method"] = method
+    return llm.with_structured_output(schema, **kwargs)
+
+
+def _raw_text(raw: Any) -> str:
+    """Reply text, or the tool-call arguments when the provider answered with a tool call."""
+    if isinstance(raw, BaseMessage):
+        tool_calls = getattr(raw, "tool_calls", None)
+        if tool_calls:
+            return json.dumps(tool_calls[0].get("args", {}), default=str)
+        raw = raw.content
+    if isinstance(raw, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in raw)
+    return str(raw or "")
+
+
+def _extract(raw: Any, schema: Type[T]) -> T:
+    """Last-resort local parse of the raw reply (markdown fences, prose around the object)."""
+    match = re.search(r"\{.*\}", _raw_text(raw), re.DOTALL)
+    if not match:
+        raise ValueError("no JSON object in reply")
+    return schema.model_validate(json.loads(match.group(0)))
+
+
+def invoke_structured(llm, messages: List[BaseMessage], schema: Type[T], node: str) -> T:
+    """
+    Calls the model and returns a validated `schema` instance.
+    Raises StructuredOutputError when the reply cannot be parsed; callers keep
+    their own fallbacks for that case.
+    """
+    metrics.increment("llm.structured.calls", node=node)
+    try:
+        structured = _bind(llm, schema)
+    except NotImplementedError:
+        structured = None
+
+    if structured is None:
+        raw = llm.invoke(messages)
+        record_usage(node, raw, _prompt_text(messages), model_name(llm))
+        try:
+            return _extract(raw, schema)
+        except (ValueError, ValidationError) as e:
+            metrics.increment("llm.structured.parse_failures", node=node, stage="final")
+            raise StructuredOutputError(f"{node}: {e}") from e
+
+    result = structured.invoke(messages)
+    record_usage(node, result.get("raw"), _prompt_text(messages), model_name(llm))
+    if result.get("parsed") is not None:
+        return result["parsed"]
+
+    error = result.get("parsing_error")
+    raw = result.get("raw")
+    try:
+        return _extract(raw, schema)
+    except (ValueError, ValidationError):
+        pass
+
+    # One bounded re-ask with the validation error
+    metrics.increment("llm.structured.parse_failures", node=node, stage="first")
+    print(f"WARN: {node} returned unparseable output, re-asking once: {error}")
+    retry_messages = list(messages) + [
+        AIMessage(content=_raw_text(raw)),
+        HumanMessage(content=(
+            f"That reply was not valid: {error}. Respond again with ONLY a JSON object matching this schema:\n"
+            f"{json.dumps(schema.model_json_schema())}"
+        )),
+    ]
+    result = structured.invoke(retry_messages)
+    record_usage(node, result.get("raw"), _prompt_text(retry_messages), model_name(llm))
+    if result.get("parsed") is not None:
+        return result["parsed"]
+    try:
+        return _extract(result.get("raw"), schema)
+    except (ValueError, ValidationError) as e:
+        metrics.increment("llm.structured.parse_failures", node=node, stage="final")
+        raise StructuredOutputError(f"{node}: {result.get('parsing_error') or e}") from e
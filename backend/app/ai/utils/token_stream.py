@@ -0,0 +1,50 @@
+"""
+Token streaming for nodes whose output the UI shows while it forms (the
+generated SQL and its explanation). Under workflow_app.stream(...,
+stream_mode="custom") each token is forwarded as a custom graph event;
+everywhere else the model is invoked normally.
+"""
+from typing import Any, List
+
+from langchain_core.messages import BaseMessage
+
+
+def _writer():
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except Exception:
+        # Not running inside a graph (or on a worker thread without its context)
+        return None
+
+
+def _chunk_text(content: Any) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+
+def restart_stream(node: str) -> None:
+    """Tells the client to discard the tokens streamed so far for node (they are regenerated)."""
+    writer = _writer()
+    if writer is not None:
+        writer({"node": node, "restart": True})
+
+
+def invoke_streaming(llm, messages: List[BaseMessage], node: str, enabled: bool = False):
+    """
+    llm.invoke(messages), streaming the tokens as {"node", "text"} events when
+    enabled. Returns the full message either way, with usage metadata merged
+    from the chunks.
+    """
+    writer = _writer() if enabled else None
+    if writer is None:
+        return llm.invoke(messages)
+
+    message = None
+    for chunk in llm.stream(messages):
+        text = _chunk_text(chunk.content)
+        if text:
+            writer({"node": node, "text": text})
+        message = chunk if message is None else message + chunk
+    return message if message is not None else llm.invoke(messages)
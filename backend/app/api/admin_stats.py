@@ -7,6 +7,7 @@ from app.db.user_mongo import get_user_mongo_db
 from app.models.user_mongo import UserDocument
 from app.models.query_history import QueryHistory
 from app.models.approval import QueryApproval
+from app.services.metrics import metrics
 from datetime import datetime, time
 from pydantic import BaseModel
 
@@ -66,3 +67,13 @@ async def get_system_stats(
         failed_queries_today=failed_queries_today,
         pending_approvals=pending_approvals
     )
+
+
+@router.get("/metrics")
+async def get_runtime_metrics(
+    current_user: UserDocument = Depends(require_admin)
+):
+    """
+    Get in-process runtime metrics (query scheduler, caches, LLM usage)
+    """
+    return metrics.snapshot()
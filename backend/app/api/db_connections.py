@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.session import get_db
@@ -17,6 +17,7 @@ class DBConnectionCreate(BaseModel):
     username: str
     password: str
     database_name: str
+    execution_settings: Optional[Dict[str, Any]] = None
 
 class DBConnectionOut(BaseModel):
     id: int
@@ -25,6 +26,7 @@ class DBConnectionOut(BaseModel):
     host: str
     username: str
     database_name: str
+    execution_settings: Optional[Dict[str, Any]] = None
     
     class Config:
         from_attributes = True
@@ -104,6 +106,7 @@ def create_db_connection(
         username=connection_in.username,
         password_encrypted=encrypted_password,
         database_name=connection_in.database_name,
+        execution_settings=connection_in.execution_settings,
         owner_id=current_user.user_id
     )
     db.add(db_conn)
@@ -1,147 +1,87 @@
+import asyncio
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.db_connection import DBConnection
 from app.auth import dependencies
 from app.models.user import User
-from app.ai.graph import app as workflow_app
+from app.ai.graph import app as workflow_app, RETRY_STATE_KEYS
 from app.query_executor.executor import execute_sql_query, execute_mongo_query
+from app.query_executor.sql_to_mongo import to_mongo_query
+from app.sql_guardrails.mongo_validator import is_mongo_query
+from app.query_executor.result_cache import result_cache
+from app.services.query_scheduler import query_scheduler, QueryQueueFullError
+from app.services.single_flight import SingleFlight
+from app.core.config import settings
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-import re
+from typing import Optional, List, Dict, Any, Awaitable, Callable
 
 router = APIRouter()
 
+# Coalesce concurrent duplicates: whole pipeline runs per question, executions per SQL
+pipeline_flight = SingleFlight("nl_pipeline")
+execution_flight = SingleFlight("query_execution")
 
-def execute_query_for_connection(conn: DBConnection, sql_or_query: str) -> Dict[str, Any]:
-    """
-    Routes query execution to the appropriate executor based on database type.
-    For MongoDB, converts simple SQL patterns to MongoDB queries.
-    """
-    if conn.db_type == "mongodb":
-        # Parse SQL-like query to MongoDB format
-        mongo_query = sql_to_mongo_query(sql_or_query)
-        return execute_mongo_query(conn, mongo_query)
-    else:
-        return execute_sql_query(conn, sql_or_query)
-
-
-from bson import ObjectId
 
-def sql_to_mongo_query(sql: str) -> Dict[str, Any]:
+def execute_query_for_connection(conn: DBConnection, sql_or_query: str, user_id: Optional[int] = None) -> Dict[str, Any]:
     """
-    Converts simple SQL-like queries to MongoDB query format.
-    Supports basic SELECT, DELETE, WHERE clauses.
+    Routes query execution to the appropriate executor based on database type.
+    For MongoDB, runs generated pipelines directly and translates SQL into a
+    find / aggregate / update / delete.
+    Execution waits for a slot from the query scheduler so a single target
+    database is never flooded with concurrent queries. Reads are served from
+    the result cache when possible.
     """
-    sql = sql.strip().rstrip(';')
-    
-    # Pattern: SELECT * FROM collection_name [WHERE conditions] [LIMIT n]
-    select_pattern = r"SELECT\s+(.+?)\s+FROM\s+[`'\"]?(\w+)[`'\"]?(?:\s+WHERE\s+(.+?))?(?:\s+LIMIT\s+(\d+))?$"
-    match = re.match(select_pattern, sql, re.IGNORECASE)
-    
-    if match:
-        fields = match.group(1).strip()
-        collection = match.group(2)
-        where_clause = match.group(3)
-        limit = int(match.group(4)) if match.group(4) else 100
-        
-        # Build MongoDB query
-        mongo_filter = {}
-        if where_clause:
-            mongo_filter = parse_where_to_mongo(where_clause)
-        
-        return {
-            "collection": collection,
-            "operation": "find",
-            "filter": mongo_filter,
-            "limit": limit
-        }
-
-    # Pattern: DELETE FROM collection_name [WHERE conditions]
-    delete_pattern = r"DELETE\s+FROM\s+[`'\"]?(\w+)[`'\"]?(?:\s+WHERE\s+(.+?))?$"
-    match_delete = re.match(delete_pattern, sql, re.IGNORECASE)
+    cached = result_cache.get(conn, sql_or_query, user_id)
+    if cached is not None:
+        return cached
     
-    if match_delete:
-        collection = match_delete.group(1)
-        where_clause = match_delete.group(2)
+    def run() -> Dict[str, Any]:
+        with query_scheduler.slot(conn, user_id):
+            if conn.db_type == "mongodb":
+                # Native pipeline, or SQL translated to a find / aggregate pipeline
+                mongo_query = to_mongo_query(sql_or_query)
+                result = execute_mongo_query(conn, mongo_query)
+            else:
+                result = execute_sql_query(conn, sql_or_query)
         
-        mongo_filter = {}
-        if where_clause:
-            mongo_filter = parse_where_to_mongo(where_clause)
-            
-        return {
-            "collection": collection,
-            "operation": "delete",
-            "filter": mongo_filter
-        }
+        # Stores reads, invalidates cached reads of tables touched by writes
+        result_cache.record(conn, sql_or_query, result, user_id)
+        return result
     
-    # Fallback: treat as collection name with find all
-    return {
-        "collection": sql.replace("SELECT * FROM ", "").strip().strip('`"\''),
-        "operation": "find",
-        "filter": {},
-        "limit": 100
-    }
+    # Identical concurrent reads share one execution; writes always run on their own
+    read_key = result_cache.read_key(conn, sql_or_query, user_id)
+    if read_key is None:
+        return run()
+    wait_seconds = conn.get_setting("coalesce_wait_seconds", settings.QUERY_COALESCE_WAIT_SECONDS)
+    return dict(execution_flight.do(read_key, run, timeout=wait_seconds))
 
 
-def parse_where_to_mongo(where_clause: str) -> Dict[str, Any]:
+def _pipeline_flight_key(conn: DBConnection, user, inputs: Dict[str, Any]) -> tuple:
     """
-    Parses simple WHERE clauses to MongoDB filter format.
-    Supports: field = value, field > value, field < value, AND
-    Handles _id ObjectId conversion.
+    Key for coalescing identical concurrent NL requests. The graph result depends on
+    the question, the connection, the user's role (RBAC) and LLM configuration.
     """
-    mongo_filter = {}
-    
-    # Split by AND
-    conditions = re.split(r'\s+AND\s+', where_clause, flags=re.IGNORECASE)
-    
-    for condition in conditions:
-        condition = condition.strip()
-        
-        # Match: field = 'value' or field = value
-        eq_match = re.match(r"[`'\"]?(\w+)[`'\"]?\s*=\s*['\"]?([^'\"]+)['\"]?", condition)
-        if eq_match:
-            field, value = eq_match.groups()
-            
-            # Special handling for _id
-            if field == "_id" and ObjectId.is_valid(value):
-                mongo_filter[field] = ObjectId(value)
-                continue
+    question = " ".join(inputs["question"].lower().split()).rstrip("?!. ")
+    if user.llm_api_key_encrypted:
+        # Never bill one user's request to another user's API key
+        scope = f"user:{user.user_id}"
+    else:
+        tiers = f"{sorted((user.llm_node_tiers or {}).items())}|{sorted((user.llm_tier_models or {}).items())}"
+        scope = f"{user.role_name}|{user.is_superuser}|{user.llm_provider}|{user.llm_model}|{tiers}"
+    return (conn.id, scope, question, inputs.get("retry_count", 0), inputs.get("last_error"))
 
-            # Try to convert to number if possible
-            try:
-                value = int(value)
-            except ValueError:
-                try:
-                    value = float(value)
-                except ValueError:
-                    pass  # Keep as string
-            mongo_filter[field] = value
-            continue
-        
-        # Match: field > value
-        gt_match = re.match(r"[`'\"]?(\w+)[`'\"]?\s*>\s*['\"]?([^'\"]+)['\"]?", condition)
-        if gt_match:
-            field, value = gt_match.groups()
-            try:
-                value = float(value)
-            except ValueError:
-                pass
-            mongo_filter[field] = {"$gt": value}
-            continue
-        
-        # Match: field < value
-        lt_match = re.match(r"[`'\"]?(\w+)[`'\"]?\s*<\s*['\"]?([^'\"]+)['\"]?", condition)
-        if lt_match:
-            field, value = lt_match.groups()
-            try:
-                value = float(value)
-            except ValueError:
-                pass
-            mongo_filter[field] = {"$lt": value}
-            continue
-    
-    return mongo_filter
+
+def queue_full_exception(e: QueryQueueFullError) -> HTTPException:
+    """Translates a scheduler rejection into a 429 with a Retry-After hint."""
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 
 class NLQueryRequest(BaseModel):
@@ -168,17 +108,49 @@ async def run_natural_language_query(
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_user),
 ):
-    conn = db.query(DBConnection).filter(DBConnection.id == request.connection_id).first()
+    conn = _authorized_connection(db, request.connection_id, current_user)
+
+    async def run_graph(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        # workflow_app.invoke(inputs) returns the final state.
+        # Runs in the threadpool so concurrent requests are not serialized on the event loop.
+        return await pipeline_flight.do_async(
+            _pipeline_flight_key(conn, current_user, inputs),
+            lambda: run_in_threadpool(workflow_app.invoke, dict(inputs))
+        )
+
+    return await _answer_nl_query(request, conn, db, current_user, run_graph)
+
+
+def _authorized_connection(db: Session, connection_id: int, current_user) -> DBConnection:
+    conn = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
     if not conn:
         raise HTTPException(status_code=404, detail="Connection not found")
         
     if conn.owner_id != current_user.user_id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not authorized")
-        
+    return conn
+
+
+async def _answer_nl_query(
+    request: NLQueryRequest,
+    conn: DBConnection,
+    db: Session,
+    current_user,
+    run_graph: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+) -> NLQueryResponse:
+    """
+    Runs the graph through run_graph, then validates, checks and executes
+    the generated query with repair and retries. Shared by /nl and /nl/stream.
+    """
+    from app.ai.utils.llm_factory import connection_llm_settings
+
     # Run AI Pipeline
+    llm_settings = connection_llm_settings(conn)
     inputs = {
         "question": request.question,
         "connection_id": conn.id,
+        "llm_settings": llm_settings,
+        "db_type": conn.db_type,
         "intent": "",
         "schema_context": "",
         "sql_query": "",
@@ -195,15 +167,22 @@ async def run_natural_language_query(
     # Import Robustness Nodes
     from app.ai.nodes.sql_validator import validate_and_normalize_sql
     from app.ai.nodes.sql_repair import repair_sql_query
+    from app.sql_guardrails.cost_check import check_query_cost, ALLOW, BLOCK, NEEDS_APPROVAL, REWRITE
+    from app.services.db_connector import db_connector
+    
+    dialect = db_connector.sqlglot_dialect(conn.db_type)
     
     while retry_count <= MAX_RETRIES:
         if retry_count > 0:
             print(f"DEBUG: Retry attempt {retry_count} for user={current_user.email}")
             inputs["retry_count"] = retry_count
+            # The graph restarts from generation with the previous selection and grounding
+            inputs.update({key: final_state[key] for key in RETRY_STATE_KEYS if final_state.get(key) is not None})
             
         try:
-            # workflow_app.invoke(inputs) returns the final state
-            final_state = workflow_app.invoke(inputs)
+            final_state = await run_graph(inputs)
+            # Each coalesced caller gets its own copy of the shared state
+            final_state = dict(final_state)
             print(f"DEBUG: AI Pipeline Result (Attempt {retry_count}): {final_state}")
         except Exception as e:
             import traceback
@@ -250,6 +229,7 @@ async def run_natural_language_query(
                 question=request.question,
                 generated_sql=final_state.get("sql_query", ""),
                 intent=intent,
+                impact_summary=final_state.get("impact"),
                 status="PENDING"
             )
             db.add(query_request)
@@ -283,6 +263,7 @@ async def run_natural_language_query(
                     question=request.question,
                     generated_sql=current_sql,
                     intent=intent,
+                    impact_summary=final_state.get("impact"),
                     status="PENDING"
                 )
                 db.add(query_request)
@@ -298,16 +279,80 @@ async def run_natural_language_query(
                     access_status="PENDING_APPROVAL"
                 )
             
-            # STEP 1: Validate & Normalize
-            validation_result = validate_and_normalize_sql(current_sql, dialect="mysql")
-            if validation_result["valid"]:
-                current_sql = validation_result["sql"] # Use normalized SQL
-                print(f"DEBUG: SQL Normalized: {current_sql}")
-            else:
-                print(f"WARN: SQL Validation failed: {validation_result['error']}. Proceeding with caution.")
+            # STEP 1: Validate & Normalize (native MongoDB pipelines were validated in the graph)
+            if not is_mongo_query(current_sql):
+                validation_result = validate_and_normalize_sql(current_sql, dialect=dialect)
+                if validation_result["valid"]:
+                    current_sql = validation_result["sql"] # Use normalized SQL
+                    print(f"DEBUG: SQL Normalized: {current_sql}")
+                else:
+                    print(f"WARN: SQL Validation failed: {validation_result['error']}. Proceeding with caution.")
+            
+            # STEP 1.5: EXPLAIN cost pre-check (no-op unless enabled for the connection)
+            cost_check = await run_in_threadpool(check_query_cost, conn, current_sql)
+            
+            if cost_check["decision"] == REWRITE:
+                print(f"DEBUG: Cost check requested rewrite: {cost_check['reason']}")
+                # LLM round trip: off the event loop like the cost check
+                rewrite_result = await run_in_threadpool(repair_sql_query, {
+                    "sql_query": current_sql,
+                    "error": cost_check["reason"] + " Rewrite the query to avoid full scans and cross joins (add selective filters, join conditions or a LIMIT).",
+                    "user": current_user,
+                    "connection_id": conn.id,
+                    "llm_settings": llm_settings,
+                    "db_type": conn.db_type
+                })
+                rewritten_sql = rewrite_result.get("sql_query")
+                if rewritten_sql and rewritten_sql != current_sql:
+                    val_rewrite = validate_and_normalize_sql(rewritten_sql, dialect=dialect)
+                    if val_rewrite["valid"]: rewritten_sql = val_rewrite["sql"]
+                    rewrite_check = await run_in_threadpool(check_query_cost, conn, rewritten_sql)
+                    if rewrite_check["decision"] == ALLOW:
+                        current_sql = rewritten_sql
+                        cost_check = rewrite_check
+                if cost_check["decision"] != ALLOW:
+                    # Rewrite did not bring the estimate under the threshold - let an admin decide
+                    cost_check["decision"] = NEEDS_APPROVAL
+            
+            if cost_check["decision"] == BLOCK:
+                return NLQueryResponse(
+                    intent=intent,
+                    sql_query=current_sql,
+                    result=None,
+                    error=f"{cost_check['reason']} Please narrow down your question.",
+                    access_status="BLOCKED_BY_COST"
+                )
+            
+            if cost_check["decision"] == NEEDS_APPROVAL:
+                from app.models.query_request import QueryRequest
+                
+                query_request = QueryRequest(
+                    user_id=current_user.user_id,
+                    connection_id=conn.id,
+                    question=request.question,
+                    generated_sql=current_sql,
+                    intent=intent,
+                    impact_summary=final_state.get("impact"),
+                    status="PENDING"
+                )
+                db.add(query_request)
+                db.commit()
+                db.refresh(query_request)
+                
+                return NLQueryResponse(
+                    intent=intent,
+                    sql_query=current_sql,
+                    result=None,
+                    error=cost_check["reason"],
+                    approval_id=query_request.id,
+                    access_status="PENDING_APPROVAL"
+                )
             
             try:
-                execution_result = execute_query_for_connection(conn, current_sql)
+                # Run off the event loop: the scheduler may block while waiting for a slot
+                execution_result = await run_in_threadpool(
+                    execute_query_for_connection, conn, current_sql, current_user.user_id
+                )
                 
                 # Phase 5: Generate Insights (Success path)
                 from app.ai.nodes.insights import query_insights_generator
@@ -331,10 +376,12 @@ async def run_natural_language_query(
                     "sql_query": current_sql,
                     "result_metadata": metadata,
                     "sample_data": sample_data,  # Pass actual data for analysis
-                    "user": current_user
+                    "user": current_user,
+                    "connection_id": conn.id,
+                    "llm_settings": llm_settings
                 }
                 
-                insights_result = query_insights_generator(insights_inputs)
+                insights_result = await run_in_threadpool(query_insights_generator, insights_inputs)
                 insights_data = insights_result.get("insights")
                 
                 # Phase 5: Save to History
@@ -387,18 +434,25 @@ async def run_natural_language_query(
                 )
                 
                 break # Success!
+            except QueryQueueFullError as e:
+                raise queue_full_exception(e)
             except Exception as e:
                  error_msg = str(e)
                  print(f"DEBUG: Execution Error (Attempt {retry_count}): {error_msg}")
                  
-                 # STEP 2: Repair Loop
-                 repair_input = {
-                     "sql_query": current_sql,
-                     "error": error_msg,
-                     "user": current_user
-                 }
-                 repaired_result = repair_sql_query(repair_input)
-                 repaired_sql = repaired_result.get("sql_query")
+                 # STEP 2: Repair Loop (SQL only - pipelines are regenerated with the error)
+                 repaired_sql = None
+                 if not is_mongo_query(current_sql):
+                     repair_input = {
+                         "sql_query": current_sql,
+                         "error": error_msg,
+                         "user": current_user,
+                         "connection_id": conn.id,
+                         "llm_settings": llm_settings,
+                         "db_type": conn.db_type
+                     }
+                     repaired_result = await run_in_threadpool(repair_sql_query, repair_input)
+                     repaired_sql = repaired_result.get("sql_query")
                  
                  if repaired_sql and repaired_sql != current_sql:
                      print(f"DEBUG: Attempting repair... New SQL: {repaired_sql}")
@@ -442,10 +496,12 @@ async def run_natural_language_query(
                      try:
                          print("DEBUG: Executing Repaired SQL...")
                          # Validate repaired SQL?
-                         val_rep = validate_and_normalize_sql(repaired_sql, dialect="mysql")
+                         val_rep = validate_and_normalize_sql(repaired_sql, dialect=dialect)
                          if val_rep["valid"]: repaired_sql = val_rep["sql"]
                          
-                         execution_result = execute_query_for_connection(conn, repaired_sql)
+                         execution_result = await run_in_threadpool(
+                             execute_query_for_connection, conn, repaired_sql, current_user.user_id
+                         )
                          
                          # Success! Generate insights/history/etc.
                          # (Duplicate success logic - implies refactor needed, but for now copying is safer than abstracting blindly)
@@ -463,8 +519,8 @@ async def run_natural_language_query(
                          sample_data = rows[:5] if rows else []
                          metadata = {"rows_returned": row_count, "columns": cols, "execution_time": "Unknown"}
                          
-                         insights_inputs = {"question": request.question, "sql_query": repaired_sql, "result_metadata": metadata, "sample_data": sample_data, "user": current_user}
-                         insights_result = query_insights_generator(insights_inputs)
+                         insights_inputs = {"question": request.question, "sql_query": repaired_sql, "result_metadata": metadata, "sample_data": sample_data, "user": current_user, "connection_id": conn.id, "llm_settings": llm_settings}
+                         insights_result = await run_in_threadpool(query_insights_generator, insights_inputs)
                          insights_data = insights_result.get("insights")
                          
                          from app.models.query_history import QueryHistory
@@ -484,6 +540,8 @@ async def run_natural_language_query(
                          )
                          return final_response
                          
+                     except QueryQueueFullError as e2:
+                         raise queue_full_exception(e2)
                      except Exception as e2:
                          print(f"DEBUG: Repair failed too: {e2}")
                          retry_count += 1
@@ -529,6 +587,77 @@ async def run_natural_language_query(
         )
         
     return final_response
+
+
+def _stream_graph(inputs: Dict[str, Any], emit: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Runs the graph with token streaming on; returns the final state like invoke()."""
+    final_state: Dict[str, Any] = dict(inputs)
+    emit("attempt", {"retry_count": inputs.get("retry_count", 0)})
+    for mode, chunk in workflow_app.stream({**inputs, "stream_tokens": True}, stream_mode=["updates", "values", "custom"]):
+        if mode == "custom":
+            emit("token", chunk)
+        elif mode == "updates":
+            for node in chunk:
+                emit("stage", {"node": node})
+        else:
+            final_state = chunk
+    return final_state
+
+
+@router.post("/nl/stream")
+async def stream_natural_language_query(
+    request: NLQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+):
+    """
+    Same as /nl, as server-sent events: "attempt" when (re)generation starts,
+    "stage" per finished graph node, "token" while the SQL and the explanation
+    are generated ({"node", "restart": true} drops that node's text so far),
+    then one "result" (the /nl response, with the validated SQL) or "error".
+    Streamed requests are not coalesced.
+    """
+    conn = _authorized_connection(db, request.connection_id, current_user)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run_graph(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return await run_in_threadpool(_stream_graph, inputs, emit)
+
+    async def answer():
+        try:
+            response = await _answer_nl_query(request, conn, db, current_user, run_graph)
+            await events.put(("result", response.model_dump()))
+        except HTTPException as e:
+            await events.put(("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            await events.put(("error", {"status_code": 500, "detail": str(e)}))
+        finally:
+            await events.put(None)
+
+    async def event_source():
+        task = asyncio.create_task(answer())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class RunSQLRequest(BaseModel):
     connection_id: int
     sql_query: str
@@ -547,13 +676,15 @@ def run_raw_sql_query(
         raise HTTPException(status_code=403, detail="Not authorized")
         
     try:
-        execution_result = execute_query_for_connection(conn, request.sql_query)
+        execution_result = execute_query_for_connection(conn, request.sql_query, current_user.user_id)
         return NLQueryResponse(
             intent="DIRECT_EXECUTION",
             sql_query=request.sql_query,
             result=execution_result,
             error=None
         )
+    except QueryQueueFullError as e:
+        raise queue_full_exception(e)
     except Exception as e:
         return NLQueryResponse(
             intent="ERROR",
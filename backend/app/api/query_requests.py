@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -10,7 +10,9 @@ from app.models.user import User
 from app.models.query_request import QueryRequest
 from app.models.db_connection import DBConnection
 from app.query_executor.executor import execute_sql_query, execute_mongo_query
+from app.query_executor.result_cache import result_cache
 from app.services.credential_encryptor import encryptor
+from app.services.query_scheduler import query_scheduler, QueryQueueFullError
 
 router = APIRouter()
 
@@ -31,6 +33,7 @@ class QueryRequestOut(BaseModel):
     question: str
     generated_sql: str
     intent: str
+    impact_summary: Optional[Dict[str, Any]] = None
     status: str
     approved_by: Optional[int]
     approved_at: Optional[datetime]
@@ -89,6 +92,7 @@ def create_query_request(
         question=query_request.question,
         generated_sql=query_request.generated_sql,
         intent=query_request.intent,
+        impact_summary=query_request.impact_summary,
         status=query_request.status,
         approved_by=query_request.approved_by,
         approved_at=query_request.approved_at,
@@ -126,6 +130,7 @@ def list_my_requests(
             question=req.question,
             generated_sql=req.generated_sql,
             intent=req.intent,
+            impact_summary=req.impact_summary,
             status=req.status,
             approved_by=req.approved_by,
             approved_at=req.approved_at,
@@ -168,6 +173,7 @@ def list_pending_requests(
             question=req.question,
             generated_sql=req.generated_sql,
             intent=req.intent,
+            impact_summary=req.impact_summary,
             status=req.status,
             approved_by=req.approved_by,
             approved_at=req.approved_at,
@@ -213,6 +219,7 @@ def approve_request(
         question=req.question,
         generated_sql=req.generated_sql,
         intent=req.intent,
+        impact_summary=req.impact_summary,
         status=req.status,
         approved_by=req.approved_by,
         approved_at=req.approved_at,
@@ -258,6 +265,7 @@ def reject_request(
         question=req.question,
         generated_sql=req.generated_sql,
         intent=req.intent,
+        impact_summary=req.impact_summary,
         status=req.status,
         approved_by=req.approved_by,
         approved_at=req.approved_at,
@@ -292,17 +300,21 @@ def execute_approved_request(
     
     # Execute the query
     try:
-        if conn.db_type == "mongodb":
-            # Parse SQL to MongoDB format
-            from app.api.query import sql_to_mongo_query
-            mongo_query = sql_to_mongo_query(req.generated_sql)
-            result = execute_mongo_query(conn, mongo_query)
-        else:
-            # Determine if commit is needed based on intent
-            # Intents: READ, UPDATE, DELETE, CREATE
-            require_commit = req.intent in ["UPDATE", "DELETE", "CREATE", "INSERT"]
-            
-            result = execute_sql_query(conn, req.generated_sql, require_commit=require_commit)
+        with query_scheduler.slot(conn, current_user.user_id):
+            if conn.db_type == "mongodb":
+                # Native pipeline, or SQL translated to MongoDB format
+                from app.query_executor.sql_to_mongo import to_mongo_query
+                mongo_query = to_mongo_query(req.generated_sql)
+                result = execute_mongo_query(conn, mongo_query)
+            else:
+                # Determine if commit is needed based on intent
+                # Intents: READ, UPDATE, DELETE, CREATE
+                require_commit = req.intent in ["UPDATE", "DELETE", "CREATE", "INSERT"]
+                
+                result = execute_sql_query(conn, req.generated_sql, require_commit=require_commit)
+        
+        # Cached reads of the written tables are now stale
+        result_cache.invalidate_sql(conn, req.generated_sql)
         
         # Update request status
         req.status = "EXECUTED"
@@ -315,5 +327,7 @@ def execute_approved_request(
             "result": result
         }
     
+    except QueryQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
@@ -7,8 +7,11 @@ from app.auth import dependencies
 from app.models.user import User
 from app.schema_ingestion.inspector import inspect_schema
 # Trigger reload
-from app.schema_ingestion.textifier import textify_schema
+from app.schema_ingestion.textifier import textify_schema, textify_columns
 from app.rag.store import vector_store
+from app.rag.lexical_index import lexical_indexes
+from app.services.structure_cache import structure_cache
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -32,17 +35,25 @@ def process_schema_background(connection_id: int, db: Session):
         if metadata:
             metadata.schema_json = schema_info
             metadata.description_text = schema_text
+            metadata.table_count = len(schema_info)
             metadata.version += 1
         else:
             metadata = SchemaMetadata(
                 db_connection_id=conn.id,
                 schema_json=schema_info,
-                description_text=schema_text
+                description_text=schema_text,
+                table_count=len(schema_info)
             )
             db.add(metadata)
             
         db.commit()
         
+        # Explorer structure is re-read on next access
+        structure_cache.invalidate(conn.id)
+        
+        # Lexical index for hybrid table retrieval
+        lexical_indexes.build(conn.id, schema_info, metadata.version)
+        
         # 4. Embed to Chroma
         # We store each table description as a separate document
         documents = []
@@ -74,6 +85,28 @@ def process_schema_background(connection_id: int, db: Session):
             metadatas=metadatas,
             ids=ids
         )
+        
+        # 5. Column-level documents for wide tables, linked to their table via metadata
+        column_collection = f"schema_cols_conn_{conn.id}"
+        vector_store.delete_collection(column_collection)
+        col_documents = []
+        col_metadatas = []
+        col_ids = []
+        for table, details in schema_info.items():
+            if len(details.get("columns", [])) < settings.COLUMN_INDEX_MIN_COLUMNS:
+                continue
+            table_docs, table_metas, table_ids = textify_columns(table, details)
+            col_documents.extend(table_docs)
+            col_metadatas.extend({**meta, "connection_id": conn.id} for meta in table_metas)
+            col_ids.extend(f"conn_{conn.id}_{doc_id}" for doc_id in table_ids)
+            
+        if col_documents:
+            vector_store.add_documents(
+                collection_name=column_collection,
+                documents=col_documents,
+                metadatas=col_metadatas,
+                ids=col_ids
+            )
         print(f"Successfully ingested schema for connection {conn.name}")
         
     except Exception as e:
@@ -1,14 +1,23 @@
-from typing import Any, Dict, List
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import bisect
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.db.session import get_db
+from sqlalchemy import inspect, text
+from app.db.session import get_db, SessionLocal
 from app.models.db_connection import DBConnection
+from app.models.schema import SchemaMetadata
 from app.auth import dependencies
 from app.models.user import User
 from app.services.db_connector import db_connector
 from app.services.credential_encryptor import encryptor
 from app.services.mongo_client import mongo_client
+from app.core.config import settings
+from app.services.structure_cache import structure_cache, etag_matches, STALE
 
 router = APIRouter()
 
@@ -27,27 +36,39 @@ def get_mongodb_schema_structure(db_conn, decrypted_password) -> Dict[str, Any]:
     try:
         db = client[db_conn.database_name]
         collections = db.list_collection_names()
+        sample_size = min(20, db_conn.get_setting("mongo_schema_sample_size", settings.MONGO_SCHEMA_SAMPLE_SIZE))
         
-        # Build tables list (collections in MongoDB)
-        tables = []
-        for collection_name in collections:
-            # Get document count and sample to infer field count
+        def describe_collection(collection_name):
+            # Get document count, a $sample of documents for the field count and the indexes
             collection = db[collection_name]
             doc_count = collection.estimated_document_count()
-            sample = collection.find_one()
-            field_count = len(sample.keys()) if sample else 0
-            
-            tables.append({
+            sample = mongo_client.sample_documents(client, db_conn.database_name, collection_name, limit=sample_size)
+            field_count = len({key for doc in sample for key in doc.keys()})
+            try:
+                indexes = mongo_client.list_indexes(client, db_conn.database_name, collection_name)
+            except Exception as e:
+                print(f"WARN: Could not list indexes for {collection_name}: {e}")
+                indexes = []
+            return {
                 "name": collection_name,
                 "column_count": field_count,
                 "row_count": doc_count
-            })
+            }, [{"name": index["name"], "table_name": collection_name} for index in indexes]
+        
+        # Collections are described concurrently (MongoClient is thread-safe)
+        workers = max(1, min(settings.MONGO_SCHEMA_INSPECT_WORKERS, len(collections)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            described = list(pool.map(describe_collection, collections))
+        
+        # Build tables list (collections in MongoDB)
+        tables = [table for table, _ in described]
+        indexes = [index for _, table_indexes in described for index in table_indexes]
         
         return {
             "database_name": db_conn.database_name,
             "tables": tables,
             "views": [],  # MongoDB doesn't have traditional views in the same way
-            "indexes": [],  # Could be extended to list indexes
+            "indexes": indexes,
             "procedures": [],
             "triggers": [],
             "events": []
@@ -68,16 +89,22 @@ def get_mysql_schema_structure(engine) -> Dict[str, Any]:
         db_structures = []
         for db_name in databases:
             # Get tables with column count
+            # Column counts come from one grouped scan instead of a subquery per table
             tables_query = text("""
                 SELECT 
-                    TABLE_NAME as name,
-                    TABLE_TYPE as type,
-                    TABLE_ROWS as row_count,
-                    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
-                     WHERE TABLE_SCHEMA = :db_name AND TABLE_NAME = t.TABLE_NAME) as column_count
+                    t.TABLE_NAME as name,
+                    t.TABLE_TYPE as type,
+                    t.TABLE_ROWS as row_count,
+                    COALESCE(c.column_count, 0) as column_count
                 FROM INFORMATION_SCHEMA.TABLES t
-                WHERE TABLE_SCHEMA = :db_name AND TABLE_TYPE = 'BASE TABLE'
-                ORDER BY TABLE_NAME
+                LEFT JOIN (
+                    SELECT TABLE_NAME, COUNT(*) as column_count
+                    FROM INFORMATION_SCHEMA.COLUMNS
+                    WHERE TABLE_SCHEMA = :db_name
+                    GROUP BY TABLE_NAME
+                ) c ON c.TABLE_NAME = t.TABLE_NAME
+                WHERE t.TABLE_SCHEMA = :db_name AND t.TABLE_TYPE = 'BASE TABLE'
+                ORDER BY t.TABLE_NAME
             """)
             tables = [dict(row._mapping) for row in conn.execute(tables_query, {"db_name": db_name})]
             
@@ -151,14 +178,19 @@ def get_postgres_schema_structure(engine) -> Dict[str, Any]:
         # Get tables from all non-system schemas
         tables_query = text("""
             SELECT 
-                schemaname || '.' || tablename as name,
+                t.schemaname || '.' || t.tablename as name,
                 'BASE TABLE' as type,
-                (SELECT COUNT(*) FROM information_schema.columns 
-                 WHERE table_name = t.tablename AND table_schema = t.schemaname) as column_count,
-                schemaname as schema
+                COALESCE(c.column_count, 0) as column_count,
+                t.schemaname as schema
             FROM pg_tables t
-            WHERE schemaname NOT IN ('pg_catalog', 'information_schema', 'pg_toast')
-            ORDER BY schemaname, tablename
+            LEFT JOIN (
+                SELECT table_schema, table_name, COUNT(*) as column_count
+                FROM information_schema.columns
+                WHERE table_schema NOT IN ('pg_catalog', 'information_schema', 'pg_toast')
+                GROUP BY table_schema, table_name
+            ) c ON c.table_schema = t.schemaname AND c.table_name = t.tablename
+            WHERE t.schemaname NOT IN ('pg_catalog', 'information_schema', 'pg_toast')
+            ORDER BY t.schemaname, t.tablename
         """)
         tables_result = conn.execute(tables_query)
         tables = [dict(row._mapping) for row in tables_result]
@@ -204,14 +236,47 @@ def get_postgres_schema_structure(engine) -> Dict[str, Any]:
             "events": events
         }
 
+def fetch_schema_structure(connection_id: int) -> Dict[str, Any]:
+    """Reads the structure from the target database's catalog (uncached)."""
+    db = SessionLocal()
+    try:
+        db_conn = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    finally:
+        db.close()
+    if not db_conn:
+        raise HTTPException(status_code=404, detail="Database connection not found")
+    
+    # Decrypt password
+    decrypted_password = encryptor.decrypt(db_conn.password_encrypted)
+    
+    # Handle MongoDB separately (no SQLAlchemy engine)
+    if db_conn.db_type == "mongodb":
+        return get_mongodb_schema_structure(db_conn, decrypted_password)
+    
+    # Pooled engine shared with query execution (must not be disposed here)
+    engine = db_connector.get_pooled_engine(db_conn, decrypted_password)
+    
+    if db_conn.db_type == "mysql":
+        return get_mysql_schema_structure(engine)
+    elif db_conn.db_type == "postgres":
+        return get_postgres_schema_structure(engine)
+    raise HTTPException(status_code=400, detail=f"Unsupported database type: {db_conn.db_type}")
+
+
 @router.get("/{connection_id}/structure")
 def get_schema_structure(
     connection_id: int,
+    background_tasks: BackgroundTasks,
+    refresh: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_user),
 ) -> Any:
-    """Get the schema structure for a database connection."""
-    # Get connection
+    """
+    Get the schema structure for a database connection.
+    Served from the structure cache (stale-while-revalidate) with an ETag;
+    pass refresh=true to force a catalog read.
+    """
     # Get connection
     db_conn = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
     
@@ -223,30 +288,282 @@ def get_schema_structure(
     if db_conn.owner_id != current_user.user_id and not current_user.is_superuser and current_user.role_name != "ADMIN":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Decrypt password
-    decrypted_password = encryptor.decrypt(db_conn.password_encrypted)
+    if refresh:
+        structure_cache.invalidate(connection_id)
     
+    loader = lambda: fetch_schema_structure(connection_id)
     try:
-        # Handle MongoDB separately (no SQLAlchemy engine)
-        if db_conn.db_type == "mongodb":
-            structure = get_mongodb_schema_structure(db_conn, decrypted_password)
-            return structure
-        
-        # Create SQLAlchemy engine for SQL databases
-        engine = db_connector.create_engine_for_connection(db_conn, decrypted_password)
-        
-        try:
-            if db_conn.db_type == "mysql":
-                structure = get_mysql_schema_structure(engine)
-            elif db_conn.db_type == "postgres":
-                structure = get_postgres_schema_structure(engine)
-            else:
-                raise HTTPException(status_code=400, detail=f"Unsupported database type: {db_conn.db_type}")
-            
-            return structure
-        finally:
-            engine.dispose()
+        structure, etag, state = structure_cache.get(connection_id, loader)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch schema structure: {str(e)}")
+    
+    if state == STALE and structure_cache.begin_refresh(connection_id):
+        # Runs after the response is sent
+        background_tasks.add_task(structure_cache.refresh, connection_id, loader)
+    
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "X-Cache": state.upper()
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers, background=background_tasks)
+    return JSONResponse(content=jsonable_encoder(structure), headers=headers, background=background_tasks)
+
+
+# --- Paginated sub-resources (lazy explorer tree) ---
+
+_OBJECT_KINDS = ("tables", "views", "indexes", "procedures", "triggers", "events")
+
+
+def _catalog_objects(structure: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Flattens single- and multi-database structures into sorted object lists per kind."""
+    databases = structure["databases"] if structure.get("is_multi_db") else [structure]
+    objects: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in _OBJECT_KINDS}
+    for database in databases:
+        for kind in _OBJECT_KINDS:
+            for item in database.get(kind, []):
+                objects[kind].append({**item, "database": database.get("database_name")})
+    for items in objects.values():
+        items.sort(key=_sort_key)
+    return objects
+
+
+def _sort_key(item: Dict[str, Any]) -> tuple:
+    # Database and schema keep keys unique when a multi-db catalog repeats a table name
+    return (
+        str(item.get("name", "")).lower(),
+        str(item.get("table_name", "")).lower(),
+        str(item.get("name", "")),
+        str(item.get("database") or ""),
+        str(item.get("schema") or ""),
+    )
+
+
+def _encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _paginate(
+    items: List[Dict[str, Any]],
+    prefix: Optional[str],
+    search: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> Dict[str, Any]:
+    """
+    Keyset pagination over name-sorted items. Cursors encode the last returned
+    sort key, so pages stay consistent while the cached catalog refreshes.
+    """
+    if prefix:
+        prefix = prefix.lower()
+        # "orders" also matches the unqualified part of PostgreSQL's "public.orders"
+        items = [
+            i for i in items
+            if str(i.get("name", "")).lower().startswith(prefix)
+            or str(i.get("name", "")).lower().split(".")[-1].startswith(prefix)
+        ]
+    if search:
+        search = search.lower()
+        items = [i for i in items if search in str(i.get("name", "")).lower()]
+
+    total = len(items)
+    if cursor:
+        after = _decode_cursor(cursor)
+        start = bisect.bisect_right([_sort_key(i) for i in items], after)
+    else:
+        start = 0
+
+    page = items[start:start + limit]
+    has_more = start + limit < total
+    return {
+        "items": page,
+        "total": total,
+        "next_cursor": _encode_cursor(_sort_key(page[-1])) if page and has_more else None
+    }
+
+
+def _authorized_connection(connection_id: int, db: Session, current_user: User) -> DBConnection:
+    db_conn = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    if not db_conn:
+        raise HTTPException(status_code=404, detail="Database connection not found")
+    if db_conn.owner_id != current_user.user_id and not current_user.is_superuser and current_user.role_name != "ADMIN":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return db_conn
+
+
+_objects_by_etag: Dict[int, tuple] = {}
+
+
+def _cached_objects(connection_id: int, background_tasks: BackgroundTasks) -> Dict[str, List[Dict[str, Any]]]:
+    """Catalog objects from the structure cache; flattened once per catalog version."""
+    loader = lambda: fetch_schema_structure(connection_id)
+    try:
+        structure, etag, state = structure_cache.get(connection_id, loader)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch schema structure: {str(e)}")
+    if state == STALE and structure_cache.begin_refresh(connection_id):
+        background_tasks.add_task(structure_cache.refresh, connection_id, loader)
+
+    cached = _objects_by_etag.get(connection_id)
+    if cached is None or cached[0] != etag:
+        cached = (etag, _catalog_objects(structure))
+        _objects_by_etag[connection_id] = cached
+    return cached[1]
+
+
+@router.get("/{connection_id}/summary")
+def get_schema_summary(
+    connection_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+) -> Any:
+    """Object counts per kind, for rendering the collapsed explorer tree."""
+    _authorized_connection(connection_id, db, current_user)
+    objects = _cached_objects(connection_id, background_tasks)
+    return {kind: len(items) for kind, items in objects.items()}
+
+
+@router.get("/{connection_id}/tables")
+def list_tables(
+    connection_id: int,
+    background_tasks: BackgroundTasks,
+    prefix: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+) -> Any:
+    """Paginated tables (collections for MongoDB), filterable by name prefix or substring."""
+    _authorized_connection(connection_id, db, current_user)
+    objects = _cached_objects(connection_id, background_tasks)
+    return _paginate(objects["tables"], prefix, search, cursor, limit)
+
+
+@router.get("/{connection_id}/views")
+def list_views(
+    connection_id: int,
+    background_tasks: BackgroundTasks,
+    prefix: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+) -> Any:
+    """Paginated views, filterable by name prefix or substring."""
+    _authorized_connection(connection_id, db, current_user)
+    objects = _cached_objects(connection_id, background_tasks)
+    return _paginate(objects["views"], prefix, search, cursor, limit)
+
+
+@router.get("/{connection_id}/indexes")
+def list_indexes(
+    connection_id: int,
+    background_tasks: BackgroundTasks,
+    table: Optional[str] = None,
+    prefix: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+) -> Any:
+    """Paginated indexes, optionally restricted to one table."""
+    _authorized_connection(connection_id, db, current_user)
+    indexes = _cached_objects(connection_id, background_tasks)["indexes"]
+    if table:
+        indexes = [i for i in indexes if i.get("table_name") == table or str(i.get("table_name", "")).split(".")[-1] == table]
+    return _paginate(indexes, prefix, search, cursor, limit)
+
+
+def fetch_table_columns(db_conn: DBConnection, table_name: str) -> List[Dict[str, Any]]:
+    """Columns of a single table, read live from the target database."""
+    decrypted_password = encryptor.decrypt(db_conn.password_encrypted)
+
+    if db_conn.db_type == "mongodb":
+        client = mongo_client.get_client(
+            {
+                "username": db_conn.username,
+                "host": db_conn.host,
+                "port": db_conn.port,
+                "database_name": db_conn.database_name
+            },
+            decrypted_password
+        )
+        try:
+            sample_size = db_conn.get_setting("mongo_schema_sample_size", settings.MONGO_SCHEMA_SAMPLE_SIZE)
+            return mongo_client.inspect_collection(client, db_conn.database_name, table_name, sample_size)["columns"]
+        finally:
+            client.close()
+
+    engine = db_connector.get_pooled_engine(db_conn, decrypted_password)
+    schema_name, _, name = table_name.rpartition(".")
+    inspector = inspect(engine)
+    return [
+        {
+            "name": col["name"],
+            "type": str(col["type"]),
+            "primary_key": col.get("primary_key", False),
+            "nullable": col.get("nullable", True)
+        }
+        for col in inspector.get_columns(name, schema=schema_name or None)
+    ]
+
+
+@router.get("/{connection_id}/tables/{table_name}/columns")
+def list_table_columns(
+    connection_id: int,
+    table_name: str,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_user),
+) -> Any:
+    """
+    Paginated columns of one table. Uses the ingested schema catalog and
+    falls back to reading the single table from the database.
+    """
+    db_conn = _authorized_connection(connection_id, db, current_user)
+
+    columns = None
+    metadata = db.query(SchemaMetadata).filter(SchemaMetadata.db_connection_id == connection_id).first()
+    if metadata and metadata.schema_json and table_name in metadata.schema_json:
+        columns = metadata.schema_json[table_name].get("columns", [])
+
+    if columns is None:
+        try:
+            columns = fetch_table_columns(db_conn, table_name)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=f"Could not read columns of {table_name}: {str(e)}")
+
+    # Columns keep their ordinal order; the cursor is the position of the last column
+    if search:
+        columns = [c for c in columns if search.lower() in c["name"].lower()]
+    start = 0
+    if cursor:
+        try:
+            start = int(_decode_cursor(cursor)[0])
+        except (TypeError, ValueError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    page = columns[start:start + limit]
+    has_more = start + limit < len(columns)
+    return {
+        "items": page,
+        "total": len(columns),
+        "next_cursor": _encode_cursor((start + limit,)) if has_more else None
+    }
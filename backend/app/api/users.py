@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Dict
 from fastapi import APIRouter, Depends, HTTPException
 from app.auth import dependencies
 from app.services.user_mongodb import UserMongoService
@@ -31,11 +31,15 @@ class LLMConfigUpdate(BaseModel):
     llm_provider: str
     llm_model: str
     llm_api_key: str | None = None  # Optional, if updating
+    llm_node_tiers: Dict[str, str] | None = None  # e.g. {"intent": "fast", "generator": "strong"}
+    llm_tier_models: Dict[str, str] | None = None  # e.g. {"fast": "gpt-4o-mini"}
 
 class LLMConfigOut(BaseModel):
     llm_provider: str | None
     llm_model: str | None
     has_api_key: bool
+    llm_node_tiers: Dict[str, str] | None = None
+    llm_tier_models: Dict[str, str] | None = None
 
 @router.get("/me/llm-config", response_model=LLMConfigOut)
 async def read_user_llm_config(
@@ -44,7 +48,9 @@ async def read_user_llm_config(
     return LLMConfigOut(
         llm_provider=current_user.llm_provider,
         llm_model=current_user.llm_model,
-        has_api_key=bool(current_user.llm_api_key_encrypted)
+        has_api_key=bool(current_user.llm_api_key_encrypted),
+        llm_node_tiers=current_user.llm_node_tiers,
+        llm_tier_models=current_user.llm_tier_models
     )
 
 @router.put("/me/llm-config", response_model=LLMConfigOut)
@@ -56,6 +62,11 @@ async def update_user_llm_config(
         llm_provider=config.llm_provider,
         llm_model=config.llm_model
     )
+    # Only overwrite tier settings that were sent ({} clears them)
+    if config.llm_node_tiers is not None:
+        update_data.llm_node_tiers = config.llm_node_tiers
+    if config.llm_tier_models is not None:
+        update_data.llm_tier_models = config.llm_tier_models
     
     if config.llm_api_key:
         from app.services.credential_encryptor import encryptor
@@ -66,5 +77,7 @@ async def update_user_llm_config(
     return LLMConfigOut(
         llm_provider=updated_user.llm_provider if updated_user else None,
         llm_model=updated_user.llm_model if updated_user else None,
-        has_api_key=bool(updated_user.llm_api_key_encrypted) if updated_user else False
+        has_api_key=bool(updated_user.llm_api_key_encrypted) if updated_user else False,
+        llm_node_tiers=updated_user.llm_node_tiers if updated_user else None,
+        llm_tier_models=updated_user.llm_tier_models if updated_user else None
     )
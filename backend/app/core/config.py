@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "QueryFlow AI"
@@ -18,6 +18,7 @@ class Settings(BaseSettings):
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3" # or mistral, etc
+    OLLAMA_KEEP_ALIVE: str = "30m" # Keeps the model (and its cached prompt prefix) loaded between calls
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
@@ -30,10 +31,120 @@ class Settings(BaseSettings):
     # Gemini
     GOOGLE_API_KEY: Optional[str] = None
     GEMINI_MODEL: str = "gemini-pro"
+
+    # LLM Routing (fallback providers, hedged requests, circuit breakers)
+    LLM_FALLBACK_PROVIDERS: List[str] = []  # Tried in order when the primary fails, e.g. ["openai", "anthropic"]
+    LLM_NODE_PROVIDERS: Dict[str, List[str]] = {}  # Provider order per graph node, e.g. {"intent": ["ollama", "openai"]}
+    LLM_HEDGING_ENABLED: bool = False  # Start the next provider when the current one exceeds its p95 latency
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    LLM_HEDGE_MAX_DELAY_SECONDS: float = 15.0  # Also the hedge delay until enough latencies are recorded
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before a provider is skipped
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    LLM_RATE_LIMIT_BACKOFF_SECONDS: float = 2.0  # Doubled per consecutive rate limit unless Retry-After is sent
+    LLM_RATE_LIMIT_BACKOFF_MAX_SECONDS: float = 60.0
+
+    # Model Tiers (graph node -> tier -> model per provider)
+    # Per-connection overrides: execution_settings "llm_node_tiers" / "llm_tier_models";
+    # per-user: the user's llm_node_tiers / llm_tier_models (models for their own provider)
+    LLM_NODE_TIERS: Dict[str, str] = {
+        "intent": "fast",
+        "relevance_scorer": "fast",
+        "explainer": "fast",
+        "insights": "fast",
+    }  # Unlisted nodes use the "strong" tier
+    LLM_TIER_MODELS: Dict[str, Dict[str, str]] = {
+        "fast": {"openai": "gpt-4o-mini", "anthropic": "claude-3-haiku-20240307", "gemini": "gemini-1.5-flash"},
+    }  # Missing entries use the provider's configured model (OPENAI_MODEL, OLLAMA_MODEL, ...)
     
     # Vector DB
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
 
+    # Table Retrieval (hybrid lexical + vector, fused with reciprocal rank fusion)
+    RETRIEVAL_VECTOR_K: int = 20  # Vector hits fed into the fusion
+    RETRIEVAL_LEXICAL_K: int = 20  # BM25 / trigram hits fed into the fusion
+    RETRIEVAL_RRF_K: int = 60
+    RETRIEVAL_MIN_CANDIDATES: int = 4
+    RETRIEVAL_MAX_CANDIDATES: int = 12
+    RETRIEVAL_RELATIVE_CUTOFF: float = 0.3  # Drop candidates scoring below this fraction of the best one
+    RETRIEVAL_COLUMN_K: int = 40  # Column-level hits retrieved in the same pass
+    RETRIEVAL_FK_EXPANSION_HOPS: int = 2  # Candidates are expanded along foreign keys up to this distance
+    RETRIEVAL_FK_EXPANSION_DECAY: float = 0.5  # Score multiplier per hop
+    JOIN_PATH_MAX_HOPS: int = 4  # Longest join chain considered between two selected tables
+    SMALL_SCHEMA_SKIP_SCORING_MAX_TABLES: int = 3  # At or below this, every table is selected without LLM scoring
+
+    # Intent Classification (local tiers tried before the LLM)
+    INTENT_RULES_ENABLED: bool = True
+    INTENT_RULES_MIN_CONFIDENCE: float = 0.9
+    INTENT_CENTROIDS_ENABLED: bool = False  # Embedding nearest-centroid over labeled QueryHistory
+    INTENT_CENTROID_MIN_EXAMPLES: int = 20  # Per intent
+    INTENT_CENTROID_MAX_EXAMPLES: int = 1000  # Most recent history rows embedded per refresh
+    INTENT_CENTROID_MIN_SIMILARITY: float = 0.8
+    INTENT_CENTROID_MIN_MARGIN: float = 0.05  # Over the runner-up intent
+    INTENT_CENTROID_REFRESH_SECONDS: int = 3600
+
+    # Speculative SQL Generation (overlaps generation with column grounding)
+    SPECULATIVE_GENERATION_ENABLED: bool = False
+    SPECULATIVE_MIN_CONFIDENCE: float = 0.8  # Table selection confidence required to speculate
+    SPECULATIVE_GENERATION_WORKERS: int = 8
+
+    # Prompt Budgets (tokens of schema context; least relevant columns are dropped first)
+    GROUNDING_SCHEMA_TOKEN_BUDGET: int = 3000
+    GENERATION_SCHEMA_TOKEN_BUDGET: int = 1500
+
+    # Column-level Index (wide tables)
+    COLUMN_INDEX_MIN_COLUMNS: int = 40  # Tables with at least this many columns also get per-column documents
+    GROUNDING_MAX_COLUMNS_PER_TABLE: int = 30  # Columns of a wide table shown to the grounding LLM
+
+    # SQL Repair (local schema-aware fixes before the LLM)
+    SQL_LOCAL_REPAIR_ENABLED: bool = True
+    SQL_LOCAL_REPAIR_MIN_SIMILARITY: float = 0.75  # Closest-name match needed to rename a table or column
+
+    # Target Database Connection Pools
+    TARGET_DB_POOL_SIZE: int = 5
+    TARGET_DB_POOL_MAX_OVERFLOW: int = 5
+    TARGET_DB_POOL_RECYCLE_SECONDS: int = 1800
+
+    # Query Scheduler (target database protection)
+    # Per-connection values can be overridden in DBConnection.execution_settings
+    QUERY_MAX_CONCURRENCY_PER_CONNECTION: int = 8
+    QUERY_MAX_CONCURRENCY_PER_USER: int = 2
+    QUERY_QUEUE_MAX_SIZE: int = 50
+    QUERY_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    QUERY_QUEUE_RETRY_AFTER_SECONDS: int = 5  # Used until execution timings are known
+    QUERY_COALESCE_WAIT_SECONDS: float = 60.0  # Followers of a shared execution run their own after this
+
+    # EXPLAIN Cost Pre-check (overridable per connection)
+    COST_CHECK_ENABLED: bool = False
+    COST_CHECK_MAX_ROWS: Optional[int] = 10_000_000
+    COST_CHECK_MAX_COST: Optional[float] = None  # Planner cost units differ per database
+    COST_CHECK_ACTION: str = "approval"  # block, approval, rewrite
+    COST_CHECK_PLAN_CACHE_SIZE: int = 512
+    COST_CHECK_PLAN_CACHE_TTL_SECONDS: int = 600
+
+    # Query Result Cache (TTL and scope overridable per connection)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SECONDS: int = 30  # 0 disables caching
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 8 * 1024 * 1024
+    RESULT_CACHE_SPILL_DIRECTORY: Optional[str] = None  # e.g. "./result_cache" to spill evicted entries to disk
+    RESULT_CACHE_SPILL_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Impact Analysis (UPDATE/DELETE row estimates)
+    IMPACT_COUNT_TIMEOUT_MS: int = 2000
+    IMPACT_EXACT_COUNT_MAX_ROWS: int = 1_000_000  # Above this EXPLAIN estimate, skip the exact COUNT(*)
+
+    # Native MongoDB Generation (aggregation pipelines)
+    MONGO_PIPELINE_DEFAULT_LIMIT: int = 100  # Appended when the pipeline has no $limit
+    MONGO_PIPELINE_MAX_LIMIT: int = 1000  # Larger $limit values are clamped
+
+    # MongoDB Schema Introspection
+    MONGO_SCHEMA_SAMPLE_SIZE: int = 100  # Documents drawn with $sample per collection
+    MONGO_SCHEMA_INSPECT_WORKERS: int = 8  # Collections inspected concurrently
+
+    # Schema Explorer Structure Cache (stale-while-revalidate)
+    SCHEMA_STRUCTURE_CACHE_TTL_SECONDS: int = 300  # Served without refreshing
+    SCHEMA_STRUCTURE_CACHE_MAX_STALE_SECONDS: int = 86400  # Served stale while refreshing in the background
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
+from typing import Any
 
 class DBConnection(Base):
     __tablename__ = "db_connection" # Explicit table name
@@ -18,7 +19,16 @@ class DBConnection(Base):
     is_active = Column(Boolean, default=True) 
     database_name = Column(String(255))
     
+    # Per-connection overrides for execution limits (concurrency, queue size, ...)
+    execution_settings = Column(JSON, nullable=True)
+    
     owner_id = Column(Integer, ForeignKey("user.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     query_history = relationship("QueryHistory", back_populates="connection")
+
+    def get_setting(self, key: str, default: Any = None) -> Any:
+        """Returns a per-connection override from execution_settings, or the default."""
+        overrides = self.execution_settings or {}
+        value = overrides.get(key)
+        return default if value is None else value
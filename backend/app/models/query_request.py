@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -19,6 +19,7 @@ class QueryRequest(Base):
     question = Column(Text, nullable=False)  # Original NL question
     generated_sql = Column(Text, nullable=False)  # SQL/MongoDB query to execute
     intent = Column(String(50), nullable=False)  # READ, UPDATE, DELETE
+    impact_summary = Column(JSON, nullable=True)  # Affected-row estimate from impact analysis
     
     # Request Status: PENDING, APPROVED, REJECTED, EXECUTED
     status = Column(String(20), default="PENDING", nullable=False)
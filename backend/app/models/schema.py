@@ -10,4 +10,5 @@ class SchemaMetadata(Base):
     schema_json = Column(JSON) # Stores the full schema structure
     description_text = Column(Text) # For vector embeddings
     version = Column(Integer, default=1)
+    table_count = Column(Integer, nullable=True) # Number of tables/collections in schema_json
     created_at = Column(DateTime(timezone=True), server_default=func.now())
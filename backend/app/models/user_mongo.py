@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from pydantic_core import core_schema
-from typing import Optional, Any, Annotated
+from typing import Dict, Optional, Any, Annotated
 from datetime import datetime
 from bson import ObjectId
 
@@ -53,6 +53,8 @@ class UserDocument(BaseModel):
     llm_provider: Optional[str] = None
     llm_model: Optional[str] = None
     llm_api_key_encrypted: Optional[bytes] = None
+    llm_node_tiers: Optional[Dict[str, str]] = None  # Graph node -> model tier, e.g. {"intent": "fast"}
+    llm_tier_models: Optional[Dict[str, str]] = None  # Model tier -> model of llm_provider
     
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -78,6 +80,8 @@ class UserUpdate(BaseModel):
     llm_provider: Optional[str] = None
     llm_model: Optional[str] = None
     llm_api_key_encrypted: Optional[bytes] = None
+    llm_node_tiers: Optional[Dict[str, str]] = None
+    llm_tier_models: Optional[Dict[str, str]] = None
 
 class UserResponse(BaseModel):
     user_id: int
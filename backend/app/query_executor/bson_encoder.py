@@ -0,0 +1,97 @@
+"""
+Fast BSON -> JSON-compatible conversion for MongoDB query results.
+
+Documents freshly decoded by PyMongo are owned by the executor, so they are
+converted in place: JSON-native values (str/int/float/bool/None) are skipped
+with a single type lookup, and only non-native BSON values are replaced. No
+new dict/list is allocated per nesting level. Representations follow relaxed
+Extended JSON where it maps to a plain JSON value (ObjectId -> hex string,
+Decimal128 -> decimal string, binary -> base64, UUID binary -> UUID string).
+"""
+import base64
+import datetime
+import decimal
+import re
+import uuid
+from typing import Any, Callable, Dict, List
+
+from bson import Binary, Code, DBRef, Decimal128, Int64, MaxKey, MinKey, ObjectId, Regex, Timestamp
+from bson.binary import OLD_UUID_SUBTYPE, UUID_SUBTYPE
+
+_JSON_NATIVE = frozenset((str, int, float, bool, type(None)))
+
+
+def _binary(value: Binary) -> str:
+    if value.subtype == UUID_SUBTYPE:
+        return str(value.as_uuid())
+    if value.subtype == OLD_UUID_SUBTYPE:
+        return str(value.as_uuid(uuid_representation=3))  # PYTHON_LEGACY
+    return base64.b64encode(value).decode("ascii")
+
+
+def _dbref(value: DBRef) -> Dict[str, Any]:
+    ref = {"$ref": value.collection, "$id": convert_value(value.id)}
+    if value.database:
+        ref["$db"] = value.database
+    return ref
+
+
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    ObjectId: str,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    Decimal128: lambda v: str(v.to_decimal()),
+    decimal.Decimal: str,
+    Int64: int,
+    Binary: _binary,
+    bytes: lambda v: base64.b64encode(v).decode("ascii"),
+    uuid.UUID: str,
+    Timestamp: lambda v: {"t": v.time, "i": v.inc},
+    Regex: lambda v: v.pattern,
+    re.Pattern: lambda v: v.pattern,
+    Code: str,
+    DBRef: _dbref,
+    MinKey: lambda v: "$minKey",
+    MaxKey: lambda v: "$maxKey",
+}
+
+
+def convert_value(value: Any) -> Any:
+    """Converts a single BSON value (containers are converted in place)."""
+    value_type = type(value)
+    if value_type in _JSON_NATIVE:
+        return value
+    if value_type is dict:
+        return convert_document(value)
+    if value_type is list:
+        return _convert_list(value)
+
+    converter = _CONVERTERS.get(value_type)
+    if converter is not None:
+        return converter(value)
+
+    # Subclasses (SON, tz-aware datetimes from custom codecs, ...)
+    if isinstance(value, dict):
+        return convert_document(dict(value))
+    if isinstance(value, (list, tuple)):
+        return _convert_list(list(value))
+    for base_type, base_converter in _CONVERTERS.items():
+        if isinstance(value, base_type):
+            return base_converter(value)
+    return str(value)
+
+
+def _convert_list(items: List[Any]) -> List[Any]:
+    for index, item in enumerate(items):
+        if type(item) not in _JSON_NATIVE:
+            items[index] = convert_value(item)
+    return items
+
+
+def convert_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a decoded BSON document to JSON-compatible values, in place."""
+    for key, value in doc.items():
+        if type(value) not in _JSON_NATIVE:
+            # Re-assigning an existing key does not resize the dict, safe during iteration
+            doc[key] = convert_value(value)
+    return doc
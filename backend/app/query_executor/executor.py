@@ -8,9 +8,9 @@ def execute_sql_query(db_connection: DBConnection, sql: str, require_commit: boo
     """
     Executes the validated SQL query on the target database.
     """
-    # Decrypt password and create engine using the service
+    # Decrypt password and reuse the pooled engine for this connection
     decrypted_password = encryptor.decrypt(db_connection.password_encrypted)
-    engine = db_connector.create_engine_for_connection(db_connection, decrypted_password)
+    engine = db_connector.get_pooled_engine(db_connection, decrypted_password)
     
     try:
         with engine.connect() as conn:
@@ -45,41 +45,28 @@ def execute_sql_query(db_connection: DBConnection, sql: str, require_commit: boo
         # Re-raise or return error dict depending on caller's expectation
         # The caller (api/query.py) expects raised exceptions to handle them in try/except block
         raise e
-    finally:
-        engine.dispose()
 
 
 def execute_mongo_query(db_connection: DBConnection, query: Dict[str, Any]) -> Dict[str, Any]:
     """
     Executes a MongoDB query on the target database.
     
-    Expected query format:
+    Expected query format (see app.query_executor.sql_to_mongo):
     {
         "collection": "collection_name",
-        "operation": "find" | "aggregate",
-        "filter": {...},  # For find operations
-        "pipeline": [...]  # For aggregate operations
-        "limit": 100  # Optional
+        "operation": "find" | "aggregate" | "update" | "delete",
+        "filter": {...},  # For find / update / delete operations
+        "projection": {...},  # Optional, find only
+        "sort": [["field", 1 | -1], ...],  # Optional, find only
+        "skip": 0,  # Optional, find only
+        "limit": 100,  # Optional, find only
+        "pipeline": [...],  # For aggregate operations
+        "update": {...} | [...],  # For update operations (update document or pipeline)
+        "columns": [...]  # Optional, output column order
     }
     """
     from app.services.mongo_client import mongo_client
-    from bson import ObjectId
-    from datetime import datetime
-    
-    def serialize_mongo_doc(doc):
-        """Recursively converts BSON types to JSON-serializable types."""
-        if isinstance(doc, dict):
-            return {key: serialize_mongo_doc(value) for key, value in doc.items()}
-        elif isinstance(doc, list):
-            return [serialize_mongo_doc(item) for item in doc]
-        elif isinstance(doc, ObjectId):
-            return str(doc)
-        elif isinstance(doc, datetime):
-            return doc.isoformat()
-        elif isinstance(doc, bytes):
-            return doc.decode('utf-8', errors='replace')
-        else:
-            return doc
+    from app.query_executor.bson_encoder import convert_document
     
     decrypted_password = encryptor.decrypt(db_connection.password_encrypted)
     
@@ -105,14 +92,19 @@ def execute_mongo_query(db_connection: DBConnection, query: Dict[str, Any]) -> D
         
         if operation == "find":
             filter_dict = query.get("filter", {})
-            cursor = collection.find(filter_dict).limit(limit)
-            rows = []
-            for doc in cursor:
-                # Convert all BSON types to JSON-serializable
-                rows.append(serialize_mongo_doc(doc))
+            cursor = collection.find(filter_dict, query.get("projection"))
+            if query.get("sort"):
+                cursor = cursor.sort([(field, direction) for field, direction in query["sort"]])
+            if query.get("skip"):
+                cursor = cursor.skip(query["skip"])
+            cursor = cursor.limit(limit)
+            # Convert all BSON types to JSON-serializable (in place, docs are ours)
+            rows = [convert_document(doc) for doc in cursor]
             
-            # Infer columns from results
-            if rows:
+            # Infer columns from results unless the projection fixed them
+            if query.get("columns"):
+                columns = list(query["columns"])
+            elif rows:
                 columns = list(rows[0].keys())
             else:
                 columns = []
@@ -125,12 +117,12 @@ def execute_mongo_query(db_connection: DBConnection, query: Dict[str, Any]) -> D
         elif operation == "aggregate":
             pipeline = query.get("pipeline", [])
             cursor = collection.aggregate(pipeline)
-            rows = []
-            for doc in cursor:
-                # Convert all BSON types to JSON-serializable
-                rows.append(serialize_mongo_doc(doc))
+            # Convert all BSON types to JSON-serializable (in place, docs are ours)
+            rows = [convert_document(doc) for doc in cursor]
             
-            if rows:
+            if query.get("columns"):
+                columns = list(query["columns"])
+            elif rows:
                 columns = list(rows[0].keys())
             else:
                 columns = []
@@ -140,6 +132,17 @@ def execute_mongo_query(db_connection: DBConnection, query: Dict[str, Any]) -> D
                 "rows": rows
             }
 
+        elif operation == "update":
+            filter_dict = query.get("filter", {})
+            result = collection.update_many(filter_dict, query["update"])
+            return {
+                "status": "success",
+                "rows_affected": result.modified_count,
+                "message": f"Updated {result.modified_count} documents.",
+                "columns": [],
+                "rows": []
+            }
+
         elif operation == "delete":
             filter_dict = query.get("filter", {})
             result = collection.delete_many(filter_dict)
@@ -0,0 +1,20 @@
+import hashlib
+import sqlglot
+from typing import Optional
+
+
+def normalize_sql(sql: str, dialect: Optional[str] = None) -> str:
+    """
+    Returns a canonical form of the SQL (whitespace, keyword case and
+    unquoted identifier case normalized) so equivalent queries compare equal.
+    Falls back to whitespace-collapsed text when the SQL cannot be parsed.
+    """
+    try:
+        return sqlglot.parse_one(sql, read=dialect).sql(dialect=dialect, normalize=True)
+    except Exception:
+        return " ".join(sql.strip().rstrip(";").split())
+
+
+def sql_fingerprint(sql: str, dialect: Optional[str] = None) -> str:
+    """Stable hash of the normalized SQL, used as a cache key."""
+    return hashlib.sha256(normalize_sql(sql, dialect).encode("utf-8")).hexdigest()
@@ -0,0 +1,323 @@
+"""
+Result cache for queries executed against target databases.
+Entries are keyed by (connection, normalized SQL fingerprint, scope), expire after
+a per-connection TTL, live in a size-bounded in-memory LRU and can optionally spill
+to disk. Writes executed through QueryFlow invalidate every cached result that
+referenced one of the written tables.
+"""
+import hashlib
+import itertools
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+import sqlglot
+from sqlglot import exp
+
+from app.core.config import settings
+from app.query_executor.fingerprint import sql_fingerprint
+from app.services.db_connector import db_connector
+from app.services.metrics import metrics
+
+_NON_DETERMINISTIC_KEYS = {"currenttimestamp", "currentdate", "currenttime", "currentdatetime", "rand", "uuid"}
+_NON_DETERMINISTIC_FUNCTIONS = {"now", "sysdate", "random", "uuid", "localtime", "localtimestamp", "unix_timestamp"}
+_WRITE_TYPES = (exp.Update, exp.Delete, exp.Insert, exp.Merge)
+
+
+class _Entry:
+    def __init__(self, connection_id: int, tables: Set[str], payload: bytes, expires_at: float, size: Optional[int] = None):
+        self.connection_id = connection_id
+        self.tables = tables
+        self.payload = payload
+        self.size = len(payload) if size is None else size
+        self.expires_at = expires_at
+        self.spill_path: Optional[str] = None  # Set once the entry is spilled; unique per entry
+
+
+def _parse(conn, sql: str) -> Optional[exp.Expression]:
+    try:
+        return sqlglot.parse_one(sql, read=db_connector.sqlglot_dialect(conn.db_type))
+    except Exception:
+        return None
+
+
+def _referenced_tables(parsed: exp.Expression) -> Set[str]:
+    return {table.name.lower() for table in parsed.find_all(exp.Table) if table.name}
+
+
+def _is_cacheable_read(parsed: Optional[exp.Expression]) -> bool:
+    if parsed is None or not isinstance(parsed, (exp.Select, exp.Union)):
+        return False
+    for node in parsed.walk():
+        if node.key in _NON_DETERMINISTIC_KEYS:
+            return False
+        if isinstance(node, exp.Anonymous) and str(node.name).lower() in _NON_DETERMINISTIC_FUNCTIONS:
+            return False
+    return True
+
+
+class ResultCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        # Spilled entries keep their metadata in memory, the payload lives on disk
+        self._spilled: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._spilled_bytes = 0
+        self._spill_ids = itertools.count()
+        # connection_id -> table name -> cache keys, for write invalidation
+        self._table_index: Dict[int, Dict[str, Set[str]]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    # --- keys & policy ---
+
+    @staticmethod
+    def _ttl(conn) -> int:
+        return conn.get_setting("result_cache_ttl_seconds", settings.RESULT_CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def _scope(conn, user_id: Optional[int]) -> str:
+        # Connections share one set of credentials, so results are shared unless the
+        # connection is configured with a per-user scope (e.g. row-level security).
+        if conn.get_setting("result_cache_scope", "connection") == "user":
+            return f"user:{user_id}"
+        return "connection"
+
+    def _key(self, conn, sql: str, user_id: Optional[int]) -> str:
+        fingerprint = sql_fingerprint(sql, db_connector.sqlglot_dialect(conn.db_type))
+        raw = f"{conn.id}|{self._scope(conn, user_id)}|{fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- public API ---
+
+    def read_key(self, conn, sql: str, user_id: Optional[int] = None) -> Optional[str]:
+        """Cache key for a deterministic read, or None for writes / non-deterministic SQL."""
+        if not _is_cacheable_read(_parse(conn, sql)):
+            return None
+        return self._key(conn, sql, user_id)
+
+    def get(self, conn, sql: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Returns a cached result for a cacheable read, or None."""
+        if not settings.RESULT_CACHE_ENABLED or self._ttl(conn) <= 0:
+            return None
+        if not _is_cacheable_read(_parse(conn, sql)):
+            return None
+
+        key = self._key(conn, sql, user_id)
+        payload = self._lookup(key)
+        if payload is None:
+            self._record_lookup(conn.id, hit=False)
+            return None
+
+        self._record_lookup(conn.id, hit=True)
+        return pickle.loads(payload)
+
+    def record(self, conn, sql: str, result: Dict[str, Any], user_id: Optional[int] = None) -> None:
+        """
+        Called after a successful execution: stores cacheable reads and
+        invalidates cached reads of any table touched by a write.
+        """
+        parsed = _parse(conn, sql)
+        if parsed is None:
+            return
+
+        if isinstance(parsed, _WRITE_TYPES):
+            self.invalidate_tables(conn.id, _referenced_tables(parsed))
+            return
+
+        ttl = self._ttl(conn)
+        if not settings.RESULT_CACHE_ENABLED or ttl <= 0 or not _is_cacheable_read(parsed):
+            return
+
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > settings.RESULT_CACHE_MAX_ENTRY_BYTES:
+            return
+
+        entry = _Entry(conn.id, _referenced_tables(parsed), payload, time.monotonic() + ttl)
+        self._store(self._key(conn, sql, user_id), entry)
+
+    def invalidate_sql(self, conn, sql: str) -> None:
+        """Invalidates cached reads of the tables referenced by `sql` (used after writes)."""
+        parsed = _parse(conn, sql)
+        if parsed is not None:
+            self.invalidate_tables(conn.id, _referenced_tables(parsed))
+
+    def invalidate_tables(self, connection_id: int, tables: Set[str]) -> None:
+        with self._lock:
+            index = self._table_index.get(connection_id, {})
+            keys: Set[str] = set()
+            for table in tables:
+                keys |= index.pop(table.lower(), set())
+            for key in keys:
+                self._drop(key)
+            self._publish_sizes()
+        if keys:
+            metrics.increment("result_cache.invalidations", len(keys), connection_id=connection_id)
+
+    def invalidate_connection(self, connection_id: int) -> None:
+        with self._lock:
+            index = self._table_index.pop(connection_id, {})
+            for keys in index.values():
+                for key in keys:
+                    self._drop(key)
+            self._publish_sizes()
+
+    # --- internals (callers hold no lock) ---
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry.expires_at < time.monotonic():
+                    self._drop(key)
+                    self._publish_sizes()
+                    return None
+                self._memory.move_to_end(key)
+                return entry.payload
+
+            entry = self._spilled.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._drop(key)
+                self._publish_sizes()
+                return None
+            # Non-empty while the spill write is still in progress
+            payload = entry.payload
+
+        if not payload:
+            try:
+                with open(entry.spill_path, "rb") as f:
+                    payload = f.read()
+            except OSError:
+                with self._lock:
+                    if self._spilled.get(key) is entry:
+                        self._drop(key)
+                return None
+
+        # Promote back to memory, unless a write invalidated the entry while it was read
+        promoted = _Entry(entry.connection_id, entry.tables, payload, entry.expires_at)
+        if not self._store(key, promoted, replacing=entry):
+            return None
+        return payload
+
+    def _store(self, key: str, entry: _Entry, replacing: Optional[_Entry] = None) -> bool:
+        """
+        Stores entry in memory, spilling what the memory budget evicts. With
+        replacing, only if that spilled entry is still current; returns whether
+        the entry was stored.
+        """
+        to_spill = []
+        with self._lock:
+            if replacing is not None and self._spilled.get(key) is not replacing:
+                return False
+            self._drop(key)
+            self._memory[key] = entry
+            self._memory_bytes += entry.size
+            conn_index = self._table_index.setdefault(entry.connection_id, {})
+            for table in entry.tables:
+                conn_index.setdefault(table, set()).add(key)
+
+            while self._memory_bytes > settings.RESULT_CACHE_MAX_BYTES and self._memory:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.size
+                if self._reserve_spill(evicted_key, evicted):
+                    to_spill.append((evicted_key, evicted))
+                else:
+                    self._unindex(evicted_key, evicted)
+            self._publish_sizes()
+
+        # File writes happen outside the lock
+        for evicted_key, evicted in to_spill:
+            self._write_spill(evicted_key, evicted)
+        return True
+
+    def _reserve_spill(self, key: str, entry: _Entry) -> bool:
+        """
+        Registers an evicted entry as spilled if spilling is configured (caller
+        holds the lock). It keeps its payload until _write_spill has written it.
+        """
+        if not settings.RESULT_CACHE_SPILL_DIRECTORY or entry.expires_at < time.monotonic():
+            return False
+        entry.spill_path = os.path.join(settings.RESULT_CACHE_SPILL_DIRECTORY, f"{key}.{next(self._spill_ids)}.pkl")
+        self._spilled[key] = entry
+        self._spilled_bytes += entry.size
+
+        while self._spilled_bytes > settings.RESULT_CACHE_SPILL_MAX_BYTES and self._spilled:
+            oldest_key = next(iter(self._spilled))
+            self._drop(oldest_key)
+        return self._spilled.get(key) is entry
+
+    def _write_spill(self, key: str, entry: _Entry) -> None:
+        """Writes a reserved entry to disk (without the lock), then frees its in-memory payload."""
+        try:
+            os.makedirs(settings.RESULT_CACHE_SPILL_DIRECTORY, exist_ok=True)
+            with open(entry.spill_path, "wb") as f:
+                f.write(entry.payload)
+        except OSError as e:
+            print(f"WARN: Result cache spill failed: {e}")
+            with self._lock:
+                if self._spilled.get(key) is entry:
+                    self._drop(key)
+                    self._publish_sizes()
+            return
+
+        with self._lock:
+            current = self._spilled.get(key) is entry
+            if current:
+                entry.payload = b""
+        if not current:
+            # Invalidated or evicted while being written
+            self._remove_spill_file(entry)
+
+    def _drop(self, key: str) -> None:
+        """Removes a key from memory, disk and the table index (caller holds the lock)."""
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+            self._unindex(key, entry)
+
+        spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            self._spilled_bytes -= spilled.size
+            self._unindex(key, spilled)
+            self._remove_spill_file(spilled)
+
+    def _unindex(self, key: str, entry: _Entry) -> None:
+        conn_index = self._table_index.get(entry.connection_id, {})
+        for table in entry.tables:
+            keys = conn_index.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del conn_index[table]
+
+    @staticmethod
+    def _remove_spill_file(entry: _Entry) -> None:
+        # Absent while the spill write is still in progress; _write_spill removes it then
+        try:
+            os.remove(entry.spill_path)
+        except (OSError, TypeError):
+            pass
+
+    def _record_lookup(self, connection_id: int, hit: bool) -> None:
+        metrics.increment("result_cache.hits" if hit else "result_cache.misses", connection_id=connection_id)
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            hit_rate = self._hits / (self._hits + self._misses)
+        metrics.set_gauge("result_cache.hit_rate", round(hit_rate, 4))
+
+    def _publish_sizes(self) -> None:
+        metrics.set_gauge("result_cache.memory_bytes", self._memory_bytes)
+        metrics.set_gauge("result_cache.memory_entries", len(self._memory))
+        metrics.set_gauge("result_cache.spilled_bytes", self._spilled_bytes)
+
+
+result_cache = ResultCache()
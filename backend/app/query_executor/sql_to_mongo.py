@@ -0,0 +1,706 @@
+"""
+SQL -> MongoDB translation for MongoDB connections.
+
+The generated SQL is parsed with sqlglot and its AST is translated into either
+a `find` (filter / projection / sort / skip / limit) or an `aggregate` pipeline
+(JOIN -> $lookup, GROUP BY / COUNT / SUM / AVG / MIN / MAX -> $group, HAVING,
+DISTINCT, computed columns), so filtering, sorting and aggregation run inside
+MongoDB instead of pulling documents over the wire. UPDATE and DELETE become
+update_many / delete_many.
+
+Anything that cannot be translated faithfully raises ValueError rather than
+silently falling back to "fetch everything".
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from bson import ObjectId
+
+from app.services.db_connector import db_connector
+
+# Row queries without a LIMIT keep the executor's historical cap
+DEFAULT_LIMIT = 100
+
+_COMPARISONS = {
+    exp.EQ: "$eq",
+    exp.NEQ: "$ne",
+    exp.GT: "$gt",
+    exp.GTE: "$gte",
+    exp.LT: "$lt",
+    exp.LTE: "$lte",
+}
+_FLIPPED = {"$eq": "$eq", "$ne": "$ne", "$gt": "$lt", "$gte": "$lte", "$lt": "$gt", "$lte": "$gte"}
+
+_ARITHMETIC = {
+    exp.Add: "$add",
+    exp.Sub: "$subtract",
+    exp.Mul: "$multiply",
+    exp.Div: "$divide",
+    exp.Mod: "$mod",
+}
+
+_FUNCTIONS = {
+    exp.Lower: "$toLower",
+    exp.Upper: "$toUpper",
+    exp.Abs: "$abs",
+    exp.Length: "$strLenCP",
+}
+
+_ACCUMULATORS = {
+    exp.Sum: "$sum",
+    exp.Avg: "$avg",
+    exp.Min: "$min",
+    exp.Max: "$max",
+}
+
+
+def _unsupported(node: exp.Expression, reason: str = "is not supported") -> ValueError:
+    return ValueError(f"Cannot translate to MongoDB: {node.sql(dialect='mysql')!r} {reason}")
+
+
+def _literal(node: exp.Expression) -> Any:
+    """Python value of a SQL literal, raising ValueError for anything else."""
+    if isinstance(node, exp.Paren):
+        return _literal(node.this)
+    if isinstance(node, exp.Literal):
+        if node.is_string:
+            return node.this
+        text = node.this
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    if isinstance(node, exp.Boolean):
+        return node.this
+    if isinstance(node, exp.Null):
+        return None
+    if isinstance(node, exp.Neg):
+        return -_literal(node.this)
+    raise _unsupported(node, "is not a literal")
+
+
+def _is_literal(node: exp.Expression) -> bool:
+    try:
+        _literal(node)
+        return True
+    except ValueError:
+        return False
+
+
+def _coerce_for_field(field: str, value: Any) -> Any:
+    # _id values arrive as hex strings in SQL
+    if field.split(".")[-1] == "_id" and isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+
+def _like_to_regex(pattern: str) -> str:
+    body = "".join(".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern)
+    # Unanchored ends instead of leading/trailing ".*" so prefix matches can use an index
+    if pattern.startswith("%"):
+        body = body[2:]
+    else:
+        body = "^" + body
+    if pattern.endswith("%") and len(pattern) > 1:
+        body = body[:-2]
+    elif not pattern.endswith("%"):
+        body = body + "$"
+    return body
+
+
+def _limit_value(node: Optional[exp.Expression]) -> Optional[int]:
+    if node is None:
+        return None
+    value = _literal(node.expression)
+    if not isinstance(value, int) or value < 0:
+        raise _unsupported(node, "must be a non-negative integer")
+    return value
+
+
+def _merge_and(filters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merges AND-ed filters into one document when their keys do not clash."""
+    merged: Dict[str, Any] = {}
+    for condition in filters:
+        for key, value in condition.items():
+            if key not in merged:
+                merged[key] = value
+                continue
+            existing = merged[key]
+            if (
+                isinstance(existing, dict) and isinstance(value, dict)
+                and all(k.startswith("$") for k in list(existing) + list(value))
+                and not set(existing) & set(value)
+            ):
+                merged[key] = {**existing, **value}
+            else:
+                return {"$and": filters}
+    return merged
+
+
+def _conjuncts(node: exp.Expression) -> List[exp.Expression]:
+    while isinstance(node, exp.Paren):
+        node = node.this
+    if isinstance(node, exp.And):
+        return _conjuncts(node.this) + _conjuncts(node.expression)
+    return [node]
+
+
+def _disjuncts(node: exp.Expression) -> List[exp.Expression]:
+    while isinstance(node, exp.Paren):
+        node = node.this
+    if isinstance(node, exp.Or):
+        return _disjuncts(node.this) + _disjuncts(node.expression)
+    return [node]
+
+
+class _Translator:
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+        self.collection: Optional[str] = None
+        self.base_names: set = set()
+        # joined table alias -> field holding the $lookup result
+        self.joined: Dict[str, str] = {}
+
+    # --- field references ---
+
+    def field_path(self, column: exp.Column) -> str:
+        table = column.table
+        if not table or table in self.base_names:
+            return column.name
+        if table in self.joined:
+            return f"{self.joined[table]}.{column.name}"
+        # Not a known table: treat "address.city" as a nested document path
+        return ".".join(part.name for part in column.parts)
+
+    def tables_of(self, node: exp.Expression) -> set:
+        return {col.table for col in node.find_all(exp.Column) if col.table and col.table in self.joined}
+
+    # --- filters (find / $match) ---
+
+    def filter(self, node: exp.Expression) -> Dict[str, Any]:
+        if isinstance(node, exp.Paren):
+            return self.filter(node.this)
+        if isinstance(node, exp.And):
+            return _merge_and([self.filter(part) for part in _conjuncts(node)])
+        if isinstance(node, exp.Or):
+            return {"$or": [self.filter(part) for part in _disjuncts(node)]}
+        if isinstance(node, exp.Not):
+            return self._negated_filter(node.this)
+
+        if type(node) in _COMPARISONS:
+            return self._comparison_filter(node)
+
+        if isinstance(node, exp.In):
+            condition = self._in_filter(node)
+            return self._negate_field_filter(condition) if node.args.get("negate") else condition
+        if isinstance(node, (exp.Like, exp.ILike)):
+            condition = self._like_filter(node)
+            return self._negate_field_filter(condition) if node.args.get("negate") else condition
+        if isinstance(node, exp.Between) and isinstance(node.this, exp.Column):
+            field = self.field_path(node.this)
+            low, high = _literal(node.args["low"]), _literal(node.args["high"])
+            return {field: {"$gte": _coerce_for_field(field, low), "$lte": _coerce_for_field(field, high)}}
+        if isinstance(node, exp.Is) and isinstance(node.this, exp.Column):
+            return {self.field_path(node.this): _literal(node.expression)}
+        if isinstance(node, exp.Column):
+            return {self.field_path(node): True}
+        if isinstance(node, exp.Boolean):
+            return {} if node.this else {"$expr": False}
+
+        # Fall back to an aggregation expression (e.g. comparisons of computed values)
+        return {"$expr": self.expr(node, self.field_ref)}
+
+    def _comparison_filter(self, node: exp.Expression) -> Dict[str, Any]:
+        op = _COMPARISONS[type(node)]
+        left, right = node.this, node.expression
+        if isinstance(left, exp.Column) and _is_literal(right):
+            field, value = self.field_path(left), _literal(right)
+        elif isinstance(right, exp.Column) and _is_literal(left):
+            field, value, op = self.field_path(right), _literal(left), _FLIPPED[op]
+        else:
+            # Column-to-column or computed comparison
+            return {"$expr": {op: [self.expr(left, self.field_ref), self.expr(right, self.field_ref)]}}
+
+        value = _coerce_for_field(field, value)
+        if op == "$eq":
+            return {field: value}
+        return {field: {op: value}}
+
+    def _in_filter(self, node: exp.In) -> Dict[str, Any]:
+        if not isinstance(node.this, exp.Column) or node.args.get("query") is not None:
+            raise _unsupported(node, "(only column IN (literal, ...) is supported)")
+        field = self.field_path(node.this)
+        return {field: {"$in": [_coerce_for_field(field, _literal(item)) for item in node.expressions]}}
+
+    def _like_filter(self, node: exp.Expression) -> Dict[str, Any]:
+        if not isinstance(node.this, exp.Column):
+            raise _unsupported(node, "(LIKE needs a column on the left)")
+        pattern = _literal(node.expression)
+        if not isinstance(pattern, str):
+            raise _unsupported(node, "(LIKE needs a string pattern)")
+        condition: Dict[str, Any] = {"$regex": _like_to_regex(pattern)}
+        if isinstance(node, exp.ILike):
+            condition["$options"] = "i"
+        return {self.field_path(node.this): condition}
+
+    @staticmethod
+    def _negate_field_filter(condition: Dict[str, Any]) -> Dict[str, Any]:
+        (field, value), = condition.items()
+        if isinstance(value, dict) and "$in" in value:
+            return {field: {"$nin": value["$in"]}}
+        if isinstance(value, dict) and "$regex" in value:
+            regex = re.compile(value["$regex"], re.IGNORECASE if value.get("$options") == "i" else 0)
+            return {field: {"$not": regex}}
+        return {"$nor": [condition]}
+
+    def _negated_filter(self, inner: exp.Expression) -> Dict[str, Any]:
+        while isinstance(inner, exp.Paren):
+            inner = inner.this
+        if isinstance(inner, exp.Is) and isinstance(inner.this, exp.Column):
+            return {self.field_path(inner.this): {"$ne": _literal(inner.expression)}}
+        if isinstance(inner, (exp.In, exp.Like, exp.ILike)) and not inner.args.get("negate"):
+            return self._negate_field_filter(self.filter(inner))
+        return {"$nor": [self.filter(inner)]}
+
+    # --- aggregation expressions ---
+
+    def field_ref(self, node: exp.Expression) -> str:
+        if not isinstance(node, exp.Column):
+            raise _unsupported(node, "is only allowed with GROUP BY")
+        return "$" + self.field_path(node)
+
+    def expr(self, node: exp.Expression, resolve: Callable[[exp.Expression], Any]) -> Any:
+        """
+        Translates a scalar SQL expression into an aggregation expression.
+        Columns and aggregate calls are handed to `resolve`, which knows whether
+        they refer to document fields or to $group output.
+        """
+        if isinstance(node, exp.Paren):
+            return self.expr(node.this, resolve)
+        if isinstance(node, (exp.Column, exp.AggFunc)):
+            return resolve(node)
+        if _is_literal(node):
+            value = _literal(node)
+            # Strings starting with "$" would be read as field paths
+            return {"$literal": value} if isinstance(value, str) and value.startswith("$") else value
+
+        node_type = type(node)
+        if node_type in _ARITHMETIC:
+            return {_ARITHMETIC[node_type]: [self.expr(node.this, resolve), self.expr(node.expression, resolve)]}
+        if node_type in _COMPARISONS:
+            return {_COMPARISONS[node_type]: [self.expr(node.this, resolve), self.expr(node.expression, resolve)]}
+        if isinstance(node, exp.And):
+            return {"$and": [self.expr(part, resolve) for part in _conjuncts(node)]}
+        if isinstance(node, exp.Or):
+            return {"$or": [self.expr(part, resolve) for part in _disjuncts(node)]}
+        if isinstance(node, exp.Not):
+            return {"$not": [self.expr(node.this, resolve)]}
+        if isinstance(node, exp.Neg):
+            return {"$multiply": [-1, self.expr(node.this, resolve)]}
+        if node_type in _FUNCTIONS:
+            return {_FUNCTIONS[node_type]: self.expr(node.this, resolve)}
+        if isinstance(node, exp.Round):
+            places = node.args.get("decimals")
+            return {"$round": [self.expr(node.this, resolve), _literal(places) if places is not None else 0]}
+        if isinstance(node, exp.Coalesce):
+            args = [self.expr(node.this, resolve)] + [self.expr(e, resolve) for e in node.expressions]
+            return {"$ifNull": args}
+        if isinstance(node, (exp.Concat, exp.DPipe)):
+            parts = node.expressions if isinstance(node, exp.Concat) else [node.this, node.expression]
+            return {"$concat": [self.expr(part, resolve) for part in parts]}
+        raise _unsupported(node)
+
+    # --- statements ---
+
+    def translate(self, sql: str) -> Dict[str, Any]:
+        try:
+            parsed = sqlglot.parse_one(sql.strip().rstrip(";"), read=self.dialect)
+        except sqlglot.errors.ParseError as e:
+            raise ValueError(f"Cannot parse SQL for MongoDB: {e}")
+
+        if isinstance(parsed, exp.Select):
+            return self._select(parsed)
+        if isinstance(parsed, exp.Delete):
+            return self._delete(parsed)
+        if isinstance(parsed, exp.Update):
+            return self._update(parsed)
+        raise _unsupported(parsed, "(only SELECT, UPDATE and DELETE are supported)")
+
+    def _set_collection(self, table: exp.Expression) -> None:
+        if not isinstance(table, exp.Table) or not table.name:
+            raise _unsupported(table, "(expected a collection name)")
+        self.collection = table.name
+        self.base_names = {table.name, table.alias_or_name}
+
+    def _delete(self, delete: exp.Delete) -> Dict[str, Any]:
+        if delete.args.get("using") or delete.args.get("limit"):
+            raise _unsupported(delete, "(DELETE ... USING/LIMIT)")
+        self._set_collection(delete.this)
+        where = delete.args.get("where")
+        return {
+            "collection": self.collection,
+            "operation": "delete",
+            "filter": self.filter(where.this) if where else {}
+        }
+
+    def _update(self, update: exp.Update) -> Dict[str, Any]:
+        if update.args.get("from_") or update.args.get("from") or update.args.get("limit"):
+            raise _unsupported(update, "(UPDATE ... FROM/LIMIT)")
+        self._set_collection(update.this)
+        where = update.args.get("where")
+
+        assignments: List[Tuple[str, exp.Expression]] = []
+        for assignment in update.expressions:
+            if not isinstance(assignment, exp.EQ) or not isinstance(assignment.this, exp.Column):
+                raise _unsupported(assignment)
+            assignments.append((self.field_path(assignment.this), assignment.expression))
+
+        if all(_is_literal(value) for _, value in assignments):
+            update_doc: Any = {"$set": {field: _coerce_for_field(field, _literal(value)) for field, value in assignments}}
+        else:
+            # Values computed from other fields need an update pipeline (MongoDB 4.2+)
+            update_doc = [{"$set": {field: self.expr(value, self.field_ref) for field, value in assignments}}]
+
+        return {
+            "collection": self.collection,
+            "operation": "update",
+            "filter": self.filter(where.this) if where else {},
+            "update": update_doc
+        }
+
+    def _select(self, select: exp.Select) -> Dict[str, Any]:
+        from_clause = select.args.get("from_") or select.args.get("from")
+        if from_clause is None:
+            raise _unsupported(select, "(missing FROM)")
+        self._set_collection(from_clause.this)
+
+        lookup_stages, join_filters = self._joins(select.args.get("joins") or [])
+
+        where = select.args.get("where")
+        conditions = _conjuncts(where.this) if where else []
+        conditions += join_filters
+        # Conditions on the base collection run before $lookup so they can use indexes
+        pre_match = [c for c in conditions if not self.tables_of(c)]
+        post_match = [c for c in conditions if self.tables_of(c)]
+
+        items = list(select.expressions)
+        has_star = any(isinstance(item, exp.Star) for item in items)
+        limit = _limit_value(select.args.get("limit"))
+        offset = _limit_value(select.args.get("offset"))
+        order = select.args.get("order")
+        group = select.args.get("group")
+        aggregates = [node for item in items for node in item.find_all(exp.AggFunc)]
+        if select.args.get("having") is not None and not group and not aggregates:
+            raise _unsupported(select.args["having"], "without GROUP BY")
+
+        grouped = bool(group or aggregates or select.args.get("distinct"))
+        # find() returns nested paths nested, so "a.b" columns go through $project instead
+        plain_columns = all(
+            isinstance(item, exp.Star) or (isinstance(item, exp.Column) and "." not in self.field_path(item))
+            for item in items
+        )
+        plain_order = not order or all(isinstance(o.this, exp.Column) for o in order.expressions)
+
+        if not lookup_stages and not grouped and plain_columns and plain_order:
+            return self._find(items, has_star, pre_match, order, offset, limit)
+
+        pipeline: List[Dict[str, Any]] = []
+        if pre_match:
+            pipeline.append({"$match": _merge_and([self.filter(c) for c in pre_match])})
+        pipeline.extend(lookup_stages)
+        if post_match:
+            pipeline.append({"$match": _merge_and([self.filter(c) for c in post_match])})
+
+        if grouped:
+            columns = self._grouped_stages(select, items, has_star, pipeline)
+        else:
+            columns = self._row_stages(items, has_star, order, pipeline)
+            if limit is None:
+                limit = DEFAULT_LIMIT
+
+        if offset:
+            pipeline.append({"$skip": offset})
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+        if columns is not None:
+            pipeline.append({"$project": columns})
+
+        query: Dict[str, Any] = {"collection": self.collection, "operation": "aggregate", "pipeline": pipeline}
+        if columns is not None:
+            query["columns"] = [name for name in columns if columns[name] != 0]
+        return query
+
+    def _joins(self, joins: List[exp.Join]) -> Tuple[List[Dict[str, Any]], List[exp.Expression]]:
+        stages: List[Dict[str, Any]] = []
+        extra_filters: List[exp.Expression] = []
+        for join in joins:
+            table = join.this
+            side = (join.side or "").upper()
+            kind = (join.kind or "").upper()
+            if not isinstance(table, exp.Table) or side not in ("", "LEFT") or kind not in ("", "INNER", "OUTER"):
+                raise _unsupported(join, "(only INNER/LEFT joins on collections are supported)")
+            on = join.args.get("on")
+            if on is None:
+                raise _unsupported(join, "(JOIN needs an ON condition)")
+
+            alias = table.alias_or_name
+            key_condition = None
+            others = []
+            for condition in _conjuncts(on):
+                is_key = (
+                    key_condition is None and isinstance(condition, exp.EQ)
+                    and isinstance(condition.this, exp.Column) and isinstance(condition.expression, exp.Column)
+                    and alias in (condition.this.table, condition.expression.table)
+                    and condition.this.table != condition.expression.table
+                )
+                if is_key:
+                    key_condition = condition
+                else:
+                    others.append(condition)
+            if key_condition is None:
+                raise _unsupported(join, "(JOIN needs an equality between two collections)")
+            if others and side == "LEFT":
+                raise _unsupported(join, "(LEFT JOIN with extra ON conditions)")
+
+            if key_condition.this.table == alias:
+                foreign, local = key_condition.this, key_condition.expression
+            else:
+                local, foreign = key_condition.this, key_condition.expression
+
+            stages.append({"$lookup": {
+                "from": table.name,
+                "localField": self.field_path(local),
+                "foreignField": foreign.name,
+                "as": alias
+            }})
+            stages.append({"$unwind": {"path": f"${alias}", "preserveNullAndEmptyArrays": side == "LEFT"}})
+            self.joined[alias] = alias
+            extra_filters.extend(others)
+        return stages, extra_filters
+
+    def _find(self, items, has_star, conditions, order, offset, limit) -> Dict[str, Any]:
+        query: Dict[str, Any] = {
+            "collection": self.collection,
+            "operation": "find",
+            "filter": _merge_and([self.filter(c) for c in conditions]) if conditions else {},
+            "limit": DEFAULT_LIMIT if limit is None else limit
+        }
+        if not has_star:
+            fields = [self.field_path(item) for item in items]
+            projection = {field: 1 for field in fields}
+            if "_id" not in projection:
+                projection["_id"] = 0
+            query["projection"] = projection
+            query["columns"] = fields
+        if order:
+            query["sort"] = [
+                (self.field_path(o.this), -1 if o.args.get("desc") else 1) for o in order.expressions
+            ]
+        if offset:
+            query["skip"] = offset
+        return query
+
+    @staticmethod
+    def _output_name(item: exp.Expression, position: int) -> str:
+        if isinstance(item, exp.Alias):
+            return item.alias
+        if isinstance(item, exp.Column):
+            return item.name
+        # Same header a SQL database would return, e.g. "COUNT(*)" ("." is not allowed in field names)
+        return item.sql(dialect="mysql").replace(".", "_").lstrip("$") or f"expr_{position}"
+
+    def _select_item(self, items, node: exp.Expression) -> Optional[exp.Expression]:
+        """Resolves ORDER BY / GROUP BY positions and select aliases to select expressions."""
+        if isinstance(node, exp.Literal) and not node.is_string:
+            position = int(node.this)
+            if not 1 <= position <= len(items):
+                raise _unsupported(node, "(position out of range)")
+            item = items[position - 1]
+            return item.this if isinstance(item, exp.Alias) else item
+        if isinstance(node, exp.Column) and not node.table:
+            for item in items:
+                if isinstance(item, exp.Alias) and item.alias == node.name:
+                    return item.this
+        return None
+
+    def _row_stages(self, items, has_star, order, pipeline) -> Optional[Dict[str, Any]]:
+        """ORDER BY and projection for non-aggregated pipelines (joins, computed columns)."""
+        def resolve(node: exp.Expression) -> Any:
+            aliased = self._select_item(items, node)
+            if aliased is not None:
+                return self.expr(aliased, self.field_ref)
+            return self.field_ref(node)
+
+        self._sort_stages(items, order, resolve, pipeline)
+        if has_star:
+            return None
+
+        projection: Dict[str, Any] = {}
+        for position, item in enumerate(items, start=1):
+            value = item.this if isinstance(item, exp.Alias) else item
+            projection[self._output_name(item, position)] = self._projected(self.expr(value, self.field_ref))
+        if "_id" not in projection:
+            projection["_id"] = 0
+        return projection
+
+    def _grouped_stages(self, select, items, has_star, pipeline) -> Dict[str, Any]:
+        """$group (+ HAVING, ORDER BY) for GROUP BY, aggregates and DISTINCT."""
+        if has_star:
+            raise _unsupported(select, "(SELECT * with GROUP BY/DISTINCT)")
+
+        group = select.args.get("group")
+        key_nodes = list(group.expressions) if group else []
+        if not key_nodes and select.args.get("distinct"):
+            key_nodes = [item.this if isinstance(item, exp.Alias) else item for item in items]
+
+        # Group keys are named after their column or the select alias that exposes them
+        keys: Dict[str, exp.Expression] = {}
+        for node in key_nodes:
+            node = self._select_item(items, node) or node
+            if any(node.find_all(exp.AggFunc)):
+                raise _unsupported(node, "(aggregate in GROUP BY)")
+            name = None
+            for position, item in enumerate(items, start=1):
+                value = item.this if isinstance(item, exp.Alias) else item
+                if value == node:
+                    name = self._output_name(item, position)
+                    break
+            if name is None:
+                name = node.name if isinstance(node, exp.Column) else f"key_{len(keys)}"
+            keys[name] = node
+
+        # One accumulator per distinct aggregate expression
+        accumulators: Dict[str, Dict[str, Any]] = {}
+        agg_names: Dict[str, str] = {}
+        count_distinct: set = set()
+
+        def accumulator_for(agg: exp.AggFunc) -> str:
+            signature = agg.sql(dialect="mysql")
+            if signature in agg_names:
+                return agg_names[signature]
+            name = f"agg_{len(agg_names)}"
+            for position, item in enumerate(items, start=1):
+                if isinstance(item, exp.Alias) and item.this == agg:
+                    name = item.alias
+                    break
+            agg_names[signature] = name
+
+            if isinstance(agg, exp.Count):
+                arg = agg.this
+                if isinstance(arg, exp.Star):
+                    accumulators[name] = {"$sum": 1}
+                elif isinstance(arg, exp.Distinct):
+                    accumulators[name] = {"$addToSet": self.expr(arg.expressions[0], self.field_ref)}
+                    count_distinct.add(name)
+                else:
+                    value = self.expr(arg, self.field_ref)
+                    # COUNT(col) skips NULL / missing values
+                    accumulators[name] = {"$sum": {"$cond": [{"$eq": [{"$ifNull": [value, None]}, None]}, 0, 1]}}
+            elif type(agg) in _ACCUMULATORS:
+                accumulators[name] = {_ACCUMULATORS[type(agg)]: self.expr(agg.this, self.field_ref)}
+            else:
+                raise _unsupported(agg)
+            return name
+
+        def resolve_grouped(node: exp.Expression) -> Any:
+            """Expression over the $group output (aggregates and group keys only)."""
+            if isinstance(node, exp.AggFunc):
+                name = accumulator_for(node)
+                if name in count_distinct:
+                    return {"$size": {"$setDifference": [f"${name}", [None]]}}
+                return f"${name}"
+            for name, key in keys.items():
+                if node == key or (
+                    isinstance(node, exp.Column) and isinstance(key, exp.Column)
+                    and self.field_path(node) == self.field_path(key)
+                ):
+                    return f"$_id.{name}"
+            if isinstance(node, exp.Column):
+                aliased = self._select_item(items, node)
+                if aliased is not None:
+                    return resolve_grouped(aliased)
+                raise _unsupported(node, "must appear in GROUP BY or an aggregate")
+            # Compound expressions are rebuilt over the grouped values
+            return self.expr(node, resolve_grouped)
+
+        projection: Dict[str, Any] = {"_id": 0}
+        for position, item in enumerate(items, start=1):
+            value = item.this if isinstance(item, exp.Alias) else item
+            projection[self._output_name(item, position)] = self._projected(resolve_grouped(value))
+
+        having = select.args.get("having")
+        having_expr = resolve_grouped(having.this) if having is not None else None
+
+        order = select.args.get("order")
+        sort_values = []
+        if order:
+            for ordered in order.expressions:
+                node = self._select_item(items, ordered.this) or ordered.this
+                sort_values.append((resolve_grouped(node), -1 if ordered.args.get("desc") else 1))
+
+        group_id = {name: self.expr(node, self.field_ref) for name, node in keys.items()} if keys else None
+        pipeline.append({"$group": {"_id": group_id, **accumulators}})
+        if having_expr is not None:
+            pipeline.append({"$match": {"$expr": having_expr}})
+        if sort_values:
+            pipeline.extend(self._sort_by_values(sort_values))
+        return projection
+
+    def _sort_stages(self, items, order, resolve, pipeline) -> None:
+        if not order:
+            return
+        values = []
+        for ordered in order.expressions:
+            node = self._select_item(items, ordered.this) or ordered.this
+            values.append((self.expr(node, resolve), -1 if ordered.args.get("desc") else 1))
+        pipeline.extend(self._sort_by_values(values))
+
+    @staticmethod
+    def _sort_by_values(values: List[Tuple[Any, int]]) -> List[Dict[str, Any]]:
+        """$sort on field paths; computed sort keys are materialized with $addFields first."""
+        computed: Dict[str, Any] = {}
+        sort: Dict[str, int] = {}
+        for position, (value, direction) in enumerate(values):
+            if isinstance(value, str) and value.startswith("$"):
+                sort[value[1:]] = direction
+            else:
+                name = f"_sort_{position}"
+                computed[name] = value
+                sort[name] = direction
+        stages: List[Dict[str, Any]] = []
+        if computed:
+            stages.append({"$addFields": computed})
+        stages.append({"$sort": sort})
+        if computed:
+            stages.append({"$unset": list(computed)})
+        return stages
+
+    @staticmethod
+    def _projected(value: Any) -> Any:
+        # Bare numbers / booleans in $project mean include/exclude, wrap constants
+        if isinstance(value, (int, float, bool)) or value is None:
+            return {"$literal": value}
+        return value
+
+
+def sql_to_mongo_query(sql: str) -> Dict[str, Any]:
+    """
+    Converts a SQL statement into the query format accepted by execute_mongo_query:
+    {"collection", "operation": "find" | "aggregate" | "update" | "delete", ...}.
+    Raises ValueError for SQL that has no faithful MongoDB translation.
+    """
+    return _Translator(db_connector.sqlglot_dialect("mongodb")).translate(sql)
+
+
+def to_mongo_query(query_text: str) -> Dict[str, Any]:
+    """
+    Executor format for a stored query: native pipelines (JSON generated for
+    MongoDB connections) are validated as-is, SQL is translated.
+    """
+    from app.sql_guardrails.mongo_validator import is_mongo_query, parse_mongo_query
+
+    if is_mongo_query(query_text):
+        return parse_mongo_query(query_text)
+    return sql_to_mongo_query(query_text)
@@ -0,0 +1,179 @@
+"""
+In-memory lexical index over table and column names of a connection's schema.
+Complements embedding search: BM25 over name tokens catches tables whose names
+literally appear in the question, character trigrams catch near-misses and
+typos ("custmer" -> "customers"). Indexes are built at ingestion time and
+rebuilt lazily when the stored schema version changes.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "from", "by", "with", "and", "or", "is", "are",
+    "was", "were", "be", "all", "any", "each", "every", "how", "many", "much", "what", "which", "who",
+    "whose", "show", "list", "give", "get", "find", "me", "my", "our", "their", "there", "that", "this",
+    "per", "than", "more", "less", "most", "least", "top", "last", "first", "do", "does", "did", "have", "has",
+}
+
+# Field weights: a table-name hit matters more than a column-name hit
+_TABLE_NAME_WEIGHT = 3
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_TRIGRAM_MIN_SIMILARITY = 0.35
+
+
+def _split_identifier(identifier: str) -> List[str]:
+    """'public.OrderItems_v2' -> ['public', 'order', 'items', 'v2'] plus the full parts."""
+    tokens = []
+    for part in re.split(r"[^0-9A-Za-z_]+", identifier):
+        if not part:
+            continue
+        lowered = part.lower()
+        tokens.append(lowered)
+        words = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", part)
+        sub_tokens = [w.lower() for chunk in words for w in chunk.split("_") if w]
+        if len(sub_tokens) > 1:
+            tokens.extend(sub_tokens)
+    return tokens
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _split_identifier(text) if t not in _STOPWORDS]
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LexicalIndex:
+    def __init__(self, schema_info: Dict[str, Any]):
+        self.tables: List[str] = list(schema_info.keys())
+        self._term_freqs: List[Counter] = []
+        self._doc_lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        # Whole table names (qualified and unqualified) for exact mention detection
+        self._names: Dict[str, Set[int]] = defaultdict(set)
+        # Trigram index over table-name terms
+        self._term_tables: Dict[str, Set[int]] = defaultdict(set)
+        self._trigram_terms: Dict[str, Set[str]] = defaultdict(set)
+
+        for doc_id, (table, details) in enumerate(schema_info.items()):
+            name_tokens = _split_identifier(table)
+            column_tokens = [
+                token
+                for col in (details or {}).get("columns", [])
+                for token in _split_identifier(str(col.get("name", "")))
+            ]
+            freqs = Counter()
+            for token in name_tokens:
+                freqs[token] += _TABLE_NAME_WEIGHT
+            freqs.update(column_tokens)
+            self._term_freqs.append(freqs)
+            self._doc_lengths.append(sum(freqs.values()))
+            for token in freqs:
+                self._postings[token].append(doc_id)
+
+            lowered = table.lower()
+            self._names[lowered].add(doc_id)
+            self._names[lowered.split(".")[-1]].add(doc_id)
+            for token in name_tokens:
+                if len(token) >= 3 and token not in self._term_tables:
+                    for gram in _trigrams(token):
+                        self._trigram_terms[gram].add(token)
+                self._term_tables[token].add(doc_id)
+
+        self._avg_length = (sum(self._doc_lengths) / len(self._doc_lengths)) if self._doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def exact_matches(self, question: str) -> List[str]:
+        """Tables whose full (or unqualified) name appears verbatim in the question."""
+        words = set(re.findall(r"[0-9A-Za-z_.]+", question.lower()))
+        words |= {w.rstrip(".") for w in words}
+        hits: List[str] = []
+        for word in words:
+            for doc_id in self._names.get(word, ()):
+                if self.tables[doc_id] not in hits:
+                    hits.append(self.tables[doc_id])
+        return hits
+
+    def bm25(self, question: str, k: int) -> List[Tuple[str, float]]:
+        terms = [t for t in set(tokenize(question)) if t in self._postings]
+        if not terms:
+            return []
+        total = len(self.tables)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            postings = self._postings[term]
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id in postings:
+                tf = self._term_freqs[doc_id][term]
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._doc_lengths[doc_id] / self._avg_length)
+                scores[doc_id] += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.tables[doc_id], score) for doc_id, score in ranked]
+
+    def trigram(self, question: str, k: int) -> List[Tuple[str, float]]:
+        """Fuzzy matches between question words and table-name terms (typos, plurals)."""
+        scores: Dict[int, float] = {}
+        for word in set(tokenize(question)):
+            if len(word) < 3:
+                continue
+            word_grams = _trigrams(word)
+            overlaps: Counter = Counter()
+            for gram in word_grams:
+                overlaps.update(self._trigram_terms.get(gram, ()))
+            for term, shared in overlaps.items():
+                similarity = shared / (len(word_grams) + len(_trigrams(term)) - shared)
+                if similarity < _TRIGRAM_MIN_SIMILARITY:
+                    continue
+                for doc_id in self._term_tables[term]:
+                    scores[doc_id] = max(scores.get(doc_id, 0.0), similarity)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.tables[doc_id], score) for doc_id, score in ranked]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int) -> Dict[str, float]:
+    """Sum of 1 / (rrf_k + rank) over every ranking a table appears in."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, table in enumerate(ranking, start=1):
+            fused[table] += 1.0 / (rrf_k + rank)
+    return dict(fused)
+
+
+class LexicalIndexRegistry:
+    """Per-connection indexes, tagged with the schema version they were built from."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[int, Tuple[Optional[int], LexicalIndex]] = {}
+
+    def build(self, connection_id: int, schema_info: Dict[str, Any], version: Optional[int]) -> LexicalIndex:
+        index = LexicalIndex(schema_info)
+        with self._lock:
+            self._indexes[connection_id] = (version, index)
+        return index
+
+    def get(self, connection_id: int) -> Optional[LexicalIndex]:
+        """Returns the connection's index, rebuilding it if the schema was re-ingested elsewhere."""
+        from app.schema_ingestion.catalog import load_schema, schema_version
+
+        version = schema_version(connection_id)
+        with self._lock:
+            cached = self._indexes.get(connection_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        schema_info = load_schema(connection_id)
+        if not schema_info:
+            return None
+        return self.build(connection_id, schema_info, version)
+
+
+lexical_indexes = LexicalIndexRegistry()
@@ -20,6 +20,13 @@ class VectorStore:
             ids=ids
         )
         
+    def delete_collection(self, collection_name: str):
+        # Used before re-ingesting collections whose documents may have disappeared (dropped columns)
+        try:
+            self.get_store(collection_name).delete_collection()
+        except Exception as e:
+            print(f"WARN: Could not delete collection {collection_name}: {e}")
+        
     def query(self, collection_name: str, query_text: str, n_results: int = 5):
         store = self.get_store(collection_name)
         return store.similarity_search(query_text, k=n_results)
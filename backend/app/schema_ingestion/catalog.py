@@ -0,0 +1,42 @@
+from typing import Dict, Any, Optional
+from app.db.session import SessionLocal
+from app.models.schema import SchemaMetadata
+
+
+def load_schema(connection_id: int) -> Dict[str, Any]:
+    """
+    Returns the ingested schema (schema_json) for a connection:
+    {table: {"columns": [{"name", "type", ...}], "foreign_keys": [...]}}, or {} if not ingested.
+    """
+    db = SessionLocal()
+    try:
+        metadata = db.query(SchemaMetadata).filter(SchemaMetadata.db_connection_id == connection_id).first()
+        return dict(metadata.schema_json or {}) if metadata else {}
+    finally:
+        db.close()
+
+
+def table_count(connection_id: int) -> Optional[int]:
+    """Number of ingested tables, or None if the schema was never ingested."""
+    db = SessionLocal()
+    try:
+        metadata = db.query(SchemaMetadata.table_count).filter(SchemaMetadata.db_connection_id == connection_id).first()
+        if metadata is None:
+            return None
+        if metadata[0] is not None:
+            return metadata[0]
+        # Ingested before table_count existed
+        schema_json = db.query(SchemaMetadata.schema_json).filter(SchemaMetadata.db_connection_id == connection_id).scalar()
+        return len(schema_json or {})
+    finally:
+        db.close()
+
+
+def schema_version(connection_id: int) -> Optional[int]:
+    """Version of the ingested schema (bumped on every ingestion), without loading the JSON."""
+    db = SessionLocal()
+    try:
+        row = db.query(SchemaMetadata.version).filter(SchemaMetadata.db_connection_id == connection_id).first()
+        return row[0] if row else None
+    finally:
+        db.close()
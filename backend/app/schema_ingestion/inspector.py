@@ -1,8 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, inspect
+from app.core.config import settings
 from app.models.db_connection import DBConnection
 from app.services.credential_encryptor import encryptor
 from app.services.db_connector import db_connector
 
+def _postgres_foreign_keys(conn):
+    """
+    All foreign keys in one information_schema query, keyed by "schema.table".
+    Referenced tables are qualified the same way. Constraints on tables the role
+    cannot see are simply absent; any failure yields no foreign keys.
+    """
+    from sqlalchemy import text
+    
+    query = text("""
+        SELECT kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.column_name,
+               ref.table_schema, ref.table_name, ref.column_name
+        FROM information_schema.referential_constraints rc
+        JOIN information_schema.key_column_usage kcu
+          ON kcu.constraint_schema = rc.constraint_schema AND kcu.constraint_name = rc.constraint_name
+        JOIN information_schema.key_column_usage ref
+          ON ref.constraint_schema = rc.unique_constraint_schema
+         AND ref.constraint_name = rc.unique_constraint_name
+         AND ref.ordinal_position = kcu.position_in_unique_constraint
+        ORDER BY kcu.table_schema, kcu.table_name, kcu.constraint_name, kcu.ordinal_position
+    """)
+    
+    foreign_keys = {}
+    try:
+        constraints = {}
+        for schema_name, table_name, constraint, column, ref_schema, ref_table, ref_column in conn.execute(query):
+            table = f"{schema_name}.{table_name}"
+            fk = constraints.get((table, constraint))
+            if fk is None:
+                fk = {"constrained_columns": [], "referred_table": f"{ref_schema}.{ref_table}", "referred_columns": []}
+                constraints[(table, constraint)] = fk
+                foreign_keys.setdefault(table, []).append(fk)
+            fk["constrained_columns"].append(column)
+            fk["referred_columns"].append(ref_column)
+    except Exception as e:
+        print(f"Warning: Could not inspect foreign keys: {e}")
+        conn.rollback()
+        return {}
+    return foreign_keys
+
+
+def _postgres_primary_keys(conn):
+    """
+    Primary key columns of every visible table in one information_schema query,
+    keyed by "schema.table". Any failure yields no primary keys.
+    """
+    from sqlalchemy import text
+    
+    query = text("""
+        SELECT kcu.table_schema, kcu.table_name, kcu.column_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+          ON kcu.constraint_schema = tc.constraint_schema AND kcu.constraint_name = tc.constraint_name
+         AND kcu.table_name = tc.table_name
+        WHERE tc.constraint_type = 'PRIMARY KEY'
+    """)
+    
+    primary_keys = {}
+    try:
+        for schema_name, table_name, column in conn.execute(query):
+            primary_keys.setdefault(f"{schema_name}.{table_name}", set()).add(column)
+    except Exception as e:
+        print(f"Warning: Could not inspect primary keys: {e}")
+        conn.rollback()
+        return {}
+    return primary_keys
+
+
 def inspect_schema(db_connection: DBConnection):
     """
     Connects to the target database and extracts schema information.
@@ -29,25 +98,28 @@ def inspect_schema(db_connection: DBConnection):
         
         try:
             collections = mongo_client.list_collections(client, db_connection.database_name)
+            sample_size = db_connection.get_setting("mongo_schema_sample_size", settings.MONGO_SCHEMA_SAMPLE_SIZE)
             
-            for collection_name in collections:
-                try:
-                    print(f"DEBUG: Inspecting MongoDB collection {collection_name}")
-                    documents = mongo_client.sample_documents(
-                        client, db_connection.database_name, collection_name, limit=20
-                    )
-                    columns = mongo_client.infer_schema_from_documents(documents)
-                    
-                    schema_info[collection_name] = {
-                        "columns": columns,
-                        "foreign_keys": []  # MongoDB doesn't have formal FK constraints
-                    }
-                except Exception as e:
-                    print(f"Warning: Could not inspect collection {collection_name}: {e}")
-                    schema_info[collection_name] = {
-                        "columns": [],
-                        "foreign_keys": []
-                    }
+            def inspect_collection(collection_name):
+                print(f"DEBUG: Inspecting MongoDB collection {collection_name}")
+                return mongo_client.inspect_collection(
+                    client, db_connection.database_name, collection_name, sample_size
+                )
+            
+            # MongoClient is thread-safe; collections are sampled concurrently
+            workers = max(1, min(settings.MONGO_SCHEMA_INSPECT_WORKERS, len(collections)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {name: pool.submit(inspect_collection, name) for name in collections}
+                for collection_name, future in futures.items():
+                    try:
+                        schema_info[collection_name] = future.result()
+                    except Exception as e:
+                        print(f"Warning: Could not inspect collection {collection_name}: {e}")
+                        schema_info[collection_name] = {
+                            "columns": [],
+                            "foreign_keys": [],
+                            "indexes": []
+                        }
         finally:
             client.close()
         
@@ -70,7 +142,9 @@ def inspect_schema(db_connection: DBConnection):
                 ORDER BY table_schema, table_name
             """)
             
-            tables_result = conn.execute(tables_query)
+            tables_result = conn.execute(tables_query).fetchall()
+            foreign_keys = _postgres_foreign_keys(conn)
+            primary_keys = _postgres_primary_keys(conn)
             
             for row in tables_result:
                 schema_name = row[0]
@@ -90,17 +164,18 @@ def inspect_schema(db_connection: DBConnection):
                     columns_result = conn.execute(columns_query, {"schema": schema_name, "table": table_name})
                     
                     columns = []
+                    table_primary_keys = primary_keys.get(full_table_name, set())
                     for col_row in columns_result:
                         columns.append({
                             "name": col_row[0],
                             "type": col_row[1],
-                            "primary_key": False,  # We'll skip PK detection to avoid permission issues
+                            "primary_key": col_row[0] in table_primary_keys,
                             "nullable": col_row[2] == 'YES'
                         })
                     
                     schema_info[full_table_name] = {
                         "columns": columns,
-                        "foreign_keys": []  # Skip FK detection to avoid permission issues
+                        "foreign_keys": foreign_keys.get(full_table_name, [])
                     }
                     
                 except Exception as e:
@@ -116,12 +191,18 @@ def inspect_schema(db_connection: DBConnection):
         
         for table_name in inspector.get_table_names():
             try:
+                # get_columns does not report key membership
+                try:
+                    primary_keys = set(inspector.get_pk_constraint(table_name).get("constrained_columns") or [])
+                except Exception as pk_error:
+                    print(f"Warning: Could not inspect primary key for {table_name}: {pk_error}")
+                    primary_keys = set()
                 columns = []
                 for col in inspector.get_columns(table_name):
                     columns.append({
                         "name": col["name"],
                         "type": str(col["type"]),
-                        "primary_key": col.get("primary_key", False),
+                        "primary_key": col["name"] in primary_keys,
                         "nullable": col.get("nullable", True)
                     })
                     
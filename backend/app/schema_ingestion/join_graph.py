@@ -0,0 +1,169 @@
+"""
+Foreign key graph over an ingested schema. Used to pull bridge/junction tables
+into the candidate set and to hand the generator explicit join paths instead of
+letting it guess join conditions.
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JoinEdge:
+    def __init__(self, left_table: str, left_columns: List[str], right_table: str, right_columns: List[str]):
+        self.left_table = left_table
+        self.left_columns = left_columns
+        self.right_table = right_table
+        self.right_columns = right_columns
+
+    def reversed(self) -> "JoinEdge":
+        return JoinEdge(self.right_table, self.right_columns, self.left_table, self.left_columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "left_table": self.left_table,
+            "left_columns": self.left_columns,
+            "right_table": self.right_table,
+            "right_columns": self.right_columns,
+        }
+
+    def __str__(self) -> str:
+        return " AND ".join(
+            f"{self.left_table}.{left} = {self.right_table}.{right}"
+            for left, right in zip(self.left_columns, self.right_columns)
+        )
+
+
+class JoinGraph:
+    def __init__(self, schema_info: Dict[str, Any]):
+        self._edges: Dict[str, List[JoinEdge]] = {table: [] for table in schema_info}
+        # MySQL foreign keys name the referred table unqualified; map both spellings
+        by_name = {table: table for table in schema_info}
+        for table in schema_info:
+            by_name.setdefault(table.split(".")[-1], table)
+
+        for table, details in schema_info.items():
+            for fk in (details or {}).get("foreign_keys", []):
+                referred = by_name.get(fk["referred_table"])
+                if referred is None or referred == table:
+                    continue
+                edge = JoinEdge(table, list(fk["constrained_columns"]), referred, list(fk["referred_columns"]))
+                self._edges[table].append(edge)
+                self._edges[referred].append(edge.reversed())
+
+    def degree(self, table: str) -> int:
+        return len(self._edges.get(table, ()))
+
+    def expand(self, seeds: Dict[str, float], hops: int, decay: float) -> Dict[str, float]:
+        """
+        Scores tables reachable from the seeds within `hops` foreign keys.
+        Each seed contributes score * decay^distance, damped for hub tables, so a
+        junction table linking two seeds outranks a neighbour of only one.
+        """
+        expanded: Dict[str, float] = {}
+        for seed, score in seeds.items():
+            for table, distance in self._distances(seed, hops).items():
+                if table in seeds:
+                    continue
+                weight = score * decay ** distance / (1 + math.log1p(self.degree(table)))
+                expanded[table] = expanded.get(table, 0.0) + weight
+        return expanded
+
+    def shortest_path(self, source: str, target: str, max_hops: int) -> Optional[List[JoinEdge]]:
+        if source == target:
+            return []
+        previous: Dict[str, JoinEdge] = {}
+        queue = deque([(source, 0)])
+        seen = {source}
+        while queue:
+            table, distance = queue.popleft()
+            if distance >= max_hops:
+                continue
+            for edge in self._edges.get(table, ()):
+                if edge.right_table in seen:
+                    continue
+                seen.add(edge.right_table)
+                previous[edge.right_table] = edge
+                if edge.right_table == target:
+                    path = []
+                    node = target
+                    while node != source:
+                        path.append(previous[node])
+                        node = previous[node].left_table
+                    return list(reversed(path))
+                queue.append((edge.right_table, distance + 1))
+        return None
+
+    def join_plan(self, tables: List[str], max_hops: int) -> Tuple[List[JoinEdge], List[str]]:
+        """
+        Connects the tables with the fewest joins (greedy Steiner tree: repeatedly
+        attach the closest unconnected table). Returns the join edges and the
+        bridge tables the plan had to add. Unreachable tables are left out.
+        """
+        tables = [t for t in tables if t in self._edges]
+        if len(tables) < 2:
+            return [], []
+        connected = [tables[0]]
+        remaining = tables[1:]
+        edges: List[JoinEdge] = []
+        bridges: List[str] = []
+        while remaining:
+            best = None
+            for target in remaining:
+                for source in connected:
+                    path = self.shortest_path(source, target, max_hops)
+                    if path is not None and (best is None or len(path) < len(best[1])):
+                        best = (target, path)
+            if best is None:
+                break
+            target, path = best
+            remaining.remove(target)
+            for edge in path:
+                if edge.right_table not in connected:
+                    connected.append(edge.right_table)
+                    edges.append(edge)
+                    if edge.right_table not in tables:
+                        bridges.append(edge.right_table)
+        return edges, bridges
+
+    def _distances(self, source: str, hops: int) -> Dict[str, int]:
+        distances = {source: 0}
+        queue = deque([source])
+        while queue:
+            table = queue.popleft()
+            if distances[table] >= hops:
+                continue
+            for edge in self._edges.get(table, ()):
+                if edge.right_table not in distances:
+                    distances[edge.right_table] = distances[table] + 1
+                    queue.append(edge.right_table)
+        distances.pop(source)
+        return distances
+
+
+class JoinGraphRegistry:
+    """Per-connection graphs, rebuilt when the ingested schema version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graphs: Dict[int, Tuple[Optional[int], JoinGraph]] = {}
+
+    def get(self, connection_id: int) -> Optional[JoinGraph]:
+        from app.schema_ingestion.catalog import load_schema, schema_version
+
+        version = schema_version(connection_id)
+        with self._lock:
+            cached = self._graphs.get(connection_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        schema_info = load_schema(connection_id)
+        if not schema_info:
+            return None
+        graph = JoinGraph(schema_info)
+        with self._lock:
+            self._graphs[connection_id] = (version, graph)
+        return graph
+
+
+join_graphs = JoinGraphRegistry()
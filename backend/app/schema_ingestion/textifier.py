@@ -10,18 +10,58 @@ def textify_schema(schema_json: dict) -> str:
         col_desc = []
         for col in details["columns"]:
             pk_str = " (Primary Key)" if col["primary_key"] else ""
-            col_desc.append(f"{col['name']} ({col['type']}){pk_str}")
+            # Sampled MongoDB fields that only some documents have
+            freq = col.get("frequency")
+            freq_str = f" (in {round(freq * 100)}% of documents)" if freq is not None and freq < 1 else ""
+            col_desc.append(f"{col['name']} ({col['type']}){pk_str}{freq_str}")
             
         fk_desc = []
         for fk in details["foreign_keys"]:
             fk_desc.append(f"Foreign Key from {fk['constrained_columns']} to {fk['referred_table']}.{fk['referred_columns']}")
             
+        index_desc = []
+        for index in details.get("indexes", []):
+            fields = ", ".join(field for field, _ in index["keys"])
+            unique_str = "Unique index" if index.get("unique") else "Index"
+            index_desc.append(f"{unique_str} {index['name']} on ({fields}).")
+            
         desc = f"Table '{table}' has columns: {', '.join(col_desc)}."
         if fk_desc:
             desc += " " + " ".join(fk_desc)
+        if index_desc:
+            desc += " " + " ".join(index_desc)
             
         docs.append(desc)
         metadatas.append({"table": table})
         ids.append(f"table_{table}")
         
     return docs, metadatas, ids
+
+
+def textify_columns(table: str, details: dict):
+    """
+    One document per column of a table, for the column-level index.
+    Wide tables embed poorly as a single document; per-column text lets
+    grounding narrow them down by vector search.
+    """
+    docs = []
+    metadatas = []
+    ids = []
+    
+    references = {}
+    for fk in details.get("foreign_keys", []):
+        for local, remote in zip(fk["constrained_columns"], fk["referred_columns"]):
+            references[local] = f"{fk['referred_table']}.{remote}"
+            
+    for col in details["columns"]:
+        desc = f"Column '{col['name']}' ({col['type']}) of table '{table}'."
+        if col.get("primary_key"):
+            desc += " Primary Key."
+        if col["name"] in references:
+            desc += f" References {references[col['name']]}."
+            
+        docs.append(desc)
+        metadatas.append({"table_name": table, "column_name": col["name"], "type": "column_schema"})
+        ids.append(f"table_{table}_col_{col['name']}")
+        
+    return docs, metadatas, ids
@@ -2,9 +2,17 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from typing import Dict, Any, Tuple
+import hashlib
+import threading
 import urllib.parse
+from app.core.config import settings
 
 class DBConnector:
+    def __init__(self):
+        # Pooled engines keyed by (connection id, URI hash) so credential changes get a fresh pool
+        self._engines: Dict[Tuple[int, str], Engine] = {}
+        self._engines_lock = threading.Lock()
+
     @staticmethod
     def build_uri(connection_details: Dict[str, Any], decrypted_password: str) -> str:
         """Constructs a database connection URI."""
@@ -26,6 +34,9 @@ class DBConnector:
                 return f"mysql+pymysql://{user}:{password}@{host}:{port}/{db_name}"
             else:
                 return f"mysql+pymysql://{user}@{host}:{port}/{db_name}"
+        elif db_type == "sqlite":
+            # Local file databases (e.g. evaluation fixtures); database_name is the file path
+            return f"sqlite:///{db_name}"
         elif db_type == "mongodb":
             # MongoDB URIs are handled by mongo_client.py
             # Return a placeholder - actual URI is built by MongoDBClient
@@ -33,6 +44,15 @@ class DBConnector:
         else:
             raise ValueError(f"Unsupported database type: {db_type}")
 
+    @staticmethod
+    def sqlglot_dialect(db_type: str) -> str:
+        """Maps a connection db_type to the sqlglot dialect name."""
+        if db_type in ("postgres", "postgresql"):
+            return "postgres"
+        if db_type == "sqlite":
+            return "sqlite"
+        return "mysql"
+
     @staticmethod
     def test_connection(connection_details: Dict[str, Any], password: str) -> Tuple[bool, str]:
         """Tries to connect to the database and runs a simple query."""
@@ -46,7 +66,8 @@ class DBConnector:
         try:
             uri = DBConnector.build_uri(connection_details, password)
             # Create a throwaway engine for testing
-            engine = create_engine(uri, connect_args={"connect_timeout": 5})
+            connect_args = {"timeout": 5} if db_type == "sqlite" else {"connect_timeout": 5}
+            engine = create_engine(uri, connect_args=connect_args)
             
             with engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
@@ -68,4 +89,35 @@ class DBConnector:
         uri = DBConnector.build_uri(details, decrypted_password)
         return create_engine(uri)
 
+    def get_pooled_engine(self, db_connection_model, decrypted_password: str) -> Engine:
+        """
+        Returns a long-lived pooled engine for a stored DBConnection.
+        Unlike create_engine_for_connection, callers must NOT dispose it.
+        """
+        details = {
+            "db_type": db_connection_model.db_type,
+            "username": db_connection_model.username,
+            "host": db_connection_model.host,
+            "port": db_connection_model.port,
+            "database_name": db_connection_model.database_name
+        }
+        uri = DBConnector.build_uri(details, decrypted_password)
+        key = (db_connection_model.id, hashlib.sha256(uri.encode("utf-8")).hexdigest())
+        
+        with self._engines_lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                # Drop pools built with outdated credentials for this connection
+                for stale_key in [k for k in self._engines if k[0] == db_connection_model.id]:
+                    self._engines.pop(stale_key).dispose()
+                engine = create_engine(
+                    uri,
+                    pool_size=settings.TARGET_DB_POOL_SIZE,
+                    max_overflow=settings.TARGET_DB_POOL_MAX_OVERFLOW,
+                    pool_recycle=settings.TARGET_DB_POOL_RECYCLE_SECONDS,
+                    pool_pre_ping=True
+                )
+                self._engines[key] = engine
+            return engine
+
 db_connector = DBConnector()
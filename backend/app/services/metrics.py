@@ -0,0 +1,104 @@
+"""
+In-process metrics registry for QueryFlow AI.
+Collects counters, gauges and timing observations which are exposed
+through the admin metrics endpoint.
+"""
+import threading
+from collections import deque
+from typing import Dict, Any, Deque, Optional
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    """Builds a Prometheus-style key, e.g. query.cache.hits{connection_id=3}."""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    def __init__(self, window_size: int = 1000):
+        # Observations keep a bounded window so percentiles reflect recent traffic
+        self._window_size = window_size
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._observations: Dict[str, Deque[float]] = {}
+        self._observation_totals: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1, /, **labels) -> None:
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, /, **labels) -> None:
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, /, **labels) -> None:
+        """Records a single observation (e.g. a latency in seconds)."""
+        key = _metric_key(name, labels)
+        with self._lock:
+            window = self._observations.get(key)
+            if window is None:
+                window = deque(maxlen=self._window_size)
+                self._observations[key] = window
+                self._observation_totals[key] = {"count": 0, "sum": 0.0}
+            window.append(value)
+            totals = self._observation_totals[key]
+            totals["count"] += 1
+            totals["sum"] += value
+
+    def get_counter(self, name: str, /, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def percentile(self, name: str, q: float, /, **labels) -> Optional[float]:
+        """Returns the q-th percentile (0-100) of the recent window, or None if empty."""
+        key = _metric_key(name, labels)
+        with self._lock:
+            window = self._observations.get(key)
+            values = sorted(window) if window else []
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round((q / 100.0) * (len(values) - 1))))
+        return values[index]
+
+    def average(self, name: str, /, **labels) -> Optional[float]:
+        key = _metric_key(name, labels)
+        with self._lock:
+            window = self._observations.get(key)
+            if not window:
+                return None
+            return sum(window) / len(window)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable view of all metrics."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            windows = {key: sorted(values) for key, values in self._observations.items()}
+            totals = {key: dict(value) for key, value in self._observation_totals.items()}
+
+        observations = {}
+        for key, values in windows.items():
+            if not values:
+                continue
+            last = len(values) - 1
+            observations[key] = {
+                "count": int(totals[key]["count"]),
+                "sum": totals[key]["sum"],
+                "p50": values[int(round(0.50 * last))],
+                "p95": values[int(round(0.95 * last))],
+                "max": values[last],
+            }
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "observations": observations,
+        }
+
+
+metrics = MetricsRegistry()
@@ -71,37 +71,112 @@ class MongoDBClient:
 
     @staticmethod
     def sample_documents(client: MongoClient, db_name: str, collection_name: str, limit: int = 10) -> List[Dict]:
-        """Samples documents from a collection to infer schema."""
+        """
+        Samples documents from a collection to infer schema.
+        Uses $sample so fields added to newer documents are seen too.
+        """
         db = client[db_name]
         collection = db[collection_name]
-        return list(collection.find().limit(limit))
+        try:
+            return list(collection.aggregate([{"$sample": {"size": limit}}]))
+        except OperationFailure as e:
+            # e.g. restricted users or old servers - fall back to natural order
+            print(f"WARN: $sample failed on {collection_name}, falling back to find(): {e}")
+            return list(collection.find().limit(limit))
+
+    @staticmethod
+    def list_indexes(client: MongoClient, db_name: str, collection_name: str) -> List[Dict[str, Any]]:
+        """Returns index definitions: [{"name", "keys": [[field, direction]], "unique"}]."""
+        indexes = []
+        for index in client[db_name][collection_name].list_indexes():
+            indexes.append({
+                "name": index["name"],
+                "keys": [[field, direction] for field, direction in index["key"].items()],
+                "unique": bool(index.get("unique", False)) or index["name"] == "_id_"
+            })
+        return indexes
+
+    @staticmethod
+    def _bson_type_name(value: Any) -> str:
+        if isinstance(value, dict):
+            return "object"
+        if isinstance(value, list):
+            return "array"
+        return type(value).__name__
+
+    @staticmethod
+    def _collect_paths(value: Dict[str, Any], prefix: str, paths: Dict[str, Dict[str, Any]], seen: set) -> None:
+        """Records types for every (dotted) field path of one document."""
+        for key, item in value.items():
+            path = f"{prefix}{key}"
+            entry = paths.setdefault(path, {"types": set(), "element_types": set(), "count": 0, "has_null": False})
+            seen.add(path)
+            if item is None:
+                entry["has_null"] = True
+                continue
+            entry["types"].add(MongoDBClient._bson_type_name(item))
+
+            if isinstance(item, dict):
+                MongoDBClient._collect_paths(item, f"{path}.", paths, seen)
+            elif isinstance(item, list):
+                for element in item:
+                    entry["element_types"].add(MongoDBClient._bson_type_name(element))
+                    # Dotted paths reach into arrays of subdocuments in MongoDB queries
+                    if isinstance(element, dict):
+                        MongoDBClient._collect_paths(element, f"{path}.", paths, seen)
 
     @staticmethod
     def infer_schema_from_documents(documents: List[Dict]) -> List[Dict[str, Any]]:
-        """Infers column schema from sampled documents."""
+        """
+        Infers column schema from sampled documents.
+        Subdocument fields become dotted paths (e.g. "address.city"), arrays
+        report their element types (e.g. "array<str>") and every field carries
+        the fraction of sampled documents that contain it.
+        """
         if not documents:
             return []
-        
-        # Aggregate all keys across documents
-        all_keys: Dict[str, set] = {}
+
+        paths: Dict[str, Dict[str, Any]] = {}
         for doc in documents:
-            for key, value in doc.items():
-                if key not in all_keys:
-                    all_keys[key] = set()
-                all_keys[key].add(type(value).__name__)
-        
+            seen: set = set()
+            MongoDBClient._collect_paths(doc, "", paths, seen)
+            for path in seen:
+                paths[path]["count"] += 1
+
         columns = []
-        for key, types in all_keys.items():
+        total = len(documents)
+        for path, entry in paths.items():
+            types = set(entry["types"])
+            if "array" in types and entry["element_types"]:
+                types.discard("array")
+                types.add(f"array<{' | '.join(sorted(entry['element_types']))}>")
             # Join multiple types if field has mixed types
-            type_str = " | ".join(sorted(types))
+            type_str = " | ".join(sorted(types)) or "null"
+            frequency = round(entry["count"] / total, 3)
             columns.append({
-                "name": key,
+                "name": path,
                 "type": type_str,
-                "primary_key": key == "_id",
-                "nullable": True  # MongoDB fields are inherently nullable
+                "primary_key": path == "_id",
+                "nullable": entry["has_null"] or frequency < 1,
+                "frequency": frequency
             })
-        
+
         return columns
 
+    @staticmethod
+    def inspect_collection(client: MongoClient, db_name: str, collection_name: str, sample_size: int) -> Dict[str, Any]:
+        """Schema entry for one collection: sampled columns plus index definitions."""
+        documents = MongoDBClient.sample_documents(client, db_name, collection_name, limit=sample_size)
+        try:
+            indexes = MongoDBClient.list_indexes(client, db_name, collection_name)
+        except OperationFailure as e:
+            print(f"WARN: Could not list indexes for {collection_name}: {e}")
+            indexes = []
+        return {
+            "columns": MongoDBClient.infer_schema_from_documents(documents),
+            "foreign_keys": [],  # MongoDB doesn't have formal FK constraints
+            "indexes": indexes
+        }
+
 
 mongo_client = MongoDBClient()
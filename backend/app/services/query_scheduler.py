@@ -0,0 +1,166 @@
+"""
+Execution scheduler for queries sent to target databases.
+Caps concurrent queries per connection and per user, queues the overflow in a
+bounded queue and dispatches waiting queries round-robin across users so one
+busy user cannot starve the rest of the team.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+
+class QueryQueueFullError(Exception):
+    """Raised when a query cannot be admitted; callers should retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    def __init__(self, user_key: Any):
+        self.user_key = user_key
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+
+class _ConnectionQueue:
+    def __init__(self):
+        self.active = 0
+        self.active_per_user: Dict[Any, int] = defaultdict(int)
+        # Insertion order of users is the round-robin order
+        self.waiting: "OrderedDict[Any, Deque[_Ticket]]" = OrderedDict()
+        self.queued = 0
+
+
+class QueryScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: Dict[int, _ConnectionQueue] = {}
+
+    @staticmethod
+    def _limits(conn) -> Dict[str, Any]:
+        return {
+            "per_connection": conn.get_setting("max_concurrent_queries", settings.QUERY_MAX_CONCURRENCY_PER_CONNECTION),
+            "per_user": conn.get_setting("max_concurrent_queries_per_user", settings.QUERY_MAX_CONCURRENCY_PER_USER),
+            "queue_size": conn.get_setting("max_queued_queries", settings.QUERY_QUEUE_MAX_SIZE),
+            "timeout": conn.get_setting("queue_timeout_seconds", settings.QUERY_QUEUE_TIMEOUT_SECONDS),
+        }
+
+    @contextmanager
+    def slot(self, conn, user_id: Optional[int] = None):
+        """
+        Holds an execution slot on `conn` for the duration of the block.
+        Blocks while the connection or user is at capacity; raises QueryQueueFullError
+        when the queue is full or the wait exceeds the queue timeout.
+        """
+        limits = self._limits(conn)
+        self._acquire(conn.id, user_id, limits)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            metrics.observe("query_scheduler.execution_seconds", time.monotonic() - started, connection_id=conn.id)
+            self._release(conn.id, user_id, limits)
+
+    def _retry_after(self, connection_id: int, queued: int, per_connection: int) -> int:
+        avg_execution = metrics.average("query_scheduler.execution_seconds", connection_id=connection_id)
+        if avg_execution is None:
+            return settings.QUERY_QUEUE_RETRY_AFTER_SECONDS
+        # Time for the queue ahead of us to drain through the available slots
+        return max(1, math.ceil(avg_execution * (queued + 1) / max(per_connection, 1)))
+
+    def _can_run(self, queue: _ConnectionQueue, user_key: Any, limits: Dict[str, Any]) -> bool:
+        return queue.active < limits["per_connection"] and queue.active_per_user[user_key] < limits["per_user"]
+
+    def _grant(self, connection_id: int, queue: _ConnectionQueue, ticket: _Ticket) -> None:
+        queue.active += 1
+        queue.active_per_user[ticket.user_key] += 1
+        ticket.granted = True
+        metrics.observe("query_scheduler.queue_wait_seconds", time.monotonic() - ticket.enqueued_at, connection_id=connection_id)
+        ticket.event.set()
+
+    def _publish(self, connection_id: int, queue: _ConnectionQueue) -> None:
+        metrics.set_gauge("query_scheduler.active", queue.active, connection_id=connection_id)
+        metrics.set_gauge("query_scheduler.queued", queue.queued, connection_id=connection_id)
+
+    def _acquire(self, connection_id: int, user_key: Any, limits: Dict[str, Any]) -> None:
+        with self._lock:
+            queue = self._queues.setdefault(connection_id, _ConnectionQueue())
+            ticket = _Ticket(user_key)
+
+            if self._can_run(queue, user_key, limits):
+                self._grant(connection_id, queue, ticket)
+                self._publish(connection_id, queue)
+                return
+
+            if queue.queued >= limits["queue_size"]:
+                metrics.increment("query_scheduler.rejected", connection_id=connection_id)
+                raise QueryQueueFullError(
+                    "Too many queries are queued for this database. Please retry shortly.",
+                    retry_after=self._retry_after(connection_id, queue.queued, limits["per_connection"]),
+                )
+
+            queue.waiting.setdefault(user_key, deque()).append(ticket)
+            queue.queued += 1
+            self._publish(connection_id, queue)
+
+        if ticket.event.wait(timeout=limits["timeout"]):
+            return
+
+        with self._lock:
+            if ticket.granted:
+                # Granted between the timeout and taking the lock
+                return
+            user_tickets = queue.waiting.get(user_key)
+            if user_tickets is not None:
+                user_tickets.remove(ticket)
+                if not user_tickets:
+                    del queue.waiting[user_key]
+            queue.queued -= 1
+            self._publish(connection_id, queue)
+            metrics.increment("query_scheduler.timed_out", connection_id=connection_id)
+            raise QueryQueueFullError(
+                "Timed out waiting for a free slot on this database. Please retry shortly.",
+                retry_after=self._retry_after(connection_id, queue.queued, limits["per_connection"]),
+            )
+
+    def _release(self, connection_id: int, user_key: Any, limits: Dict[str, Any]) -> None:
+        with self._lock:
+            queue = self._queues[connection_id]
+            queue.active -= 1
+            queue.active_per_user[user_key] -= 1
+            if queue.active_per_user[user_key] <= 0:
+                del queue.active_per_user[user_key]
+            self._dispatch(connection_id, queue, limits)
+            self._publish(connection_id, queue)
+
+    def _dispatch(self, connection_id: int, queue: _ConnectionQueue, limits: Dict[str, Any]) -> None:
+        """Hands free slots to waiting users in round-robin order (caller holds the lock)."""
+        while queue.waiting and queue.active < limits["per_connection"]:
+            for user_key in list(queue.waiting.keys()):
+                if queue.active_per_user[user_key] >= limits["per_user"]:
+                    continue
+                user_tickets = queue.waiting[user_key]
+                ticket = user_tickets.popleft()
+                if user_tickets:
+                    # Served users move to the back of the rotation
+                    queue.waiting.move_to_end(user_key)
+                else:
+                    del queue.waiting[user_key]
+                queue.queued -= 1
+                self._grant(connection_id, queue, ticket)
+                break
+            else:
+                # Everyone waiting is at their per-user cap
+                return
+
+
+query_scheduler = QueryScheduler()
@@ -0,0 +1,83 @@
+"""
+Single-flight request coalescing.
+Concurrent callers asking for the same key share one in-progress computation
+instead of each running it: the first caller (the leader) executes, everyone
+else waits for and receives the leader's result or exception.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.services.metrics import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self._name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn() once per key among concurrent threads and shares the outcome.
+        A follower still waiting after timeout seconds runs fn() itself, so a
+        hung leader does not hold every follower's thread.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            metrics.increment("single_flight.coalesced", flight=self._name)
+            if not call.event.wait(timeout):
+                metrics.increment("single_flight.wait_timeouts", flight=self._name)
+                print(f"WARN: {self._name} leader still running after {timeout}s, running the call directly")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.increment("single_flight.executions", flight=self._name)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant: concurrent coroutines with the same key await one fn() call."""
+        task = self._async_calls.get(key)
+        if task is not None:
+            metrics.increment("single_flight.coalesced", flight=self._name)
+        else:
+            # Detached from the first caller: its cancellation (e.g. a client disconnect)
+            # must not fail the others, so the computation runs to completion on its own
+            task = asyncio.ensure_future(fn())
+            self._async_calls[key] = task
+            task.add_done_callback(lambda done: self._finish_async(key, done))
+            metrics.increment("single_flight.executions", flight=self._name)
+        # Shield so a cancelled caller only stops waiting
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller has gone
+            task.exception()
@@ -0,0 +1,106 @@
+"""
+Per-connection cache for the schema explorer structure (tables, views, indexes, ...).
+Entries are served fresh for a TTL, then served stale while a single background
+refresh re-reads the catalog. Schema ingestion invalidates the connection's entry.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.single_flight import SingleFlight
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class _Entry:
+    def __init__(self, structure: Dict[str, Any]):
+        self.structure = structure
+        self.etag = compute_etag(structure)
+        self.fetched_at = time.monotonic()
+
+
+def compute_etag(structure: Dict[str, Any]) -> str:
+    payload = json.dumps(structure, sort_keys=True, default=str).encode("utf-8")
+    return f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
+class StructureCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, _Entry] = {}
+        self._refreshing: set = set()
+        # Bumped on invalidation so an in-flight refresh cannot store an outdated catalog
+        self._generations: Dict[int, int] = {}
+        self._loads = SingleFlight("schema_structure")
+
+    def get(self, connection_id: int, loader: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], str, str]:
+        """
+        Returns (structure, etag, state) where state is fresh, stale or miss.
+        Misses (and entries older than the max stale age) load synchronously;
+        concurrent misses for one connection share a single catalog read.
+        """
+        with self._lock:
+            entry = self._entries.get(connection_id)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age <= settings.SCHEMA_STRUCTURE_CACHE_TTL_SECONDS:
+                metrics.increment("structure_cache.hits", state=FRESH)
+                return entry.structure, entry.etag, FRESH
+            if age <= settings.SCHEMA_STRUCTURE_CACHE_MAX_STALE_SECONDS:
+                metrics.increment("structure_cache.hits", state=STALE)
+                return entry.structure, entry.etag, STALE
+
+        metrics.increment("structure_cache.misses")
+        entry = self._loads.do(connection_id, lambda: self._load(connection_id, loader))
+        return entry.structure, entry.etag, MISS
+
+    def begin_refresh(self, connection_id: int) -> bool:
+        """Claims the background refresh for a connection; False if one is already running."""
+        with self._lock:
+            if connection_id in self._refreshing:
+                return False
+            self._refreshing.add(connection_id)
+            return True
+
+    def refresh(self, connection_id: int, loader: Callable[[], Dict[str, Any]]) -> None:
+        """Background task body: re-reads the catalog, keeping the stale entry on failure."""
+        try:
+            self._load(connection_id, loader)
+        except Exception as e:
+            print(f"WARN: Schema structure refresh failed for connection {connection_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(connection_id)
+
+    def invalidate(self, connection_id: int) -> None:
+        with self._lock:
+            self._entries.pop(connection_id, None)
+            self._generations[connection_id] = self._generations.get(connection_id, 0) + 1
+
+    def _load(self, connection_id: int, loader: Callable[[], Dict[str, Any]]) -> _Entry:
+        with self._lock:
+            generation = self._generations.get(connection_id, 0)
+        started = time.perf_counter()
+        entry = _Entry(loader())
+        metrics.observe("structure_cache.load_seconds", time.perf_counter() - started)
+        with self._lock:
+            if self._generations.get(connection_id, 0) == generation:
+                self._entries[connection_id] = entry
+        return entry
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as for GET conditional requests
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+structure_cache = StructureCache()
@@ -0,0 +1,205 @@
+"""
+EXPLAIN-based cost pre-check for generated SQL.
+Runs the database planner on the normalized SQL before execution and compares
+the estimated rows / cost against per-connection thresholds, so cross joins and
+full scans on huge tables are caught before they reach the database.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.db_connection import DBConnection
+from app.query_executor.fingerprint import sql_fingerprint
+from app.services.credential_encryptor import encryptor
+from app.services.db_connector import db_connector
+from app.services.metrics import metrics
+
+# Decisions returned by check_query_cost
+ALLOW = "ALLOW"
+BLOCK = "BLOCK"
+NEEDS_APPROVAL = "NEEDS_APPROVAL"
+REWRITE = "REWRITE"
+
+_ACTIONS = {"block": BLOCK, "approval": NEEDS_APPROVAL, "rewrite": REWRITE}
+
+
+class _PlanCache:
+    """Small LRU cache of plan estimates keyed by (connection_id, SQL fingerprint)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, estimate = entry
+            if time.monotonic() - stored_at > self._ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return estimate
+
+    def put(self, key: Tuple[int, str], estimate: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), estimate)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+plan_cache = _PlanCache(settings.COST_CHECK_PLAN_CACHE_SIZE, settings.COST_CHECK_PLAN_CACHE_TTL_SECONDS)
+
+
+def _postgres_estimate(plan_json: Any) -> Dict[str, Any]:
+    """
+    Extracts the largest row estimate and total cost from EXPLAIN (FORMAT JSON).
+    Plan Rows are counted after each node's filter, so the largest one is also
+    the matched-row estimate.
+    """
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    root = plan_json[0]["Plan"]
+
+    max_rows = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        max_rows = max(max_rows, int(node.get("Plan Rows", 0)))
+        stack.extend(node.get("Plans", []))
+
+    return {
+        "estimated_rows": max_rows,
+        "matched_rows": max_rows,
+        "estimated_cost": float(root.get("Total Cost", 0.0)),
+    }
+
+
+def _mysql_estimate(plan_json: Any) -> Dict[str, Any]:
+    """
+    Extracts the largest row estimate and query cost from EXPLAIN FORMAT=JSON.
+    estimated_rows counts rows scanned before filtering (what the cost gate
+    cares about); matched_rows the rows left after the filters, which is the
+    estimate of how many rows a statement touches.
+    """
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    query_block = plan_json.get("query_block", {})
+
+    max_rows = 0
+    matched_rows = 0
+    stack = [query_block]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key in ("rows_examined_per_scan", "rows_produced_per_join"):
+                if key in node:
+                    max_rows = max(max_rows, int(float(node[key])))
+            if "rows_produced_per_join" in node:
+                matched_rows = max(matched_rows, int(float(node["rows_produced_per_join"])))
+            elif "rows_examined_per_scan" in node:
+                filtered = float(node.get("filtered", 100.0))
+                matched_rows = max(matched_rows, int(float(node["rows_examined_per_scan"]) * filtered / 100))
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+    cost_info = query_block.get("cost_info", {})
+    return {
+        "estimated_rows": max_rows,
+        "matched_rows": matched_rows,
+        "estimated_cost": float(cost_info.get("query_cost", 0.0)),
+    }
+
+
+def explain_query(conn: DBConnection, sql: str) -> Dict[str, Any]:
+    """
+    Returns the planner estimate for `sql` on `conn`:
+    {"estimated_rows": int, "matched_rows": int, "estimated_cost": float, "cached": bool}
+    """
+    dialect = db_connector.sqlglot_dialect(conn.db_type)
+    cache_key = (conn.id, sql_fingerprint(sql, dialect))
+
+    cached = plan_cache.get(cache_key)
+    if cached is not None:
+        metrics.increment("cost_check.plan_cache.hits", connection_id=conn.id)
+        return {**cached, "cached": True}
+    metrics.increment("cost_check.plan_cache.misses", connection_id=conn.id)
+
+    decrypted_password = encryptor.decrypt(conn.password_encrypted)
+    engine = db_connector.get_pooled_engine(conn, decrypted_password)
+    with engine.connect() as db_conn:
+        if dialect == "postgres":
+            plan = db_conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            estimate = _postgres_estimate(plan)
+        else:
+            plan = db_conn.execute(text(f"EXPLAIN FORMAT=JSON {sql}")).scalar()
+            estimate = _mysql_estimate(plan)
+
+    plan_cache.put(cache_key, estimate)
+    return {**estimate, "cached": False}
+
+
+def check_query_cost(conn: DBConnection, sql: str) -> Dict[str, Any]:
+    """
+    Decides whether `sql` may run directly based on the EXPLAIN estimate.
+
+    Returns:
+        dict: {
+            "decision": ALLOW | BLOCK | NEEDS_APPROVAL | REWRITE,
+            "estimate": planner estimate (or None if skipped),
+            "reason": str (when the decision is not ALLOW)
+        }
+    """
+    if not conn.get_setting("cost_check_enabled", settings.COST_CHECK_ENABLED):
+        return {"decision": ALLOW, "estimate": None, "reason": None}
+
+    # EXPLAIN estimates are read for PostgreSQL and MySQL SQL reads only
+    if conn.db_type in ("mongodb", "sqlite"):
+        return {"decision": ALLOW, "estimate": None, "reason": None}
+    try:
+        parsed = sqlglot.parse_one(sql, read=db_connector.sqlglot_dialect(conn.db_type))
+    except Exception:
+        return {"decision": ALLOW, "estimate": None, "reason": None}
+    if not isinstance(parsed, (exp.Select, exp.Union)):
+        return {"decision": ALLOW, "estimate": None, "reason": None}
+
+    try:
+        estimate = explain_query(conn, sql)
+    except Exception as e:
+        # The pre-check must never block a query the database itself would accept
+        print(f"WARN: EXPLAIN pre-check failed, skipping: {e}")
+        return {"decision": ALLOW, "estimate": None, "reason": None}
+
+    max_rows = conn.get_setting("cost_max_rows", settings.COST_CHECK_MAX_ROWS)
+    max_cost = conn.get_setting("cost_max_cost", settings.COST_CHECK_MAX_COST)
+
+    reasons = []
+    if max_rows is not None and estimate["estimated_rows"] > max_rows:
+        reasons.append(f"estimated {estimate['estimated_rows']:,} rows (limit {max_rows:,})")
+    if max_cost is not None and estimate["estimated_cost"] > max_cost:
+        reasons.append(f"estimated cost {estimate['estimated_cost']:,.0f} (limit {max_cost:,.0f})")
+
+    if not reasons:
+        return {"decision": ALLOW, "estimate": estimate, "reason": None}
+
+    action = conn.get_setting("cost_check_action", settings.COST_CHECK_ACTION).lower()
+    decision = _ACTIONS.get(action, NEEDS_APPROVAL)
+    metrics.increment("cost_check.over_threshold", connection_id=conn.id, decision=decision)
+
+    return {
+        "decision": decision,
+        "estimate": estimate,
+        "reason": "Query is too expensive: " + "; ".join(reasons) + "."
+    }
@@ -0,0 +1,184 @@
+"""
+Deterministic repair of common SQL failures, tried before asking the LLM.
+
+Fixes, using the ingested schema and sqlglot:
+- SQL written for another dialect (backticks on PostgreSQL, ...) is re-read
+  and rendered in the connection's dialect.
+- Unknown tables and columns are renamed to the closest existing name of the
+  referenced tables (edit-distance similarity, case-insensitive). An
+  unqualified column goes to the best match across all of them; equally good
+  matches in different tables are not guessed at.
+- Tables that only exist in a non-default PostgreSQL schema get the schema
+  qualifier.
+- Columns present in several joined tables are qualified with the first
+  table's alias when the database reported them as ambiguous.
+- A double-quoted "value" PostgreSQL read as an unknown column becomes a
+  string literal.
+
+The result is only returned when it passes check_sql_against_schema.
+"""
+import difflib
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from app.core.config import settings
+from app.sql_guardrails.schema_check import check_sql_against_schema
+
+_FALLBACK_DIALECTS = ["mysql", "postgres", "tsql", "sqlite", None]
+_DEFAULT_SCHEMAS = {"public"}
+
+
+def _closest(name: str, candidates: List[str]) -> Tuple[Optional[str], float]:
+    """(closest candidate, similarity ratio), or (None, 0.0) below SQL_LOCAL_REPAIR_MIN_SIMILARITY."""
+    by_lower = {c.lower(): c for c in candidates}
+    if name.lower() in by_lower:
+        return by_lower[name.lower()], 1.0
+    best, best_score = None, 0.0
+    for lower, original in by_lower.items():
+        score = difflib.SequenceMatcher(None, name.lower(), lower).ratio()
+        if score > best_score:
+            best, best_score = original, score
+    if best_score < settings.SQL_LOCAL_REPAIR_MIN_SIMILARITY:
+        return None, 0.0
+    return best, best_score
+
+
+def _parse(sql: str, dialect: Optional[str]) -> Tuple[Optional[exp.Expression], Optional[str]]:
+    try:
+        return sqlglot.parse_one(sql, read=dialect), None
+    except Exception:
+        pass
+    for other in _FALLBACK_DIALECTS:
+        if other == dialect:
+            continue
+        try:
+            return sqlglot.parse_one(sql, read=other), f"re-read as {other or 'generic'} SQL"
+        except Exception:
+            continue
+    return None, None
+
+
+def _fix_tables(parsed: exp.Expression, schema_info: Dict[str, Any], dialect: Optional[str], fixes: List[str]) -> None:
+    virtual = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+    qualified_names = {key.lower(): key for key in schema_info}
+    short_names: Dict[str, List[str]] = {}
+    for key in schema_info:
+        short_names.setdefault(key.split(".")[-1].lower(), []).append(key)
+
+    for table in parsed.find_all(exp.Table):
+        name = table.name
+        if not name or name.lower() in virtual:
+            continue
+        full = f"{table.db}.{name}" if table.db else name
+        if full.lower() in qualified_names:
+            continue
+
+        keys = short_names.get(name.lower())
+        if not keys:
+            match, _ = _closest(name, list(short_names))
+            if not match:
+                continue
+            keys = short_names[match]
+            fixes.append(f"table {name} -> {keys[0].split('.')[-1]}")
+            table.set("this", exp.to_identifier(keys[0].split(".")[-1]))
+
+        if not table.db and dialect == "postgres" and "." in keys[0]:
+            schemas = [key.split(".")[0] for key in keys]
+            if any(schema in _DEFAULT_SCHEMAS for schema in schemas) or len(set(schemas)) != 1:
+                continue
+            table.set("db", exp.to_identifier(schemas[0]))
+            fixes.append(f"qualified {table.name} with schema {schemas[0]}")
+
+
+def _sources(parsed: exp.Expression, schema_info: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+    """(alias or name, column names) of every referenced table with known columns, in query order."""
+    lookup = {}
+    for key, details in schema_info.items():
+        columns = [col["name"] for col in (details or {}).get("columns", [])]
+        lookup[key.lower()] = columns
+        lookup.setdefault(key.split(".")[-1].lower(), columns)
+    sources = []
+    for table in parsed.find_all(exp.Table):
+        full = f"{table.db}.{table.name}".lower() if table.db else table.name.lower()
+        columns = lookup.get(full) or lookup.get(table.name.lower())
+        if columns:
+            sources.append((table.alias_or_name, columns))
+    return sources
+
+
+def _fix_columns(parsed: exp.Expression, schema_info: Dict[str, Any], dialect: Optional[str], error: str, fixes: List[str]) -> None:
+    sources = _sources(parsed, schema_info)
+    if not sources:
+        return
+    by_alias = {alias.lower(): columns for alias, columns in sources}
+    output_aliases = {alias.alias.lower() for alias in parsed.find_all(exp.Alias)}
+    derived = any(True for _ in parsed.find_all(exp.CTE)) or any(sub.alias for sub in parsed.find_all(exp.Subquery))
+    ambiguous_error = "ambiguous" in error.lower()
+
+    for column in list(parsed.find_all(exp.Column)):
+        if isinstance(column.this, exp.Star):
+            continue
+        name = column.name
+        qualifier = column.table
+        if qualifier:
+            columns = by_alias.get(qualifier.lower())
+            if columns is None or name.lower() in {c.lower() for c in columns}:
+                continue
+            match, _ = _closest(name, columns)
+            if match:
+                column.set("this", exp.to_identifier(match))
+                fixes.append(f"column {qualifier}.{name} -> {qualifier}.{match}")
+            continue
+
+        if name.lower() in output_aliases or derived:
+            continue
+        owners = [alias for alias, columns in sources if name.lower() in {c.lower() for c in columns}]
+        if len(owners) > 1 and ambiguous_error:
+            column.set("table", exp.to_identifier(owners[0]))
+            fixes.append(f"qualified ambiguous column {name} with {owners[0]}")
+            continue
+        if owners:
+            continue
+
+        # Nearest column across every referenced table; a tie between tables is left to the LLM
+        ranked = [(*_closest(name, columns), alias) for alias, columns in sources]
+        ranked = sorted((r for r in ranked if r[0]), key=lambda r: r[1], reverse=True)
+        if len(ranked) > 1 and ranked[0][1] == ranked[1][1] and ranked[0][2].lower() != ranked[1][2].lower():
+            continue
+        if ranked:
+            match, _, alias = ranked[0]
+            column.set("this", exp.to_identifier(match))
+            if len(sources) > 1:
+                column.set("table", exp.to_identifier(alias))
+            fixes.append(f"column {name} -> {match}")
+        elif column.this.quoted and dialect in ("postgres", "sqlite"):
+            # "value" means an identifier here; the query almost certainly meant a string
+            column.replace(exp.Literal.string(name))
+            fixes.append(f"string literal '{name}'")
+
+
+def repair_locally(sql: str, error: str, schema_info: Dict[str, Any], dialect: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """
+    Returns (repaired SQL, applied fixes), or (None, []) when nothing could be
+    fixed or the result still does not match the schema.
+    """
+    if not sql or not schema_info:
+        return None, []
+    parsed, reread = _parse(sql, dialect)
+    if parsed is None:
+        return None, []
+
+    fixes = [reread] if reread else []
+    _fix_tables(parsed, schema_info, dialect, fixes)
+    _fix_columns(parsed, schema_info, dialect, error or "", fixes)
+    if not fixes:
+        return None, []
+
+    repaired = parsed.sql(dialect=dialect)
+    is_valid, message = check_sql_against_schema(repaired, schema_info, dialect)
+    if not is_valid:
+        print(f"DEBUG: Local repair ({'; '.join(fixes)}) still invalid: {message}")
+        return None, []
+    return repaired, fixes
@@ -0,0 +1,111 @@
+"""
+Guardrails for natively generated MongoDB queries.
+
+Generated queries are Extended JSON documents of the form
+{"collection": "...", "operation": "aggregate", "pipeline": [...]}.
+They are parsed with bson.json_util (so {"$oid": ...} / {"$date": ...} become
+real BSON values), checked against an allow-list of read-only stages and
+normalized so the pipeline filters early and never returns unbounded results.
+"""
+from typing import Any, Dict, List
+
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+
+from app.core.config import settings
+
+ALLOWED_STAGES = {
+    "$match", "$project", "$addFields", "$set", "$unset", "$group", "$sort", "$limit", "$skip",
+    "$unwind", "$lookup", "$count", "$facet", "$bucket", "$bucketAuto", "$sortByCount",
+    "$replaceRoot", "$replaceWith", "$sample",
+}
+# Writes and server-side JavaScript are never allowed, wherever they appear
+FORBIDDEN_OPERATORS = {"$out", "$merge", "$where", "$function", "$accumulator", "$currentOp", "$listSessions"}
+
+_RELAXED = JSONOptions(json_mode=JSONMode.RELAXED)
+
+
+def is_mongo_query(query_text: str) -> bool:
+    """True for a native MongoDB query (JSON document) as opposed to SQL."""
+    return bool(query_text) and query_text.lstrip().startswith("{")
+
+
+def _check_operators(value: Any) -> None:
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise ValueError(f"Operator {key} is not allowed")
+            _check_operators(inner)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item)
+
+
+def _normalize_pipeline(pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # A $match right after a $sort can always run first (smaller sort, index use)
+    pipeline = list(pipeline)
+    for index in range(1, len(pipeline)):
+        position = index
+        while position > 0 and "$match" in pipeline[position] and "$sort" in pipeline[position - 1]:
+            pipeline[position - 1], pipeline[position] = pipeline[position], pipeline[position - 1]
+            position -= 1
+
+    has_limit = False
+    for stage in pipeline:
+        if "$limit" in stage:
+            has_limit = True
+            stage["$limit"] = min(int(stage["$limit"]), settings.MONGO_PIPELINE_MAX_LIMIT)
+    # $count always yields a single document
+    if not has_limit and not any("$count" in stage for stage in pipeline):
+        pipeline.append({"$limit": settings.MONGO_PIPELINE_DEFAULT_LIMIT})
+    return pipeline
+
+
+def parse_mongo_query(query_text: str) -> Dict[str, Any]:
+    """
+    Parses and validates a native MongoDB query into the execute_mongo_query format.
+    Raises ValueError when the query is malformed or not read-only.
+    """
+    try:
+        query = json_util.loads(query_text)
+    except Exception as e:
+        raise ValueError(f"Invalid MongoDB query JSON: {e}")
+
+    if not isinstance(query, dict):
+        raise ValueError("MongoDB query must be a JSON object")
+    collection = query.get("collection")
+    if not isinstance(collection, str) or not collection:
+        raise ValueError("MongoDB query is missing 'collection'")
+    if query.get("operation", "aggregate") != "aggregate":
+        raise ValueError("Only aggregate pipelines can be generated for MongoDB")
+
+    pipeline = query.get("pipeline")
+    if not isinstance(pipeline, list):
+        raise ValueError("MongoDB query is missing 'pipeline'")
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise ValueError(f"Invalid pipeline stage: {stage!r}")
+        (name,) = stage.keys()
+        if name not in ALLOWED_STAGES:
+            raise ValueError(f"Pipeline stage {name} is not allowed")
+    _check_operators(pipeline)
+
+    return {
+        "collection": collection,
+        "operation": "aggregate",
+        "pipeline": _normalize_pipeline(pipeline)
+    }
+
+
+def dump_mongo_query(query: Dict[str, Any]) -> str:
+    """Serializes a parsed query back to (relaxed) Extended JSON for storage and display."""
+    return json_util.dumps(query, json_options=_RELAXED)
+
+
+def validate_mongo_query(query_text: str):
+    """Mirror of validate_sql for native MongoDB queries: returns (is_safe, message)."""
+    try:
+        parse_mongo_query(query_text)
+        return True, "Query is safe."
+    except ValueError as e:
+        return False, str(e)
@@ -0,0 +1,60 @@
+import sqlglot
+from sqlglot import exp
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+def _column_lookup(schema_info: Dict[str, Any]) -> Dict[str, Optional[Set[str]]]:
+    """Lower-cased table name (qualified and unqualified) -> column names; None if unknown."""
+    lookup: Dict[str, Optional[Set[str]]] = {}
+    for table, details in schema_info.items():
+        columns = {col["name"].lower() for col in (details or {}).get("columns", [])} or None
+        lookup[table.lower()] = columns
+        lookup.setdefault(table.split(".")[-1].lower(), columns)
+    return lookup
+
+
+def check_sql_against_schema(sql: str, schema_info: Dict[str, Any], dialect: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Checks that every table and column the query references exists in the
+    ingested schema. Names that cannot be resolved statically (CTEs, derived
+    tables, SELECT aliases, tables without inspected columns) are not flagged.
+    """
+    try:
+        parsed = sqlglot.parse_one(sql, read=dialect)
+    except Exception as e:
+        return False, f"SQL Parsing Error: {e}"
+
+    lookup = _column_lookup(schema_info)
+    virtual = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+    virtual |= {sub.alias.lower() for sub in parsed.find_all(exp.Subquery) if sub.alias}
+    output_aliases = {alias.alias.lower() for alias in parsed.find_all(exp.Alias)}
+
+    sources: Dict[str, Optional[Set[str]]] = {}
+    for table in parsed.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or name in virtual:
+            continue
+        qualified = f"{table.db.lower()}.{name}" if table.db else name
+        if qualified not in lookup and name not in lookup:
+            return False, f"Table '{table.sql()}' does not exist in the schema."
+        columns = lookup.get(qualified, lookup.get(name))
+        sources[table.alias_or_name.lower()] = columns
+        sources[name] = columns
+
+    known = [columns for columns in sources.values() if columns is not None]
+    unresolvable = bool(virtual) or any(columns is None for columns in sources.values())
+    for column in parsed.find_all(exp.Column):
+        if isinstance(column.this, exp.Star):
+            continue
+        name = column.name.lower()
+        qualifier = column.table.lower()
+        if qualifier:
+            columns = sources.get(qualifier)
+            if columns is not None and name not in columns:
+                return False, f"Column '{column.sql()}' does not exist in table '{qualifier}'."
+            continue
+        if name in output_aliases or unresolvable:
+            continue
+        if not any(name in columns for columns in known):
+            return False, f"Column '{column.name}' does not exist in the referenced tables."
+    return True, "Query matches the schema."
@@ -0,0 +1,98 @@
+-- Small retail schema for the offline evaluation (scripts/run_eval.py).
+-- Loaded into a fresh SQLite file on every run.
+
+CREATE TABLE departments (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE employees (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    department_id INTEGER REFERENCES departments(id),
+    salary REAL NOT NULL,
+    hired_on DATE NOT NULL
+);
+
+CREATE TABLE customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    city TEXT NOT NULL,
+    country TEXT NOT NULL,
+    signed_up_on DATE NOT NULL
+);
+
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    price REAL NOT NULL
+);
+
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customers(id),
+    sales_rep_id INTEGER REFERENCES employees(id),
+    status TEXT NOT NULL,
+    ordered_on DATE NOT NULL
+);
+
+CREATE TABLE order_items (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders(id),
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL
+);
+
+INSERT INTO departments (id, name) VALUES
+    (1, 'Sales'), (2, 'Engineering'), (3, 'Support');
+
+INSERT INTO employees (id, first_name, last_name, department_id, salary, hired_on) VALUES
+    (1, 'Anna', 'Schmidt', 1, 62000, '2021-03-01'),
+    (2, 'Ben', 'Okafor', 1, 58000, '2022-07-15'),
+    (3, 'Chloe', 'Martin', 2, 91000, '2020-01-10'),
+    (4, 'David', 'Nguyen', 2, 87000, '2023-05-22'),
+    (5, 'Elena', 'Rossi', 3, 45000, '2023-09-04'),
+    (6, 'Farid', 'Haddad', 2, 99000, '2019-11-18');
+
+INSERT INTO customers (id, name, email, city, country, signed_up_on) VALUES
+    (1, 'Acme GmbH', 'orders@acme.de', 'Berlin', 'Germany', '2022-01-12'),
+    (2, 'Blue Fox Ltd', 'buy@bluefox.co.uk', 'London', 'United Kingdom', '2022-06-30'),
+    (3, 'Cedar Co', 'hello@cedar.com', 'Austin', 'United States', '2023-02-14'),
+    (4, 'Delta SARL', 'contact@delta.fr', 'Paris', 'France', '2023-08-01'),
+    (5, 'Echo AG', 'info@echo.de', 'Munich', 'Germany', '2024-01-20'),
+    (6, 'Fjord AS', 'post@fjord.no', 'Oslo', 'Norway', '2024-03-05');
+
+INSERT INTO products (id, name, category, price) VALUES
+    (1, 'Standing Desk', 'Furniture', 499.0),
+    (2, 'Office Chair', 'Furniture', 249.0),
+    (3, 'Monitor 27in', 'Electronics', 329.0),
+    (4, 'USB-C Dock', 'Electronics', 139.0),
+    (5, 'Desk Lamp', 'Lighting', 59.0),
+    (6, 'Notebook Pack', 'Stationery', 12.5);
+
+INSERT INTO orders (id, customer_id, sales_rep_id, status, ordered_on) VALUES
+    (1, 1, 1, 'shipped', '2024-01-15'),
+    (2, 1, 1, 'shipped', '2024-02-03'),
+    (3, 2, 2, 'cancelled', '2024-02-10'),
+    (4, 3, 2, 'shipped', '2024-03-01'),
+    (5, 4, 1, 'pending', '2024-03-18'),
+    (6, 5, 2, 'shipped', '2024-04-02'),
+    (7, 3, 1, 'shipped', '2024-04-20'),
+    (8, 2, 2, 'pending', '2024-05-05');
+
+INSERT INTO order_items (id, order_id, product_id, quantity, unit_price) VALUES
+    (1, 1, 1, 2, 499.0),
+    (2, 1, 5, 2, 59.0),
+    (3, 2, 3, 4, 329.0),
+    (4, 3, 2, 1, 249.0),
+    (5, 4, 4, 3, 139.0),
+    (6, 4, 6, 10, 12.5),
+    (7, 5, 1, 1, 499.0),
+    (8, 6, 2, 6, 249.0),
+    (9, 6, 3, 2, 329.0),
+    (10, 7, 5, 5, 59.0),
+    (11, 8, 4, 2, 139.0);
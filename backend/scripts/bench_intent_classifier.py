@@ -0,0 +1,139 @@
+"""
+Benchmarks the local intent tiers against LLM-labeled questions.
+
+Labels come from QueryHistory.intent (what the pipeline decided, mostly the
+LLM). For every question the rule tier, and optionally the centroid tier, is
+run; the report shows how many questions each tier answers on its own
+(coverage), how often it agrees with the label (accuracy), a per-intent
+breakdown and the per-question latency. Without history rows a small built-in
+sample is used.
+
+Usage: python scripts/bench_intent_classifier.py [--limit N] [--centroids]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai.utils.intent_tiers import VALID_INTENTS, classify_rules, intent_centroids
+from app.core.config import settings
+
+SAMPLE = [
+    ("How many orders were placed last month?", "READ"),
+    ("show all customers from Berlin", "READ"),
+    ("list the top 10 products by revenue", "READ"),
+    ("What is the average salary per department", "READ"),
+    ("which employees joined in 2023", "READ"),
+    ("is there any data about refunds", "READ"),
+    ("do we have info about suppliers in asia", "READ"),
+    ("total sales by region", "READ"),
+    ("customers who changed their address this year", "READ"),
+    ("delete user 42", "DELETE"),
+    ("please remove all cancelled orders", "DELETE"),
+    ("drop the temp_import table", "DELETE"),
+    ("update the email of user id 7 to a@b.com", "UPDATE_SINGLE"),
+    ("change password for email jane@corp.com", "UPDATE_SINGLE"),
+    ("set status to 'shipped' for order #1002", "UPDATE_SINGLE"),
+    ("update all users to active", "UPDATE_MULTI"),
+    ("give everyone a 5% raise", "UPDATE_MULTI"),
+    ("mark every overdue invoice as unpaid", "UPDATE_MULTI"),
+    ("hello", "OTHER"),
+    ("thanks!", "OTHER"),
+    ("how are you today", "OTHER"),
+    ("Hello, show me all customers", "READ"),
+    ("hi, list every order", "READ"),
+    ("thanks, now count orders by month", "READ"),
+    ("Hey, what were total sales yesterday?", "READ"),
+    ("Drop-off rate per funnel step last month", "READ"),
+    ("change in revenue month over month for all regions", "READ"),
+    ("increase in signups for every week of 2024", "READ"),
+    ("Remove duplicates and show unique customer emails", "READ"),
+]
+
+
+def load_history(limit):
+    import app.db.base  # noqa: F401 - registers every model with the mapper
+    from app.db.session import SessionLocal
+    from app.models.query_history import QueryHistory
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(QueryHistory.question, QueryHistory.intent)
+            .filter(QueryHistory.intent.in_(VALID_INTENTS))
+            .order_by(QueryHistory.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [(question, intent) for question, intent in rows]
+    finally:
+        db.close()
+
+
+def run_tier(name, examples, classify):
+    answered = 0
+    correct = 0
+    per_intent = Counter()
+    per_intent_correct = Counter()
+    mistakes = []
+    started = time.perf_counter()
+    for question, label in examples:
+        predicted = classify(question)
+        if predicted is None:
+            continue
+        answered += 1
+        per_intent[label] += 1
+        if predicted == label:
+            correct += 1
+            per_intent_correct[label] += 1
+        else:
+            mistakes.append((question, label, predicted))
+    elapsed = time.perf_counter() - started
+
+    total = len(examples)
+    print(f"\n== {name} ==")
+    print(f"coverage: {answered}/{total} ({answered / total:.0%})")
+    if answered:
+        print(f"accuracy on answered: {correct}/{answered} ({correct / answered:.0%})")
+    print(f"latency: {elapsed / total * 1e6:.1f} us/question")
+    for intent in VALID_INTENTS:
+        if per_intent[intent]:
+            print(f"  {intent:<14} {per_intent_correct[intent]}/{per_intent[intent]}")
+    for question, label, predicted in mistakes[:10]:
+        print(f"  MISMATCH label={label} predicted={predicted}: {question}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=2000, help="history rows to evaluate")
+    parser.add_argument("--centroids", action="store_true", help="also evaluate the embedding centroid tier")
+    args = parser.parse_args()
+
+    try:
+        examples = load_history(args.limit)
+    except Exception as e:
+        print(f"Could not read QueryHistory ({e}); using the built-in sample")
+        examples = []
+    if not examples:
+        examples = SAMPLE
+    print(f"{len(examples)} labeled questions: {dict(Counter(label for _, label in examples))}")
+
+    def rules(question):
+        intent, confidence = classify_rules(question)
+        return intent if confidence >= settings.INTENT_RULES_MIN_CONFIDENCE else None
+
+    run_tier("rules", examples, rules)
+
+    if args.centroids:
+        # Centroids are built from the same history, so this measures fit rather than generalisation
+        from app.ai.utils.llm_factory import get_embeddings
+        embeddings = get_embeddings()
+        run_tier("centroids", examples, lambda q: intent_centroids.classify(q, embeddings)[0])
+
+
+if __name__ == "__main__":
+    main()
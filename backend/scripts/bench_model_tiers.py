@@ -0,0 +1,87 @@
+"""
+Compares model tiers on the classification stages of the pipeline.
+
+For every tier given with --tiers the intent node is forced onto that tier
+(local rule / centroid tiers disabled so every question reaches the LLM) and
+run over the labeled questions from QueryHistory, or the built-in sample of
+bench_intent_classifier.py. The report shows the model used, accuracy and
+p50 / p95 latency per tier, which is what LLM_NODE_TIERS and LLM_TIER_MODELS
+should be tuned against.
+
+Usage: python scripts/bench_model_tiers.py [--tiers fast,strong] [--limit N]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_intent_classifier import SAMPLE, load_history
+from app.ai.nodes.intent import intent_classifier
+from app.ai.utils.llm_factory import get_llm
+from app.ai.utils.prompt_builder import model_name
+from app.core.config import settings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_tier(tier, examples):
+    settings.LLM_NODE_TIERS = {**settings.LLM_NODE_TIERS, "intent": tier}
+    model = model_name(get_llm(node="intent"))
+
+    correct = 0
+    errors = 0
+    latencies = []
+    mistakes = []
+    for question, label in examples:
+        started = time.perf_counter()
+        try:
+            predicted = intent_classifier({"question": question})["intent"]
+        except Exception as e:
+            errors += 1
+            mistakes.append((question, label, f"error: {e}"))
+            continue
+        latencies.append(time.perf_counter() - started)
+        if predicted == label:
+            correct += 1
+        else:
+            mistakes.append((question, label, predicted))
+
+    print(f"\n== tier {tier} ({settings.LLM_PROVIDER}:{model}) ==")
+    print(f"accuracy: {correct}/{len(examples)} ({correct / len(examples):.0%}), errors: {errors}")
+    if latencies:
+        print(f"latency: p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p95 {percentile(latencies, 0.95) * 1000:.0f} ms")
+    for question, label, predicted in mistakes[:10]:
+        print(f"  MISMATCH label={label} predicted={predicted}: {question}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", default="fast,strong", help="comma-separated tiers to compare")
+    parser.add_argument("--limit", type=int, default=200, help="history rows to evaluate")
+    args = parser.parse_args()
+
+    try:
+        examples = load_history(args.limit)
+    except Exception as e:
+        print(f"Could not read QueryHistory ({e}); using the built-in sample")
+        examples = []
+    if not examples:
+        examples = SAMPLE
+    print(f"{len(examples)} labeled questions: {dict(Counter(label for _, label in examples))}")
+
+    # Measure the LLM only
+    settings.INTENT_RULES_ENABLED = False
+    settings.INTENT_CENTROIDS_ENABLED = False
+    for tier in [t.strip() for t in args.tiers.split(",") if t.strip()]:
+        run_tier(tier, examples)
+
+
+if __name__ == "__main__":
+    main()
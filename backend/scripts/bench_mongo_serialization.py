@@ -0,0 +1,90 @@
+"""
+Benchmarks BSON -> JSON conversion of MongoDB results on wide nested documents.
+
+Compares the previous recursive serializer, bson.json_util (relaxed mode,
+dumps + loads) and the in-place converter used by execute_mongo_query.
+Documents are round-tripped through BSON first so they look exactly like
+what PyMongo hands to the executor.
+
+Usage: python scripts/bench_mongo_serialization.py [num_docs] [width]
+"""
+import copy
+import datetime
+import json
+import sys
+import os
+import time
+import uuid
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import Binary, Decimal128, ObjectId, json_util
+from bson.codec_options import CodecOptions
+from bson.json_util import JSONOptions, JSONMode
+
+from app.query_executor.bson_encoder import convert_document
+
+RELAXED = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+
+
+def legacy_serialize(doc):
+    """The recursive serializer previously nested in execute_mongo_query."""
+    if isinstance(doc, dict):
+        return {key: legacy_serialize(value) for key, value in doc.items()}
+    elif isinstance(doc, list):
+        return [legacy_serialize(item) for item in doc]
+    elif isinstance(doc, ObjectId):
+        return str(doc)
+    elif isinstance(doc, datetime.datetime):
+        return doc.isoformat()
+    elif isinstance(doc, bytes):
+        return doc.decode('utf-8', errors='replace')
+    else:
+        return doc
+
+
+def make_document(width: int) -> dict:
+    now = datetime.datetime(2024, 1, 1, 12, 30)
+    doc = {"_id": ObjectId(), "created_at": now}
+    for i in range(width):
+        doc[f"str_{i}"] = f"value {i}"
+        doc[f"num_{i}"] = i * 1.5
+    doc["price"] = Decimal128("19.99")
+    doc["token"] = Binary.from_uuid(uuid.uuid4())
+    doc["address"] = {"city": "Pune", "geo": {"lat": 18.52, "lng": 73.85}, "tags": ["a", "b", "c"]}
+    doc["orders"] = [
+        {"order_id": ObjectId(), "placed_at": now, "total": Decimal128("120.50"), "items": [{"sku": j, "qty": 2} for j in range(5)]}
+        for _ in range(10)
+    ]
+    # Round-trip through BSON so types match what the driver returns
+    return bson.decode(bson.encode(doc), codec_options=CodecOptions())
+
+
+def bench(name, fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        batch = copy.deepcopy(docs)  # in-place converter mutates its input
+        start = time.perf_counter()
+        rows = [fn(doc) for doc in batch]
+        json.dumps(rows, default=str)  # legacy path leaves Decimal128 etc. unconverted
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<28} {best * 1000:9.2f} ms  ({len(docs) / best:,.0f} docs/s)")
+    return best
+
+
+def main():
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    docs = [make_document(width) for _ in range(num_docs)]
+    print(f"{num_docs} documents, {width * 2 + 6} top-level fields, convert + json.dumps (best of 5)\n")
+
+    baseline = bench("legacy recursive", legacy_serialize, docs, 5)
+    bench("json_util relaxed", lambda d: json.loads(json_util.dumps(d, json_options=RELAXED)), docs, 5)
+    fast = bench("bson_encoder (in place)", convert_document, docs, 5)
+    print(f"\nspeedup vs legacy: {baseline / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Offline evaluation of the NL -> SQL pipeline: execution accuracy, per-stage
+latency, token usage and retries on golden question sets.
+
+Each line of a golden JSONL file is
+    {"id": ..., "fixture": "shop", "question": ..., "expected_sql": ...}
+or carries "expected_result": [[row values], ...] instead of expected_sql.
+Fixture eval/fixtures/<name>.sql is loaded into a fresh SQLite file on every
+run and registered and ingested as the connection "eval:<name>".
+
+Questions run like /nl: the graph, then execution with local / LLM repair
+and retries from generation, but without query history or audit entries.
+A prediction is correct when its rows equal the expected rows: as a
+multiset, or in order when the expected SQL ends with ORDER BY. Rows whose
+columns come back in a different order also count.
+
+Settings can be overridden for the run to compare configurations:
+    --set LLM_NODE_TIERS='{"generator": "fast"}' --set SPECULATIVE_GENERATION_ENABLED=true
+
+Usage: python scripts/run_eval.py [golden.jsonl ...] [--set KEY=VALUE] [--limit N] [--output report.json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+# Add backend directory to path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import sqlglot
+from sqlglot import exp
+
+import app.db.base  # noqa: F401 - registers every model with the mapper
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.services.metrics import metrics
+
+EVAL_DIR = os.path.join(BACKEND_DIR, "eval")
+MAX_RETRIES = 2  # Same as /nl
+
+
+def parse_override(text):
+    key, sep, raw = text.partition("=")
+    if not sep or not hasattr(settings, key):
+        raise argparse.ArgumentTypeError(f"expected SETTING=VALUE with a known setting, got {text!r}")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return key, value
+
+
+def load_cases(paths, limit):
+    cases = []
+    for path in paths:
+        with open(path) as f:
+            cases.extend(json.loads(line) for line in f if line.strip())
+    return cases[:limit] if limit else cases
+
+
+def build_fixture(name):
+    """Fresh SQLite file from eval/fixtures/<name>.sql; returns its path."""
+    path = os.path.join(EVAL_DIR, "fixtures", f"{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    with open(os.path.join(EVAL_DIR, "fixtures", f"{name}.sql")) as f:
+        script = f.read()
+    db = sqlite3.connect(path)
+    try:
+        db.executescript(script)
+        db.commit()
+    finally:
+        db.close()
+    return path
+
+
+def prepare_connection(db, name):
+    """Registers the fixture as a sqlite connection and ingests its schema."""
+    from app.api.schema import process_schema_background
+    from app.models.db_connection import DBConnection
+    from app.models.schema import SchemaMetadata
+    from app.services.credential_encryptor import encryptor
+
+    path = build_fixture(name)
+    conn = db.query(DBConnection).filter(DBConnection.name == f"eval:{name}").first()
+    if conn is None:
+        conn = DBConnection(name=f"eval:{name}", db_type="sqlite", connection_mode="guided")
+        db.add(conn)
+    conn.database_name = path
+    conn.password_encrypted = encryptor.encrypt("")
+    db.commit()
+    db.refresh(conn)
+
+    process_schema_background(conn.id, db)
+    if not db.query(SchemaMetadata).filter(SchemaMetadata.db_connection_id == conn.id).first():
+        raise RuntimeError(f"Schema ingestion failed for fixture {name}")
+    return conn
+
+
+def eval_user():
+    from app.models.user_mongo import UserDocument
+    return UserDocument(
+        user_id=0, email="eval@example.com", hashed_password="", role_id=1,
+        role_name="ADMIN", is_superuser=True,
+    )
+
+
+def token_totals():
+    observations = metrics.snapshot()["observations"]
+    return {
+        direction: sum(v["sum"] for k, v in observations.items() if k.split("{")[0] == f"llm.tokens_{direction}")
+        for direction in ("in", "out")
+    }
+
+
+def run_graph(inputs, stages):
+    """workflow_app.invoke with the duration of every node appended to stages."""
+    from app.ai.graph import app as workflow_app
+
+    final_state = dict(inputs)
+    last = time.perf_counter()
+    for mode, chunk in workflow_app.stream(dict(inputs), stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+            continue
+        now = time.perf_counter()
+        for node in chunk:
+            stages.append((node, now - last))
+        last = now
+    return dict(final_state)
+
+
+def run_case(case, conn, user):
+    from app.ai.graph import RETRY_STATE_KEYS
+    from app.ai.nodes.sql_repair import repair_sql_query
+    from app.ai.nodes.sql_validator import validate_and_normalize_sql
+    from app.query_executor.executor import execute_sql_query
+    from app.ai.utils.llm_factory import connection_llm_settings
+    from app.services.db_connector import db_connector
+
+    dialect = db_connector.sqlglot_dialect(conn.db_type)
+    llm_settings = connection_llm_settings(conn)
+    inputs = {
+        "question": case["question"],
+        "connection_id": conn.id,
+        "llm_settings": llm_settings,
+        "db_type": conn.db_type,
+        "intent": "",
+        "schema_context": "",
+        "sql_query": "",
+        "result": "",
+        "error": None,
+        "user": user,
+    }
+    outcome = {"stages": [], "retries": 0, "repairs": 0, "sql": None, "rows": None, "error": None}
+    started = time.perf_counter()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            final_state = run_graph(inputs, outcome["stages"])
+        except Exception as e:
+            outcome.update(status="pipeline_error", error=str(e))
+            break
+        if final_state.get("is_ambiguous"):
+            outcome.update(status="ambiguous")
+            break
+        sql = final_state.get("sql_query")
+        if final_state.get("error") or final_state.get("validation_error") or not sql:
+            outcome.update(status="no_sql", error=final_state.get("error") or final_state.get("validation_error"))
+            break
+
+        normalized = validate_and_normalize_sql(sql, dialect=dialect)
+        sql = normalized["sql"] if normalized["valid"] else sql
+        outcome["sql"] = sql
+        try:
+            outcome.update(status="executed", rows=execute_sql_query(conn, sql)["rows"], error=None)
+            break
+        except Exception as e:
+            error = str(e)
+
+        repaired = repair_sql_query({
+            "sql_query": sql, "error": error, "user": user,
+            "connection_id": conn.id, "llm_settings": llm_settings, "db_type": conn.db_type,
+        }).get("sql_query")
+        if repaired and repaired != sql:
+            outcome["repairs"] += 1
+            try:
+                outcome.update(status="executed", sql=repaired, rows=execute_sql_query(conn, repaired)["rows"], error=None)
+                break
+            except Exception as e:
+                error = str(e)
+
+        outcome.update(status="execution_error", error=error)
+        if attempt == MAX_RETRIES:
+            break
+        outcome["retries"] += 1
+        inputs.update({key: final_state[key] for key in RETRY_STATE_KEYS if final_state.get(key) is not None})
+        inputs.update(retry_count=attempt + 1, last_error=error)
+    outcome["seconds"] = time.perf_counter() - started
+    return outcome
+
+
+def _value(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return round(float(value), 4)
+    return value
+
+
+def _rows(rows):
+    return [tuple(_value(v) for v in (row.values() if isinstance(row, dict) else row)) for row in rows]
+
+
+def results_match(predicted, expected, ordered):
+    predicted, expected = _rows(predicted), _rows(expected)
+    # Same values per row, whatever the column order
+    predicted_values = [tuple(sorted(map(repr, row))) for row in predicted]
+    expected_values = [tuple(sorted(map(repr, row))) for row in expected]
+    if ordered:
+        return predicted == expected or predicted_values == expected_values
+    return Counter(predicted) == Counter(expected) or Counter(predicted_values) == Counter(expected_values)
+
+
+def expected_rows(case, conn):
+    from app.query_executor.executor import execute_sql_query
+
+    if "expected_result" in case:
+        return case["expected_result"], False
+    sql = case["expected_sql"]
+    try:
+        parsed = sqlglot.parse_one(sql, read="sqlite")
+        ordered = isinstance(parsed, exp.Select) and parsed.args.get("order") is not None
+    except Exception:
+        ordered = False
+    return execute_sql_query(conn, sql)["rows"], ordered
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(results):
+    total = len(results)
+    correct = sum(1 for r in results if r["correct"])
+    per_stage = defaultdict(list)
+    for r in results:
+        for node, seconds in r["stages"]:
+            per_stage[node].append(seconds)
+    totals = [r["seconds"] for r in results]
+    return {
+        "questions": total,
+        "execution_accuracy": correct / total if total else 0.0,
+        "outcomes": dict(Counter(r["status"] for r in results)),
+        "latency_seconds": {"p50": percentile(totals, 0.5), "p95": percentile(totals, 0.95), "max": max(totals)} if totals else {},
+        "stage_latency_seconds": {
+            node: {"count": len(v), "p50": percentile(v, 0.5), "p95": percentile(v, 0.95), "max": max(v)}
+            for node, v in per_stage.items()
+        },
+        "tokens": {
+            "in": sum(r["tokens_in"] for r in results),
+            "out": sum(r["tokens_out"] for r in results),
+        },
+        "retries": sum(r["retries"] for r in results),
+        "questions_retried": sum(1 for r in results if r["retries"]),
+        "repairs": sum(r["repairs"] for r in results),
+    }
+
+
+def print_report(summary, results, overrides):
+    print(f"\n== Evaluation ({', '.join(f'{k}={v}' for k, v in overrides) or 'default settings'}) ==")
+    print(f"execution accuracy: {summary['execution_accuracy']:.1%} of {summary['questions']} questions {summary['outcomes']}")
+    if summary["latency_seconds"]:
+        latency = summary["latency_seconds"]
+        print(f"end-to-end latency: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, max {latency['max']:.2f}s")
+    print("stage latency (p50 / p95 / max, seconds):")
+    for node, s in sorted(summary["stage_latency_seconds"].items(), key=lambda item: -item[1]["p50"]):
+        print(f"  {node:<22} {s['p50']:.3f} / {s['p95']:.3f} / {s['max']:.3f}  (n={s['count']})")
+    questions = summary["questions"] or 1
+    tokens = summary["tokens"]
+    print(f"tokens: {tokens['in']:.0f} in / {tokens['out']:.0f} out ({tokens['in'] / questions:.0f} / {tokens['out'] / questions:.0f} per question)")
+    print(f"retries: {summary['retries']} over {summary['questions_retried']} questions, repairs: {summary['repairs']}")
+    for r in results:
+        if not r["correct"]:
+            print(f"  FAIL {r['id']} [{r['status']}]: {r['question']}\n       sql: {r['sql']}\n       error: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("golden", nargs="*", default=[os.path.join(EVAL_DIR, "shop_golden.jsonl")])
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="SETTING=VALUE", help="override an app setting for this run (JSON values)")
+    parser.add_argument("--limit", type=int, default=0, help="evaluate only the first N questions")
+    parser.add_argument("--output", help="write the summary and per-question results as JSON")
+    args = parser.parse_args()
+
+    for key, value in args.overrides:
+        setattr(settings, key, value)
+    if engine.url.get_backend_name() == "sqlite":
+        # Scratch application database (e.g. DATABASE_URL=sqlite:///./eval.db)
+        from app.db.base_class import Base
+        Base.metadata.create_all(bind=engine)
+
+    cases = load_cases(args.golden, args.limit)
+    user = eval_user()
+    db = SessionLocal()
+    try:
+        connections = {name: prepare_connection(db, name) for name in sorted({c["fixture"] for c in cases})}
+        results = []
+        for case in cases:
+            conn = connections[case["fixture"]]
+            tokens_before = token_totals()
+            outcome = run_case(case, conn, user)
+            tokens_after = token_totals()
+            expected, ordered = expected_rows(case, conn)
+            correct = outcome["rows"] is not None and results_match(outcome["rows"], expected, ordered)
+            results.append({
+                "id": case.get("id"),
+                "question": case["question"],
+                "correct": correct,
+                "status": "correct" if correct else ("wrong_result" if outcome["status"] == "executed" else outcome["status"]),
+                "sql": outcome["sql"],
+                "error": outcome["error"],
+                "retries": outcome["retries"],
+                "repairs": outcome["repairs"],
+                "seconds": outcome["seconds"],
+                "stages": outcome["stages"],
+                "tokens_in": tokens_after["in"] - tokens_before["in"],
+                "tokens_out": tokens_after["out"] - tokens_before["out"],
+            })
+            print(f"{case.get('id')}: {results[-1]['status']} in {outcome['seconds']:.2f}s")
+    finally:
+        db.close()
+
+    summary = summarize(results)
+    print_report(summary, results, args.overrides)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": dict(args.overrides), "summary": summary, "results": results}, f, indent=2, default=str)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()